@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Disponibilidad', '0005_qr_archivos'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='disponibilidad',
+            index=models.Index(fields=['numero_mesa', 'variedad', 'medida', 'fecha_salida', 'fecha_entrada'], name='disp_grupo_salida_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='disponibilidad',
+            index=models.Index(fields=['variedad', 'medida', 'fecha_entrada'], name='disp_variedad_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='disponibilidad',
+            index=models.Index(fields=['fecha_salida', 'numero_mesa'], name='disp_activos_idx'),
+        ),
+    ]
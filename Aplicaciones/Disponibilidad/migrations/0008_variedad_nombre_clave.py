@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:40
+
+from django.db import migrations, models
+
+
+def clave_normalizada(valor):
+    # copia congelada de Aplicaciones/Usuario/clave_normalizada.py: la
+    # migracion no debe cambiar si ese modulo cambia
+    return str(valor or "").strip().casefold()
+
+
+def llenar_nombre_clave(apps, schema_editor):
+    # variedades que solo difieren en mayusculas: la de menor id conserva
+    # la clave, las demas llevan sufijo "#dup<id>" (ver Usuario 0005)
+    Variedad = apps.get_model('Disponibilidad', 'Variedad')
+    vistas = set()
+    pendientes = []
+    for pk, nombre in Variedad.objects.order_by('id').values_list('id', 'nombre'):
+        clave = clave_normalizada(nombre)
+        if clave in vistas:
+            clave = f"{clave}#dup{pk}"
+        vistas.add(clave)
+        pendientes.append(Variedad(id=pk, nombre_clave=clave))
+    Variedad.objects.bulk_update(pendientes, ['nombre_clave'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Disponibilidad', '0007_fecha_local'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='variedad',
+            name='nombre_clave',
+            field=models.CharField(editable=False, max_length=255, null=True),
+        ),
+        migrations.RunPython(llenar_nombre_clave, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='variedad',
+            name='nombre_clave',
+            field=models.CharField(editable=False, max_length=255, unique=True),
+        ),
+    ]
@@ -1,6 +1,9 @@
 from django.db import models
 from django.utils import timezone
 
+from Aplicaciones.Usuario.clave_normalizada import clave_para_guardar
+from Aplicaciones.Usuario.fecha_local import fecha_local
+
 class QRDisponibilidadUsado(models.Model):
     qr_id = models.CharField(max_length=255, unique=True)
     fecha_escaneo = models.DateTimeField(auto_now_add=True)
@@ -15,6 +18,24 @@ class QRDisponibilidadSalidaUsado(models.Model):
     def __str__(self):
         return self.qr_id
 
+class QRDisponibilidadUsadoArchivo(models.Model):
+    """QRDisponibilidadUsado archivados por retencion."""
+    qr_id = models.CharField(max_length=255, unique=True)
+    fecha_escaneo = models.DateTimeField()
+    periodo = models.CharField(max_length=7, db_index=True)  # "AAAA-MM"
+
+    def __str__(self):
+        return self.qr_id
+
+class QRDisponibilidadSalidaUsadoArchivo(models.Model):
+    """QRDisponibilidadSalidaUsado archivados por retencion."""
+    qr_id = models.CharField(max_length=255, unique=True)
+    fecha_escaneo = models.DateTimeField()
+    periodo = models.CharField(max_length=7, db_index=True)  # "AAAA-MM"
+
+    def __str__(self):
+        return self.qr_id
+
 class Disponibilidad(models.Model):
     numero_mesa = models.PositiveIntegerField(verbose_name="Número de mesa")
     variedad = models.CharField(max_length=100)
@@ -24,13 +45,36 @@ class Disponibilidad(models.Model):
 
     fecha_entrada = models.DateTimeField()
     fecha_salida = models.DateTimeField(null=True, blank=True)
+    fecha_local = models.DateField(null=True, db_index=True, editable=False)  # fecha de fecha_entrada en hora local
+
+    class Meta:
+        indexes = [
+            # salida: mesa + variedad + medida + fecha_salida NULL, ORDER BY fecha_entrada, id
+            # (tambien el registro de hoy del mismo grupo al escanear una entrada)
+            models.Index(fields=["numero_mesa", "variedad", "medida", "fecha_salida", "fecha_entrada"],
+                         name="disp_grupo_salida_idx"),
+            # mesa por defecto: ultimo registro de la variedad + medida
+            models.Index(fields=["variedad", "medida", "fecha_entrada"], name="disp_variedad_fecha_idx"),
+            # activos y estadisticas: fecha_salida NULL
+            models.Index(fields=["fecha_salida", "numero_mesa"], name="disp_activos_idx"),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.fecha_local = fecha_local(self.fecha_entrada)
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"Mesa {self.numero_mesa} - {self.variedad} ({self.stock})"
 class Variedad(models.Model):
     nombre = models.CharField(max_length=120, unique=True)
+    # nombre sin mayusculas, para buscar sin __iexact
+    nombre_clave = models.CharField(max_length=255, unique=True, editable=False)
 
     fecha_creacion = models.DateTimeField(auto_now_add=True)
 
+    def save(self, *args, **kwargs):
+        self.nombre_clave = clave_para_guardar(self.nombre, self.nombre_clave)
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return self.nombre
\ No newline at end of file
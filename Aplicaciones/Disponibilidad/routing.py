@@ -3,4 +3,6 @@ from . import consumers
 
 websocket_urlpatterns = [
     path("ws/disponibilidad/",consumers.DisponibilidadConsumer.as_asgi()),
+    path("ws/disponibilidad/mesa/<str:mesa>/", consumers.DisponibilidadConsumer.as_asgi()),
+    path("ws/disponibilidad/variedad/<str:variedad>/", consumers.DisponibilidadConsumer.as_asgi()),
 ]
@@ -1,4 +1,6 @@
 from rest_framework import serializers
+
+from Aplicaciones.Usuario.serializacion_rapida import SerializadorRapido
 from .models import Disponibilidad
 
 from .models import Variedad
@@ -10,7 +12,11 @@ class VariedadSerializer(serializers.ModelSerializer):
 class DisponibilidadSerializer(serializers.ModelSerializer):
     class Meta:
         model = Disponibilidad
-        fields = '__all__'
+        exclude = ['fecha_local']   # columna interna de filtro, no es parte de la API
+
+
+# Listados y broadcasts: mismo JSON que DisponibilidadSerializer, leyendo values()
+disponibilidad_rapida = SerializadorRapido(DisponibilidadSerializer)
 
 
 class DisponibilidadCreateSerializer(serializers.ModelSerializer):
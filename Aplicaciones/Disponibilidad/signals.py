@@ -1,26 +1,22 @@
-from asgiref.sync import async_to_sync
-from channels.layers import get_channel_layer
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 
 from .models import Disponibilidad
-from .serializers import DisponibilidadSerializer
+from .serializers import disponibilidad_rapida
+from Aplicaciones.Usuario.suscripciones import difundir_filtrado
 
 
-channel_layer = get_channel_layer()
-
-
-def notificar_disponibilidad(disponibilidad):
+def notificar_disponibilidad(disponibilidad, data=None):
     """
-    Envía la disponibilidad por WebSocket
+    Envía la disponibilidad por WebSocket. Unica entrada para el grupo
+    "disponibilidad": se encola tras el commit para el proximo lote
     """
-    data = DisponibilidadSerializer(disponibilidad).data
+    if data is None:
+        data = disponibilidad_rapida.instancia(disponibilidad)
+    difundir_filtrado("disponibilidad", "lote_disponibilidad", data, por_variedad=True)
+
 
-    async_to_sync(channel_layer.group_send)(
-        "disponibilidad",
-        {
-            "type": "nueva_disponibilidad",
-            "data": data
-        }
-    )
+def notificar_disponibilidades(data):
+    """Igual que notificar_disponibilidad para una lista ya serializada."""
+    difundir_filtrado("disponibilidad", "lote_disponibilidad", data, por_variedad=True)
 
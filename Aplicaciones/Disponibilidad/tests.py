@@ -1,3 +1,109 @@
-from django.test import TestCase
+from datetime import datetime, timezone as dt_timezone
 
-# Create your tests here.
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from Aplicaciones.Rendimiento.tests import cabecera_jwt, crear_usuario
+from Aplicaciones.Usuario.json_rapido import JSONRendererRapido, loads
+
+from .models import Disponibilidad, QRDisponibilidadUsado, Variedad
+from .serializers import DisponibilidadSerializer, disponibilidad_rapida
+
+
+# sin el filtro QR: su hilo de construccion no debe tocar la BD de los tests
+@override_settings(QR_FILTRO_ACTIVO=False)
+class DisponibilidadLoteTests(TestCase):
+
+    def setUp(self):
+        self.usuario = crear_usuario()
+        self.cabecera = cabecera_jwt(self.usuario)
+        # dos registros de hoy del mismo grupo (carga antigua)
+        self.primera = Disponibilidad.objects.create(
+            numero_mesa=7, variedad="Freedom", medida="50", stock=1, fecha_entrada=timezone.now())
+        self.segunda = Disponibilidad.objects.create(
+            numero_mesa=7, variedad="Freedom", medida="50", stock=1, fecha_entrada=timezone.now())
+
+    def escaneo(self, codigo):
+        return {"qr_id": codigo, "numero_mesa": 7, "variedad": "Freedom", "medida": "50"}
+
+    def test_lote_y_escaneo_suelto_suman_en_la_misma_fila(self):
+        self.client.post("/api/disponibilidades/", self.escaneo("D1"),
+                         content_type="application/json", **self.cabecera)
+        respuesta = self.client.post("/api/disponibilidades/lote/",
+                                     {"escaneos": [self.escaneo("D2"), self.escaneo("D3")]},
+                                     content_type="application/json", **self.cabecera)
+        self.assertEqual(respuesta.status_code, 200)
+        self.primera.refresh_from_db()
+        self.segunda.refresh_from_db()
+        self.assertEqual((self.primera.stock, self.segunda.stock), (4, 1))
+
+    def test_solo_cuenta_los_qr_insertados(self):
+        QRDisponibilidadUsado.objects.create(qr_id="D1")
+        respuesta = self.client.post("/api/disponibilidades/lote/",
+                                     {"escaneos": [self.escaneo("D1"), self.escaneo("D2")]},
+                                     content_type="application/json", **self.cabecera)
+        self.assertEqual(respuesta.json()["aceptados"], 1)
+        self.primera.refresh_from_db()
+        self.assertEqual(self.primera.stock, 2)
+
+
+class VariedadClaveDuplicadaTests(TestCase):
+
+    def test_editar_variedad_dup_no_choca(self):
+        Variedad.objects.create(nombre="Freedom")
+        dup = Variedad.objects.create(nombre="freedom-tmp")
+        Variedad.objects.filter(pk=dup.pk).update(nombre="FREEDOM", nombre_clave=f"freedom#dup{dup.pk}")
+        dup.refresh_from_db()
+        dup.save()
+        self.assertEqual(Variedad.objects.get(pk=dup.pk).nombre_clave, f"freedom#dup{dup.pk}")
+
+        dup.nombre = "Freedom Roja"
+        dup.save()
+        self.assertEqual(Variedad.objects.get(pk=dup.pk).nombre_clave, "freedom roja")
+
+
+class DisponibilidadOrdenTests(TestCase):
+
+    def setUp(self):
+        self.cabecera = cabecera_jwt(crear_usuario())
+        ahora = timezone.now()
+        for i in range(15):
+            # pocas mesas y variedades: muchos empates en la columna de orden
+            Disponibilidad.objects.create(numero_mesa=3 - i % 3, variedad=("Freedom", "Vendela")[i % 2],
+                                          medida="50", stock=i, fecha_entrada=ahora)
+
+    def listar(self, **params):
+        respuesta = self.client.get("/api/disponibilidades/", params, **self.cabecera)
+        if respuesta.streaming:
+            return loads(b"".join(respuesta.streaming_content))
+        return respuesta.json()
+
+    def test_lista_paginas_y_stream_en_el_mismo_orden(self):
+        for params in ({"ordenar": "mesa"}, {"ordenar": "variedad", "reciente": "true"}, {"ordenar": "fecha"}):
+            completa = self.listar(**params)
+            self.assertEqual(self.listar(stream="true", **params), completa)
+            paginas, cursor = [], None
+            while True:
+                cuerpo = self.listar(limit=4, **params, **({"cursor": cursor} if cursor else {}))
+                paginas += cuerpo["results"]
+                cursor = cuerpo["next"]
+                if not cursor:
+                    break
+            self.assertEqual(paginas, completa, params)
+
+
+class DisponibilidadRapidaTests(TestCase):
+
+    def test_igual_que_el_serializer_drf(self):
+        entrada = datetime(2026, 10, 18, 12, 30, 5, 250, tzinfo=dt_timezone.utc)
+        Disponibilidad.objects.create(numero_mesa=4, variedad="Mondial Ñ", medida="60 cm", stock=0,
+                                      fecha_entrada=entrada)
+        Disponibilidad.objects.create(numero_mesa=9, variedad="Explorer", medida="40", stock=12,
+                                      fecha_entrada=entrada, fecha_salida=entrada.replace(microsecond=0))
+        qs = Disponibilidad.objects.order_by("id")
+        for zona in ("America/Guayaquil", "UTC"):
+            with timezone.override(zona):
+                esperado = DisponibilidadSerializer(qs, many=True).data
+                self.assertEqual(JSONRendererRapido().render(disponibilidad_rapida.lista(qs)),
+                                 JSONRenderer().render(esperado), zona)
@@ -16,6 +16,7 @@ urlpatterns = [
 
     path('api/', include(router.urls)),
     path('api/disponibilidades/', views.api_disponibilidad_list, name='api-disponibilidad-list'),
+    path('api/disponibilidades/lote/', views.api_disponibilidad_lote, name='api-disponibilidad-lote'),
     path('api/disponibilidades/<int:pk>/', views.api_disponibilidad_detail, name='api-disponibilidad-detail'),
     path('api/disponibilidades/stats/', views.api_disponibilidad_stats, name='api-disponibilidad-stats'),
     
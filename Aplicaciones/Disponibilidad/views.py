@@ -1,22 +1,21 @@
 from django.db import transaction
 from django.db import IntegrityError
-from django.db.models import Sum
+from django.db.models import F, Sum
 from django.shortcuts import render, redirect
 from django.contrib import messages
 from datetime import datetime
 from django.utils import timezone
-from django.http import JsonResponse
+from Aplicaciones.Usuario.json_rapido import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
 
-from asgiref.sync import async_to_sync
-from channels.layers import get_channel_layer
+from .signals import notificar_disponibilidad, notificar_disponibilidades
 
 from rest_framework import viewsets, status
 from rest_framework.decorators import api_view, action
 from rest_framework.response import Response
 
-from .serializers import DisponibilidadSerializer
+from .serializers import DisponibilidadSerializer, disponibilidad_rapida
 from .models import Disponibilidad, QRDisponibilidadUsado,Variedad
 
 from rest_framework.decorators import api_view, permission_classes
@@ -30,7 +29,18 @@ from django.db.models.deletion import ProtectedError
 
 
 from Aplicaciones.Usuario.web_decorators import web_admin_required
+from Aplicaciones.Usuario.paginacion import ordenar_con_id, pide_paginacion, respuesta_paginada
+from Aplicaciones.Usuario.respuesta_stream import pide_stream, respuesta_stream
+from Aplicaciones.Usuario.clave_normalizada import clave_normalizada
+from Aplicaciones.Usuario.difusion import estadisticas as estadisticas_difusion
+from Aplicaciones.Usuario.fecha_local import filtrar_por_fecha
 from Aplicaciones.Usuario.models import Usuario
+from Aplicaciones.Rendimiento.qr_filtro import (
+    qr_ya_usado,
+    registrar_qr_en_filtro,
+    estadisticas as estadisticas_filtro_qr,
+)
+from Aplicaciones.Rendimiento.qr_retencion import qr_usados, registrar_nuevos
 
 
 def _to_positive_int(value):
@@ -129,13 +139,7 @@ def procesar_edicion_disponibilidad(request):
             # ==========================
             #  WEBSOCKET igual que antes
             # ==========================
-            async_to_sync(get_channel_layer().group_send)(
-                "disponibilidad",
-                {
-                    "type": "nueva_disponibilidad",
-                    "data": DisponibilidadSerializer(d).data
-                }
-            )
+            notificar_disponibilidad(d)
 
             messages.success(request, msg)
 
@@ -154,10 +158,20 @@ class DisponibilidadViewSet(viewsets.ModelViewSet):
     queryset = Disponibilidad.objects.all().order_by('-fecha_entrada')
     serializer_class = DisponibilidadSerializer
 
+    def _listar(self, qs, orden):
+        if pide_paginacion(self.request):
+            return respuesta_paginada(self.request, qs, orden, disponibilidad_rapida)
+        if pide_stream(self.request):
+            return respuesta_stream(qs, orden, disponibilidad_rapida)
+        return Response(disponibilidad_rapida.lista(ordenar_con_id(qs, orden)))
+
+    def list(self, request, *args, **kwargs):
+        return self._listar(self.get_queryset(), ['-fecha_entrada'])
+
     @action(detail=False, methods=['get'])
     def activos(self, request):
         qs = Disponibilidad.objects.filter(fecha_salida__isnull=True)
-        return Response(self.get_serializer(qs, many=True).data)
+        return self._listar(qs, ['id'])
 
     @action(detail=False, methods=['get'])
     def por_mesa(self, request):
@@ -165,7 +179,7 @@ class DisponibilidadViewSet(viewsets.ModelViewSet):
         if not mesa:
             return Response({"error": "Parámetro mesa requerido"}, status=400)
         qs = Disponibilidad.objects.filter(numero_mesa=mesa)
-        return Response(self.get_serializer(qs, many=True).data)
+        return self._listar(qs, ['id'])
 
 
 # =========================
@@ -187,11 +201,10 @@ def api_disponibilidad_list(request):
         
         qs = Disponibilidad.objects.all()
         
-        if fecha:
-            qs = qs.filter(fecha_entrada__date=fecha)
-
+        # fecha_local indexada en vez de fecha_entrada__date (no usa indice)
+        qs = filtrar_por_fecha(qs, fecha=fecha)
         if desde and hasta:
-            qs = qs.filter(fecha_entrada__date__range=[desde, hasta])
+            qs = filtrar_por_fecha(qs, desde=desde, hasta=hasta)
 
         campos = {
             "mesa": "numero_mesa",
@@ -200,13 +213,21 @@ def api_disponibilidad_list(request):
             "fecha": "fecha_entrada"
         }
 
+        orden = ["id"]
         if ordenar in campos:
             campo = campos[ordenar]
             if reciente == "true":
                 campo = "-" + campo
-            qs = qs.order_by(campo)
-        
-        return Response(DisponibilidadSerializer(qs, many=True).data)
+            orden = [campo]
+        # mismo orden (con desempate por id) en lista, paginas y stream
+        qs = ordenar_con_id(qs, orden)
+
+        if pide_paginacion(request):
+            return respuesta_paginada(request, qs, orden, disponibilidad_rapida)
+        if pide_stream(request):
+            return respuesta_stream(qs, orden, disponibilidad_rapida)
+
+        return Response(disponibilidad_rapida.lista(qs))
 
     elif request.method == 'POST':
 
@@ -220,7 +241,7 @@ def api_disponibilidad_list(request):
             return Response({"error": "Datos incompletos"}, status=status.HTTP_400_BAD_REQUEST)
 
 
-        if QRDisponibilidadUsado.objects.filter(qr_id=codigo).exists():
+        if qr_ya_usado(QRDisponibilidadUsado, codigo):
             return Response(
                 {"error": "Este QR ya fue utilizado en Disponibilidad"},
                 status=status.HTTP_409_CONFLICT
@@ -230,19 +251,22 @@ def api_disponibilidad_list(request):
         try:
             QRDisponibilidadUsado.objects.create(qr_id=codigo)
         except IntegrityError:
+            registrar_qr_en_filtro(QRDisponibilidadUsado, codigo)
             return Response(
                 {"error": "Este QR ya fue utilizado en Disponibilidad"},
                 status=status.HTTP_409_CONFLICT
             )
+        registrar_qr_en_filtro(QRDisponibilidadUsado, codigo)
 
         hoy = timezone.localdate()
 
+        # la de menor id, igual que api_disponibilidad_lote
         existente = Disponibilidad.objects.filter(
             numero_mesa=mesa,
             variedad=variedad,
             medida=medida,
-            fecha_entrada__date=hoy
-        ).first()
+            fecha_local=hoy
+        ).order_by("id").first()
 
         if existente:
             existente.stock += 1
@@ -252,15 +276,9 @@ def api_disponibilidad_list(request):
 
             existente.save()
 
-
-            async_to_sync(get_channel_layer().group_send)(
-                "disponibilidad",
-                {
-                    "type": "nueva_disponibilidad",
-                    "data": DisponibilidadSerializer(existente).data
-                }
-            )
-            return Response(DisponibilidadSerializer(existente).data, status=200)
+            data = disponibilidad_rapida.instancia(existente)
+            notificar_disponibilidad(existente, data)
+            return Response(data, status=200)
 
         nuevo = Disponibilidad.objects.create(
             numero_mesa=mesa,
@@ -270,15 +288,114 @@ def api_disponibilidad_list(request):
             fecha_entrada=timezone.now()
         )
 
-        async_to_sync(get_channel_layer().group_send)(
-            "disponibilidad",
-            {
-                "type": "nueva_disponibilidad",
-                "data": DisponibilidadSerializer(nuevo).data
-            }
+        data = disponibilidad_rapida.instancia(nuevo)
+        notificar_disponibilidad(nuevo, data)
+
+        return Response(data, status=201)
+
+
+MAX_ESCANEOS_LOTE = 1000
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def api_disponibilidad_lote(request):
+    """
+    POST: /api/disponibilidades/lote/
+    Body: {"escaneos": [{"qr_id": "...", "numero_mesa": 7, "variedad": "...", "medida": "..."}, ...]}
+
+    Reenvio de QR acumulados sin red: registra los QR de una vez (solo
+    cuentan los que inserta esta peticion), suma el neto por (mesa, variedad, medida) del dia en una transaccion
+    y manda una sola actualizacion por WebSocket.
+    """
+    escaneos = request.data
+    if isinstance(escaneos, dict):
+        escaneos = escaneos.get("escaneos")
+    if not isinstance(escaneos, list) or not escaneos:
+        return Response({"error": "Se requiere una lista de escaneos"}, status=status.HTTP_400_BAD_REQUEST)
+    if len(escaneos) > MAX_ESCANEOS_LOTE:
+        return Response(
+            {"error": f"Maximo {MAX_ESCANEOS_LOTE} escaneos por lote"},
+            status=status.HTTP_400_BAD_REQUEST
         )
 
-        return Response(DisponibilidadSerializer(nuevo).data, status=201)
+    resultados = []
+    grupo_por_codigo = {}
+    for item in escaneos:
+        item = item if isinstance(item, dict) else {}
+        codigo = item.get("qr_id")
+        mesa = _to_positive_int(item.get("numero_mesa"))
+        variedad = item.get("variedad")
+        medida = item.get("medida")
+
+        if not codigo or not mesa or not variedad or not medida:
+            resultados.append({"qr_id": codigo, "estado": "invalido"})
+        elif str(codigo) in grupo_por_codigo:
+            resultados.append({"qr_id": str(codigo), "estado": "duplicado"})
+        else:
+            grupo_por_codigo[str(codigo)] = (mesa, variedad, medida)
+            resultados.append({"qr_id": str(codigo), "estado": None})
+
+    hoy = timezone.localdate()
+    actualizados = []
+
+    with transaction.atomic():
+        codigos = list(grupo_por_codigo)
+        usados = qr_usados(QRDisponibilidadUsado, codigos)
+        # solo cuentan los QR que inserto esta transaccion
+        nuevos = registrar_nuevos(QRDisponibilidadUsado, [c for c in codigos if c not in usados])
+
+        netos = {}
+        for c in nuevos:
+            grupo = grupo_por_codigo[c]
+            netos[grupo] = netos.get(grupo, 0) + 1
+
+        # Registros de hoy para todos los grupos del lote en una consulta
+        existentes = {}
+        if netos:
+            for d in (Disponibilidad.objects
+                      .filter(numero_mesa__in={g[0] for g in netos},
+                              variedad__in={g[1] for g in netos},
+                              fecha_local=hoy)
+                      .order_by("id")):
+                # la de menor id, como el .first() del escaneo suelto
+                existentes.setdefault((d.numero_mesa, d.variedad, d.medida), d.id)
+
+        for (mesa, variedad, medida), cantidad in netos.items():
+            existente_id = existentes.get((mesa, variedad, medida))
+            if existente_id:
+                # reabrir si estaba cerrada porque llego a 0
+                Disponibilidad.objects.filter(pk=existente_id).update(
+                    stock=F("stock") + cantidad,
+                    fecha_salida=None
+                )
+                actualizados.append(Disponibilidad.objects.get(pk=existente_id))
+            else:
+                actualizados.append(Disponibilidad.objects.create(
+                    numero_mesa=mesa,
+                    variedad=variedad,
+                    medida=medida,
+                    stock=cantidad,
+                    fecha_entrada=timezone.now()
+                ))
+
+    registrar_qr_en_filtro(QRDisponibilidadUsado, *nuevos)
+
+    for r in resultados:
+        if r["estado"] is None:
+            r["estado"] = "aceptado" if r["qr_id"] in nuevos else "duplicado"
+
+    data = disponibilidad_rapida.instancias(actualizados)
+
+    if data:
+        notificar_disponibilidades(data)
+
+    return Response({
+        "aceptados": len(nuevos),
+        "duplicados": sum(1 for r in resultados if r["estado"] == "duplicado"),
+        "resultados": resultados,
+        "disponibilidades": data,
+    }, status=status.HTTP_200_OK)
 
 
 @api_view(['GET', 'PUT', 'DELETE'])
@@ -298,13 +415,7 @@ def api_disponibilidad_detail(request, pk):
         if serializer.is_valid():
             serializer.save()
 
-            async_to_sync(get_channel_layer().group_send)(
-                "disponibilidad",
-                {
-                    "type": "nueva_disponibilidad",
-                    "data": serializer.data
-                }
-            )
+            notificar_disponibilidad(disponibilidad, serializer.data)
 
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -323,7 +434,9 @@ def api_disponibilidad_stats(request):
         "mesas_activas": Disponibilidad.objects.filter(fecha_salida__isnull=True)
                             .values('numero_mesa')
                             .distinct()
-                            .count()
+                            .count(),
+        "filtro_qr": estadisticas_filtro_qr(QRDisponibilidadUsado, QRDisponibilidadSalidaUsado),
+        "difusion": estadisticas_difusion(),
     })
 #API PARA LA DISPONIBILIDAD QUE SALE
 from .models import Disponibilidad, QRDisponibilidadSalidaUsado
@@ -345,13 +458,12 @@ def api_disponibilidad_salida(request):
 
 
     #  Si ya se restó este QR una vez, NO permitir otra vez
-    if QRDisponibilidadSalidaUsado.objects.filter(qr_id=codigo).exists():
+    if qr_ya_usado(QRDisponibilidadSalidaUsado, codigo):
         return Response(
             {"error": "Este QR ya fue utilizado en SALIDA (ya se restó una vez)"},
             status=status.HTTP_409_CONFLICT
         )
 
-    channel_layer = get_channel_layer()
 
     with transaction.atomic():
         dispo = (Disponibilidad.objects
@@ -377,6 +489,7 @@ def api_disponibilidad_salida(request):
         try:
             QRDisponibilidadSalidaUsado.objects.create(qr_id=codigo)
         except IntegrityError:
+            registrar_qr_en_filtro(QRDisponibilidadSalidaUsado, codigo)
             return Response(
                 {"error": "Este QR ya fue utilizado en SALIDA (ya se restó una vez)"},
                 status=status.HTTP_409_CONFLICT
@@ -391,16 +504,13 @@ def api_disponibilidad_salida(request):
 
         dispo.save()
 
+    registrar_qr_en_filtro(QRDisponibilidadSalidaUsado, codigo)
+
     # Notificar por websocket
-    async_to_sync(channel_layer.group_send)(
-        "disponibilidad",
-        {
-            "type": "nueva_disponibilidad",
-            "data": DisponibilidadSerializer(dispo).data
-        }
-    )
+    data = disponibilidad_rapida.instancia(dispo)
+    notificar_disponibilidad(dispo, data)
 
-    return Response(DisponibilidadSerializer(dispo).data, status=status.HTTP_200_OK)
+    return Response(data, status=status.HTTP_200_OK)
 ################################
 #API VARIEDAD#
 ################################
@@ -419,7 +529,7 @@ def variedades_api(request):
     nombre = nombre_raw.lower().capitalize()
 
     #  Mensaje desde el backend
-    if Variedad.objects.filter(nombre__iexact=nombre).exists():
+    if Variedad.objects.filter(nombre_clave=clave_normalizada(nombre)).exists():
         return Response(
             {"detail": "La variedad ya se encuentra agregada."},
             status=409
@@ -436,6 +546,18 @@ def variedades_api(request):
 from openpyxl import load_workbook
 from io import BytesIO
 
+
+def _claves_de_variedades_existentes(claves, lote=500):
+    """Claves normalizadas de `claves` que ya tienen Variedad (IN por lotes)."""
+    claves = list(claves)
+    existentes = set()
+    for i in range(0, len(claves), lote):
+        existentes.update(
+            Variedad.objects.filter(nombre_clave__in=claves[i:i + lote]).values_list("nombre_clave", flat=True)
+        )
+    return existentes
+
+
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
 def variedades_excel_api(request):
@@ -483,16 +605,18 @@ def variedades_excel_api(request):
         unicos = []
         seen = set()
         for n in nombres:
-            k = n.lower()
+            k = clave_normalizada(n)
             if k not in seen:
                 seen.add(k)
                 unicos.append(n)
 
         creadas = 0
         existentes = 0
+        # una sola consulta por la clave indexada en vez de una por fila
+        ya_existen = _claves_de_variedades_existentes(seen)
 
         for n in unicos:
-            if Variedad.objects.filter(nombre__iexact=n).exists():
+            if clave_normalizada(n) in ya_existen:
                 existentes += 1
             else:
                 Variedad.objects.create(nombre=n)
@@ -571,20 +695,21 @@ class VariedadViewSet(viewsets.ModelViewSet):
                 if nombre:
                     nombres.append(nombre)
 
-            # quitar duplicados por lower
+            # quitar duplicados por clave (sin mayusculas)
             seen = set()
             unicos = []
             for n in nombres:
-                k = n.lower()
+                k = clave_normalizada(n)
                 if k not in seen:
                     seen.add(k)
                     unicos.append(n)
 
             creadas = 0
             existentes = 0
+            ya_existen = _claves_de_variedades_existentes(seen)
 
             for n in unicos:
-                if Variedad.objects.filter(nombre__iexact=n).exists():
+                if clave_normalizada(n) in ya_existen:
                     existentes += 1
                 else:
                     Variedad.objects.create(nombre=n)
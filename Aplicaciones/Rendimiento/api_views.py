@@ -1,27 +1,13 @@
 # Rendimiento/api_views.py
-from django.http import JsonResponse
+from Aplicaciones.Usuario.json_rapido import JSONDecodeError, JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.utils import timezone
-import json
-from asgiref.sync import async_to_sync
-from channels.layers import get_channel_layer
 from Aplicaciones.Usuario.jwt_decorators import jwt_required
 from .models import Rendimiento
 from .serializers import RendimientoSerializer
-
-def _broadcast_rendimiento(rendimiento):
-    channel_layer = get_channel_layer()
-
-    data = RendimientoSerializer(rendimiento).data
-
-   
-    async_to_sync(channel_layer.group_send)(
-        "rendimientos",
-        {
-            "type": "nuevo_rendimiento",
-            "data": data
-        }
-    )
+from .jornada_cache import jornada_activa, olvidar as olvidar_jornada
+from .signals import notificar_rendimiento
+from Aplicaciones.Usuario.cuerpo_json import CuerpoDemasiadoGrande, cuerpo_json, respuesta_demasiado_grande
 
 @csrf_exempt
 @jwt_required(enforce_mesa=True)
@@ -30,7 +16,7 @@ def iniciar_jornada_api(request):
         return JsonResponse({"success": False, "error": "Método no permitido. Use POST"}, status=405)
 
     try:
-        data = json.loads(request.body.decode("utf-8"))
+        data = cuerpo_json(request)
         mesa = (data.get("mesa") or data.get("numero_mesa") or "").strip()
         if not mesa:
             return JsonResponse({"success": False, "error": "La mesa es requerida"}, status=400)
@@ -38,17 +24,13 @@ def iniciar_jornada_api(request):
         rendimiento_val = int(data.get("rendimiento") or 20)
         ramos_base_val  = int(data.get("ramos_base") or 0)
 
-        jornada_activa = (Rendimiento.objects
-            .filter(qr_id="JORNADA", numero_mesa=mesa, hora_final__isnull=True)
-            .order_by("-hora_inicio", "-fecha_entrada")
-            .first()
-        )
+        activa = jornada_activa(mesa)
 
-        if jornada_activa:
+        if activa:
             return JsonResponse({
                 "success": False,
                 "error": "Ya existe una jornada activa para esta mesa",
-                "data": RendimientoSerializer(jornada_activa).data
+                "data": RendimientoSerializer(activa).data
             }, status=409)
 
         r = Rendimiento.objects.create(
@@ -63,7 +45,7 @@ def iniciar_jornada_api(request):
 
 
         r.save()  # (si tu modelo recalcula en save)
-        _broadcast_rendimiento(r)
+        notificar_rendimiento(r)
 
         return JsonResponse({
             "success": True,
@@ -71,7 +53,9 @@ def iniciar_jornada_api(request):
             "data": RendimientoSerializer(r).data
         }, status=201)
 
-    except json.JSONDecodeError:
+    except CuerpoDemasiadoGrande:
+        return respuesta_demasiado_grande()
+    except JSONDecodeError:
         return JsonResponse({"success": False, "error": "JSON inválido"}, status=400)
     except Exception as e:
         return JsonResponse({"success": False, "error": str(e)}, status=500)
@@ -85,31 +69,31 @@ def finalizar_jornada_api(request):
         return JsonResponse({"success": False, "error": "Método no permitido. Use POST"}, status=405)
 
     try:
-        data = json.loads(request.body.decode("utf-8"))
+        data = cuerpo_json(request)
         mesa = (data.get("mesa") or data.get("numero_mesa") or "").strip()
         if not mesa:
             return JsonResponse({"success": False, "error": "La mesa es requerida"}, status=400)
 
-        jornada_activa = (Rendimiento.objects
-            .filter(qr_id="JORNADA", numero_mesa=mesa, hora_final__isnull=True)
-            .order_by("-hora_inicio", "-fecha_entrada")
-            .first()
-        )
+        activa = jornada_activa(mesa)
+        if activa:
+            # bloquea y relee la fila: no pisa bonches sumados por escaneos
+            activa = Rendimiento.finalizar(activa.pk)
 
-        if not jornada_activa:
+        if not activa:
+            olvidar_jornada(mesa)
             return JsonResponse({"success": False, "error": "No hay jornada activa para esta mesa"}, status=404)
 
-        jornada_activa.hora_final = timezone.now()
-        jornada_activa.save()  # (recalcula en save)
-        _broadcast_rendimiento(jornada_activa)
+        notificar_rendimiento(activa)
 
         return JsonResponse({
             "success": True,
             "message": "Jornada finalizada exitosamente",
-            "data": RendimientoSerializer(jornada_activa).data
+            "data": RendimientoSerializer(activa).data
         }, status=200)
 
-    except json.JSONDecodeError:
+    except CuerpoDemasiadoGrande:
+        return respuesta_demasiado_grande()
+    except JSONDecodeError:
         return JsonResponse({"success": False, "error": "JSON inválido"}, status=400)
     except Exception as e:
         return JsonResponse({"success": False, "error": str(e)}, status=500)
@@ -132,12 +116,9 @@ def obtener_jornada_actual_api(request):
 
         hoy = timezone.localdate()
 
-        jornada_activa = Rendimiento.objects.filter(
-            qr_id="JORNADA",
-            numero_mesa=mesa,
-            fecha_entrada__date=hoy,
-            hora_final__isnull=True
-        ).order_by("-fecha_entrada").first()
+        activa = jornada_activa(mesa)
+        if activa and timezone.localdate(activa.fecha_entrada) != hoy:
+            activa = None
 
         ultima_jornada = Rendimiento.objects.filter(
             qr_id="JORNADA",
@@ -147,8 +128,8 @@ def obtener_jornada_actual_api(request):
         return JsonResponse({
             "success": True,
             "data": {
-                "tiene_jornada_activa": jornada_activa is not None,
-                "jornada_activa": RendimientoSerializer(jornada_activa).data if jornada_activa else None,
+                "tiene_jornada_activa": activa is not None,
+                "jornada_activa": RendimientoSerializer(activa).data if activa else None,
                 "ultima_jornada": RendimientoSerializer(ultima_jornada).data if ultima_jornada else None
             }
         }, status=200)
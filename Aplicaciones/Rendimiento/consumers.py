@@ -1,24 +1,11 @@
-from channels.generic.websocket import AsyncWebsocketConsumer
-import json
+from Aplicaciones.Usuario.suscripciones import ConsumerConSuscripciones
 
-class RendimientoConsumer(AsyncWebsocketConsumer):
-    async def connect(self):
-        await self.channel_layer.group_add("rendimientos", self.channel_name)
-        await self.accept()
+class RendimientoConsumer(ConsumerConSuscripciones):
+    # ws/rendimientos/ -> todas las mesas; ws/rendimientos/mesa/<mesa>/ o
+    # {"suscribir": {"mesas": [...]}} -> solo esas mesas
+    grupo_base = "rendimientos"
 
-    async def disconnect(self, close_code):
-        await self.channel_layer.group_discard("rendimientos", self.channel_name)
-
-    async def nuevo_rendimiento(self, event):
-        await self.send(text_data=json.dumps({
-            "type": "nuevo_rendimiento",
-            "data": event.get("data", {})
-        }))
-
-    async def send_rendimiento(self, event):
-        await self.send(text_data=json.dumps({
-            "type": "send_rendimiento",
-            "data": event.get("data", {})
-        }))
-    async def nuevo_rendimiento(self, event):
-        await self.send(text_data=json.dumps(event["data"]))
\ No newline at end of file
+    # Lote coalescido (varias jornadas en un solo mensaje); es el unico
+    # evento que se difunde (ver Aplicaciones/Usuario/difusion.py)
+    async def lote_rendimientos(self, event):
+        await self.enviar_lote(event)
@@ -0,0 +1,123 @@
+# Rendimiento/jornada_cache.py
+"""
+Cache por proceso: mesa -> id de la jornada abierta (o None si no hay).
+
+Escaneos, iniciar, finalizar y "jornada actual" resuelven la jornada con la
+misma consulta (qr_id="JORNADA", mesa, hora_final NULL). Aqui se guarda el
+resultado y se invalida cuando una jornada se crea, cambia o se borra
+(ver signals.py).
+
+Al guardar o borrar una jornada se incrementa la marca "jornada-mesa-<n>"
+de su mesa (y la de la mesa anterior si cambio de mesa): cada entrada
+recuerda la marca con que se leyo y, si ya no coincide, esa mesa se vuelve
+a consultar en todos los workers; las demas mesas siguen en cache.
+invalidar() sin mesa incrementa la marca general "jornadas" y vacia todo.
+"""
+import threading
+
+from Aplicaciones.Usuario.marca_version import MarcaVersion
+
+from .models import Rendimiento
+
+
+_marca = MarcaVersion("jornadas")
+_lock = threading.Lock()
+_cache = {}  # mesa -> (id o None, marca de la mesa)
+_version = None
+
+aciertos = 0
+fallos = 0
+
+
+def _marca_mesa(mesa):
+    return MarcaVersion(f"jornada-mesa-{mesa}")
+
+
+def _buscar_en_bd(mesa):
+    return (Rendimiento.objects
+        .filter(qr_id="JORNADA", numero_mesa=mesa, hora_final__isnull=True)
+        .order_by("-hora_inicio", "-fecha_entrada")
+        .values_list("id", flat=True)
+        .first()
+    )
+
+
+def _sincronizar_version():
+    global _version
+    version = _marca.leer()
+    if version != _version:
+        with _lock:
+            _cache.clear()
+            _version = version
+    return version
+
+
+def jornada_activa_id(mesa):
+    """Id de la jornada abierta de la mesa, o None."""
+    global aciertos, fallos
+    mesa = str(mesa).strip()
+    version = _sincronizar_version()
+    marca = _marca_mesa(mesa).leer()
+
+    entrada = _cache.get(mesa)
+    if entrada is not None and entrada[1] == marca:
+        aciertos += 1
+        return entrada[0]
+    fallos += 1
+
+    jornada_id = _buscar_en_bd(mesa)
+    with _lock:
+        # si la version general cambio mientras consultabamos, no guardar;
+        # si cambio la de la mesa, la entrada ya nace con la marca vieja
+        if version == _version:
+            _cache[mesa] = (jornada_id, marca)
+    return jornada_id
+
+
+def jornada_activa(mesa):
+    """
+    La jornada abierta (instancia) de la mesa, o None. Si el id cacheado ya
+    no esta abierto, lo olvida y vuelve a resolver desde la BD.
+    """
+    jornada_id = jornada_activa_id(mesa)
+    if not jornada_id:
+        return None
+    jornada = Rendimiento.objects.filter(pk=jornada_id, hora_final__isnull=True).first()
+    if jornada is None:
+        olvidar(mesa)
+        jornada_id = jornada_activa_id(mesa)
+        jornada = Rendimiento.objects.filter(pk=jornada_id).first() if jornada_id else None
+    return jornada
+
+
+def olvidar(mesa):
+    """Descarta solo la entrada local de una mesa (id cacheado obsoleto)."""
+    with _lock:
+        _cache.pop(str(mesa).strip(), None)
+
+
+def invalidar(mesa=None):
+    """
+    Descarta la mesa (o todas, sin mesa) en este y en los demas workers.
+    """
+    global _version
+    if mesa is not None:
+        mesa = str(mesa).strip()
+        with _lock:
+            _cache.pop(mesa, None)
+        _marca_mesa(mesa).incrementar()
+        return
+    with _lock:
+        _cache.clear()
+        _marca.incrementar()
+        _version = None
+
+
+def estadisticas():
+    total = aciertos + fallos
+    return {
+        "mesas_en_cache": len(_cache),
+        "aciertos": aciertos,
+        "fallos": fallos,
+        "tasa_acierto": round(aciertos / total, 4) if total else 0.0,
+    }
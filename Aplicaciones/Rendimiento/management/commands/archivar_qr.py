@@ -0,0 +1,48 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from Aplicaciones.Rendimiento.qr_retencion import (
+    archivar,
+    contar_pendientes,
+    limite_retencion,
+    modelos_calientes,
+)
+
+
+class Command(BaseCommand):
+    help = "Mueve los QR usados mas viejos que el horizonte de retencion a sus tablas de archivo"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dias", type=int, default=None,
+                            help="Horizonte en dias (por defecto settings.QR_RETENCION_DIAS)")
+        parser.add_argument("--lote", type=int, default=5000)
+        parser.add_argument("--dry-run", action="store_true",
+                            help="Solo cuenta las filas que se moverian")
+        parser.add_argument("--cada-horas", type=float, default=0,
+                            help="Queda corriendo y repite cada N horas (programador opcional)")
+
+    def handle(self, *args, **opts):
+        while True:
+            self._ejecutar(opts)
+            if not opts["cada_horas"]:
+                return
+            time.sleep(opts["cada_horas"] * 3600)
+
+    def _ejecutar(self, opts):
+        limite = limite_retencion(opts["dias"])
+        self.stdout.write(f"Archivando QR anteriores a {timezone.localtime(limite):%Y-%m-%d %H:%M}")
+
+        for modelo in modelos_calientes():
+            if opts["dry_run"]:
+                total = contar_pendientes(modelo, limite)
+                self.stdout.write(f"  {modelo._meta.label}: {total} filas por archivar")
+                continue
+
+            inicio = time.monotonic()
+            total = archivar(modelo, limite, lote=opts["lote"])
+            seg = time.monotonic() - inicio
+            self.stdout.write(self.style.SUCCESS(
+                f"  {modelo._meta.label}: {total} filas archivadas en {seg:.1f}s"
+            ))
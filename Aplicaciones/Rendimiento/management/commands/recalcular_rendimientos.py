@@ -0,0 +1,70 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from Aplicaciones.Rendimiento.models import Rendimiento
+from Aplicaciones.Usuario.fecha_local import filtrar_por_fecha
+from Aplicaciones.Rendimiento.recalculo import recalcular_queryset
+
+
+class Command(BaseCommand):
+    help = "Recalcula por lotes (NumPy) horas, ramos esperados y extras de Rendimiento"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--desde", help="Fecha de entrada inicial (AAAA-MM-DD)")
+        parser.add_argument("--hasta", help="Fecha de entrada final (AAAA-MM-DD)")
+        parser.add_argument("--mesa", action="append", default=[],
+                            help="Numero de mesa (se puede repetir)")
+        parser.add_argument("--rendimiento", type=int, default=None,
+                            help="Cambia primero el rendimiento base de las filas seleccionadas")
+        parser.add_argument("--lote", type=int, default=5000)
+        parser.add_argument("--verificar", action="store_true",
+                            help="Compara cada fila contra Rendimiento.recalcular()")
+        parser.add_argument("--dry-run", action="store_true", help="No escribe en la BD")
+
+    def handle(self, *args, **opts):
+        try:
+            desde = date.fromisoformat(opts["desde"]) if opts["desde"] else None
+            hasta = date.fromisoformat(opts["hasta"]) if opts["hasta"] else None
+        except ValueError:
+            raise CommandError("Formato de fecha invalido. Use AAAA-MM-DD.")
+        qs = filtrar_por_fecha(Rendimiento.objects.all(), desde=desde, hasta=hasta)
+        if opts["mesa"]:
+            qs = qs.filter(numero_mesa__in=opts["mesa"])
+
+        inicio = time.monotonic()
+        leidas = cambiadas = 0
+
+        if opts["rendimiento"] is not None:
+            self.stdout.write(f"Rendimiento base = {opts['rendimiento']} (se aplica lote por lote)")
+
+        # cada lote se guarda en su propia transaccion
+        for resumen in recalcular_queryset(
+            qs,
+            lote=opts["lote"],
+            verificar_equivalencia=opts["verificar"],
+            guardar=not opts["dry_run"],
+            rendimiento=opts["rendimiento"],
+        ):
+            leidas += resumen["leidas"]
+            cambiadas += resumen["cambiadas"]
+            seg = time.monotonic() - inicio
+            self.stdout.write(
+                f"  {leidas} filas leidas, {cambiadas} cambiadas "
+                f"({leidas / seg if seg else 0:.0f} filas/s)"
+            )
+
+            if resumen["distintos"]:
+                distintos = resumen["distintos"]
+                raise CommandError(
+                    f"{len(distintos)} filas no coinciden con recalcular() "
+                    f"(primeros ids: {distintos[:10]}). Ese lote no se guardo; "
+                    f"los anteriores ({leidas - resumen['leidas']} filas) si."
+                )
+
+        seg = time.monotonic() - inicio
+        self.stdout.write(self.style.SUCCESS(
+            f"Listo: {leidas} filas en {seg:.2f}s ({leidas / seg if seg else 0:.0f} filas/s), "
+            f"{cambiadas} actualizadas" + (" (dry-run)" if opts["dry_run"] else "")
+        ))
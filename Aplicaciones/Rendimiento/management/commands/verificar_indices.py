@@ -0,0 +1,103 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from Aplicaciones.Disponibilidad.models import Disponibilidad, Variedad
+from Aplicaciones.Rendimiento.models import Rendimiento
+from Aplicaciones.Rendimiento.views import listado_rendimientos
+from Aplicaciones.Usuario.models import Mesa, Usuario
+
+
+def consultas_calientes():
+    """(nombre, queryset) de los accesos mas frecuentes de las vistas."""
+    ahora = timezone.now()
+    return [
+        ("jornada abierta por mesa",
+         Rendimiento.objects
+         .filter(qr_id="JORNADA", numero_mesa="1", hora_final__isnull=True)
+         .order_by("-hora_inicio", "-fecha_entrada")),
+        ("jornadas por fecha",
+         Rendimiento.objects.filter(qr_id="JORNADA", fecha_entrada__gte=ahora).order_by("-fecha_entrada")),
+        ("jornadas de un rango de fechas locales",
+         Rendimiento.objects.filter(qr_id="JORNADA", fecha_local__range=[ahora.date(), ahora.date()])),
+        ("historial de una mesa",
+         Rendimiento.objects.filter(qr_id="JORNADA", numero_mesa="1").order_by("-fecha_entrada")),
+        # el mismo queryset que arma la vista (GET /api/rendimientos/?ordenar=mesa)
+        ("rendimientos ordenados por mesa", listado_rendimientos({"ordenar": "mesa"})[0]),
+        ("salida de disponibilidad",
+         Disponibilidad.objects
+         .filter(numero_mesa=1, variedad="x", medida="y", fecha_salida__isnull=True, stock__gt=0)
+         .order_by("fecha_entrada", "id")),
+        ("registro de hoy del grupo",
+         Disponibilidad.objects.filter(numero_mesa=1, variedad="x", medida="y", fecha_local=ahora.date())),
+        ("disponibilidad de un dia",
+         Disponibilidad.objects.filter(fecha_local=ahora.date())),
+        ("mesa por variedad y medida",
+         Disponibilidad.objects.filter(variedad="x", medida="y").order_by("-fecha_entrada", "-id")),
+        ("disponibilidad activa",
+         Disponibilidad.objects.filter(fecha_salida__isnull=True)),
+        ("login por username", Usuario.objects.filter(username_clave="admin")),
+        ("mesa por nombre", Mesa.objects.filter(nombre_clave="1")),
+        ("variedad por nombre", Variedad.objects.filter(nombre_clave__in=["freedom", "explorer"])),
+    ]
+
+
+def _tablas_recorridas_sqlite(plan):
+    # "SCAN tabla" sin indice = recorrido completo; "SEARCH ... USING INDEX" no
+    return [
+        linea.strip() for linea in plan.splitlines()
+        if " SCAN " in f" {linea.strip()} " and "USING" not in linea
+    ]
+
+
+def _tablas_recorridas_mysql(plan):
+    datos = json.loads(plan)
+    recorridos = []
+
+    def visitar(nodo):
+        if isinstance(nodo, dict):
+            if nodo.get("access_type") == "ALL":
+                recorridos.append(nodo.get("table_name", "?"))
+            for v in nodo.values():
+                visitar(v)
+        elif isinstance(nodo, list):
+            for v in nodo:
+                visitar(v)
+
+    visitar(datos)
+    return recorridos
+
+
+class Command(BaseCommand):
+    help = "Ejecuta EXPLAIN sobre las consultas calientes y falla si alguna recorre la tabla completa"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--mostrar-plan", action="store_true", help="Imprime el plan de cada consulta")
+
+    def handle(self, *args, **opts):
+        vendor = connection.vendor
+        if vendor not in ("sqlite", "mysql"):
+            raise CommandError(f"Motor no soportado: {vendor}")
+
+        fallidas = []
+        for nombre, qs in consultas_calientes():
+            if vendor == "mysql":
+                plan = qs.explain(format="json")
+                recorridos = _tablas_recorridas_mysql(plan)
+            else:
+                plan = qs.explain()
+                recorridos = _tablas_recorridas_sqlite(plan)
+
+            if opts["mostrar_plan"]:
+                self.stdout.write(f"--- {nombre}\n{plan}")
+
+            if recorridos:
+                fallidas.append(nombre)
+                self.stdout.write(self.style.ERROR(f"  FULL SCAN  {nombre}: {recorridos}"))
+            else:
+                self.stdout.write(self.style.SUCCESS(f"  ok         {nombre}"))
+
+        if fallidas:
+            raise CommandError(f"{len(fallidas)} consultas sin indice: {', '.join(fallidas)}")
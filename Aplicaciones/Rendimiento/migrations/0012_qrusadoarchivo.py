@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Rendimiento', '0011_alter_rendimiento_fecha_entrada_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QRUsadoArchivo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('qr_id', models.CharField(max_length=255, unique=True)),
+                ('fecha_escaneo', models.DateTimeField()),
+                ('periodo', models.CharField(db_index=True, max_length=7)),
+            ],
+        ),
+    ]
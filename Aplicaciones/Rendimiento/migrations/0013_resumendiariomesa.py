@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:01
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def llenar_resumen(apps, schema_editor):
+    Rendimiento = apps.get_model('Rendimiento', 'Rendimiento')
+    ResumenDiarioMesa = apps.get_model('Rendimiento', 'ResumenDiarioMesa')
+
+    campos = ('bonches', 'horas_trabajadas', 'ramos_esperados', 'ramos_extras')
+    totales = {}
+    filas = (Rendimiento.objects
+             .filter(qr_id='JORNADA', fecha_entrada__isnull=False)
+             .values_list('numero_mesa', 'fecha_entrada', *campos)
+             .iterator(chunk_size=5000))
+    for mesa, fecha_entrada, *valores in filas:
+        k = (timezone.localdate(fecha_entrada), str(mesa).strip())
+        t = totales.setdefault(k, [0] * (len(campos) + 1))
+        t[0] += 1
+        for i, v in enumerate(valores, start=1):
+            t[i] += v or 0
+
+    ResumenDiarioMesa.objects.bulk_create([
+        ResumenDiarioMesa(fecha=f, numero_mesa=m, jornadas=t[0],
+                          **dict(zip(campos, t[1:])))
+        for (f, m), t in totales.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Rendimiento', '0012_qrusadoarchivo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenDiarioMesa',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('numero_mesa', models.CharField(max_length=50)),
+                ('jornadas', models.IntegerField(default=0)),
+                ('bonches', models.IntegerField(default=0)),
+                ('horas_trabajadas', models.FloatField(default=0)),
+                ('ramos_esperados', models.FloatField(default=0)),
+                ('ramos_extras', models.FloatField(default=0)),
+            ],
+            options={
+                'ordering': ['fecha', 'numero_mesa'],
+                'unique_together': {('fecha', 'numero_mesa')},
+            },
+        ),
+        migrations.RunPython(llenar_resumen, migrations.RunPython.noop),
+    ]
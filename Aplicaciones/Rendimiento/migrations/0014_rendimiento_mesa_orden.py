@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:04
+
+from django.db import migrations, models
+
+
+MESA_ORDEN_TEXTO = 2147483647
+
+
+def orden_mesa(numero_mesa):
+    # copia congelada de Aplicaciones/Rendimiento/models.py: la migracion
+    # no debe cambiar si ese modulo cambia
+    try:
+        valor = int(str(numero_mesa).strip())
+    except (TypeError, ValueError):
+        return MESA_ORDEN_TEXTO
+    return valor if -MESA_ORDEN_TEXTO <= valor < MESA_ORDEN_TEXTO else MESA_ORDEN_TEXTO
+
+
+def llenar_mesa_orden(apps, schema_editor):
+    Rendimiento = apps.get_model('Rendimiento', 'Rendimiento')
+    # una actualizacion por mesa distinta (son pocas), no por fila
+    mesas = Rendimiento.objects.values_list('numero_mesa', flat=True).distinct()
+    for mesa in list(mesas):
+        Rendimiento.objects.filter(numero_mesa=mesa).update(mesa_orden=orden_mesa(mesa))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Rendimiento', '0013_resumendiariomesa'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rendimiento',
+            name='mesa_orden',
+            field=models.IntegerField(default=2147483647, editable=False),
+        ),
+        migrations.RunPython(llenar_mesa_orden, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='rendimiento',
+            index=models.Index(fields=['mesa_orden', 'numero_mesa'], name='rend_mesa_orden_idx'),
+        ),
+    ]
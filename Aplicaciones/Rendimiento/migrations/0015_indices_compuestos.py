@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Rendimiento', '0014_rendimiento_mesa_orden'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='rendimiento',
+            index=models.Index(fields=['qr_id', 'numero_mesa', 'hora_final', 'hora_inicio'], name='rend_jornada_abierta_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rendimiento',
+            index=models.Index(fields=['qr_id', 'fecha_entrada'], name='rend_qr_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rendimiento',
+            index=models.Index(fields=['qr_id', 'numero_mesa', 'fecha_entrada'], name='rend_qr_mesa_fecha_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:07
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def llenar_fecha_local(apps, schema_editor):
+    Rendimiento = apps.get_model('Rendimiento', 'Rendimiento')
+    # agrupa ids por fecha local y actualiza por fecha (pocas consultas)
+    ids_por_fecha = {}
+    filas = Rendimiento.objects.values_list('id', 'fecha_entrada').iterator(chunk_size=5000)
+    for pk, fecha_entrada in filas:
+        ids_por_fecha.setdefault(timezone.localdate(fecha_entrada), []).append(pk)
+    for fecha, ids in ids_por_fecha.items():
+        for i in range(0, len(ids), 1000):
+            Rendimiento.objects.filter(id__in=ids[i:i + 1000]).update(fecha_local=fecha)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Rendimiento', '0015_indices_compuestos'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rendimiento',
+            name='fecha_local',
+            field=models.DateField(db_index=True, editable=False, null=True),
+        ),
+        migrations.RunPython(llenar_fecha_local, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Rendimiento', '0016_fecha_local'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='rendimiento',
+            name='rend_mesa_orden_idx',
+        ),
+        migrations.AddIndex(
+            model_name='rendimiento',
+            index=models.Index(fields=['qr_id', 'mesa_orden', 'numero_mesa'], name='rend_qr_mesa_orden_idx'),
+        ),
+    ]
@@ -1,15 +1,31 @@
 
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
 from django.utils import timezone
 from datetime import datetime
 
 from decimal import Decimal, ROUND_FLOOR
 
+from Aplicaciones.Usuario.fecha_local import fecha_local
+
 def hora_a_decimal_excel(dt):
  
     return float(f"{dt.hour}.{dt.minute:02d}")
 
 
+# Mesas no numericas van despues de todas las numericas.
+MESA_ORDEN_TEXTO = 2147483647
+
+
+def orden_mesa(numero_mesa):
+    """Clave entera para ordenar mesas en SQL (2, 3, 10 en vez de 10, 2, 3)."""
+    try:
+        valor = int(str(numero_mesa).strip())
+    except (TypeError, ValueError):
+        return MESA_ORDEN_TEXTO
+    return valor if -MESA_ORDEN_TEXTO <= valor < MESA_ORDEN_TEXTO else MESA_ORDEN_TEXTO
+
+
 class QRUsado(models.Model):
     qr_id = models.CharField(max_length=255, unique=True)
     fecha_escaneo = models.DateTimeField(auto_now_add=True)
@@ -18,10 +34,25 @@ class QRUsado(models.Model):
         return self.qr_id
 
 
+class QRUsadoArchivo(models.Model):
+    """
+    QRUsado archivados por retencion (ver qr_retencion.py).
+    Solo para auditoria y para el chequeo de duplicados de respaldo.
+    """
+    qr_id = models.CharField(max_length=255, unique=True)
+    fecha_escaneo = models.DateTimeField()
+    periodo = models.CharField(max_length=7, db_index=True)  # "AAAA-MM"
+
+    def __str__(self):
+        return self.qr_id
+
+
 class Rendimiento(models.Model):
     qr_id = models.CharField(max_length=255)
     numero_mesa = models.CharField(max_length=50)
+    mesa_orden = models.IntegerField(default=MESA_ORDEN_TEXTO, editable=False)
     fecha_entrada = models.DateTimeField()
+    fecha_local = models.DateField(null=True, db_index=True, editable=False)  # fecha de fecha_entrada en hora local
 
 
     hora_inicio = models.DateTimeField(null=True, blank=True)
@@ -37,6 +68,21 @@ class Rendimiento(models.Model):
     ramos_extras = models.FloatField(null=True, blank=True)
     extras_por_hora = models.FloatField(null=True, blank=True)   
 
+    class Meta:
+        # Indices compuestos (no parciales: MySQL no soporta WHERE en indices).
+        # Columnas de igualdad primero, IS NULL despues, orden al final.
+        indexes = [
+            # ordenar=mesa: qr_id="JORNADA" ORDER BY mesa_orden, numero_mesa, id
+            models.Index(fields=["qr_id", "mesa_orden", "numero_mesa"], name="rend_qr_mesa_orden_idx"),
+            # jornada abierta: qr_id="JORNADA", mesa, hora_final NULL, ORDER BY hora_inicio
+            models.Index(fields=["qr_id", "numero_mesa", "hora_final", "hora_inicio"],
+                         name="rend_jornada_abierta_idx"),
+            # listados y rangos de fechas de jornadas
+            models.Index(fields=["qr_id", "fecha_entrada"], name="rend_qr_fecha_idx"),
+            # historial / ultima jornada / por_mesa: ORDER BY fecha_entrada
+            models.Index(fields=["qr_id", "numero_mesa", "fecha_entrada"], name="rend_qr_mesa_fecha_idx"),
+        ]
+
     from decimal import Decimal, ROUND_FLOOR
 
     def recalcular(self):
@@ -86,9 +132,95 @@ class Rendimiento(models.Model):
 
 
     def save(self, *args, **kwargs):
-        print(" [MODEL] save() llamado - ID:", self.id)
+        from .resumen_diario import aportes_guardados, aplicar_cambio
+
         self.recalcular()
-        super().save(*args, **kwargs)
+        self.mesa_orden = orden_mesa(self.numero_mesa)
+        self.fecha_local = fecha_local(self.fecha_entrada)
+        # El resumen diario se ajusta en la misma transaccion que la fila:
+        # se resta lo que aportaba antes y se suma lo que aporta ahora.
+        with transaction.atomic():
+            previo = aportes_guardados(self.pk) if self.pk else None
+            self._previo_guardado = previo  # para invalidar la mesa anterior (signals.py)
+            super().save(*args, **kwargs)
+            aplicar_cambio(previo, self)
+
+    CAMPOS_DERIVADOS = ("horas_trabajadas", "ramos_esperados", "ramos_extras", "extras_por_hora")
+
+    @classmethod
+    def sumar_bonches(cls, pk, cantidad=1):
+        """
+        Suma bonches directo en la BD (UPDATE ... SET bonches = bonches + n),
+        asi dos tablets escaneando la misma mesa no pierden incrementos.
+        Luego recalcula los campos derivados con los valores ya actualizados
+        y solo los escribe si cambiaron (en jornada abierta quedan en None).
+
+        Llamar dentro de transaction.atomic(): el UPDATE bloquea la fila
+        hasta el commit. Devuelve la jornada actualizada, o None si no existe
+        o ya no esta abierta (id obsoleto del cache de jornadas).
+        """
+        actualizadas = (cls.objects
+                        .filter(pk=pk, hora_final__isnull=True)
+                        .update(bonches=F("bonches") + cantidad))
+        if not actualizadas:
+            return None
+
+        obj = cls.objects.get(pk=pk)
+        previos = [getattr(obj, c) for c in cls.CAMPOS_DERIVADOS]
+        obj.recalcular()
+        nuevos = {c: getattr(obj, c) for c in cls.CAMPOS_DERIVADOS}
+
+        if list(nuevos.values()) != previos:
+            cls.objects.filter(pk=pk).update(**nuevos)
+
+        from .resumen_diario import sumar
+        delta = {c: (nuevos[c] or 0) - (p or 0) for c, p in zip(cls.CAMPOS_DERIVADOS, previos)}
+        delta.pop("extras_por_hora")
+        sumar(obj, bonches=cantidad, **delta)
+        return obj
+
+
+    @classmethod
+    def finalizar(cls, pk, hora_final=None):
+        """
+        Cierra la jornada sin pisar los bonches de escaneos concurrentes: la
+        fila se relee con select_for_update() dentro de la transaccion y se
+        guarda con los valores de la BD, no con una copia cargada antes.
+        Un sumar_bonches() que llega despues espera el commit y ya no la ve
+        abierta. Devuelve la jornada cerrada, o None si no existe o ya
+        estaba cerrada.
+        """
+        with transaction.atomic():
+            obj = cls.objects.select_for_update().filter(pk=pk, hora_final__isnull=True).first()
+            if obj is None:
+                return None
+            obj.hora_final = hora_final or timezone.now()
+            obj.save()
+        return obj
+
+
+class ResumenDiarioMesa(models.Model):
+    """
+    Totales de jornadas por dia (fecha local de fecha_entrada) y mesa.
+    Se mantiene en linea desde Rendimiento (ver resumen_diario.py) para que
+    las estadisticas por rango de fechas lean dias x mesas filas en vez de
+    todos los escaneos. Se puede reconstruir con reconstruir_resumen_diario.
+    """
+    fecha = models.DateField()
+    numero_mesa = models.CharField(max_length=50)
+
+    jornadas = models.IntegerField(default=0)
+    bonches = models.IntegerField(default=0)
+    horas_trabajadas = models.FloatField(default=0)
+    ramos_esperados = models.FloatField(default=0)
+    ramos_extras = models.FloatField(default=0)
+
+    class Meta:
+        unique_together = [["fecha", "numero_mesa"]]
+        ordering = ["fecha", "numero_mesa"]
+
+    def __str__(self):
+        return f"{self.fecha} - Mesa {self.numero_mesa}"
 
 
 
@@ -0,0 +1,398 @@
+# Rendimiento/qr_filtro.py
+"""
+Filtro Bloom en memoria delante de las tablas de "QR ya usado"
+(QRUsado, QRDisponibilidadUsado y QRDisponibilidadSalidaUsado).
+
+Responde "definitivamente nuevo" sin consultar la tabla caliente. Si
+responde "quizas usado" hay que consultarla como siempre. El indice unico
+de cada tabla sigue siendo el arbitro final: un falso positivo solo cuesta
+una consulta. El archivo de retencion no tiene ese arbitro: el filtro
+tambien carga sus filas y, cuando archivar() mueve filas nuevas (lo avisa
+con una marca de version compartida), cada worker las agrega antes de
+responder. Sin archivado nuevo un "definitivamente nuevo" no hace ninguna
+consulta.
+
+Cada worker arranca la construccion en segundo plano al cargar la
+aplicacion (precalentar(), desde asgi.py / wsgi.py; si no, la primera vez
+que se usa). Mientras tanto todo se consulta en la BD. El filtro se guarda
+en un snapshot compacto para que los reinicios solo lean las filas nuevas.
+Cuando los elementos superan la capacidad con que se dimensiono (la tasa de
+falsos positivos sube), se reconstruye con el doble de las filas actuales.
+"""
+import atexit
+import hashlib
+import logging
+import math
+import os
+import struct
+import tempfile
+import threading
+
+from django.conf import settings
+from django.db import connection, connections
+
+from .qr_retencion import marca_archivo, modelo_archivo, modelos_calientes, qr_en_archivo
+
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"QRBF3"
+# magic, m (bits), k, capacidad, elementos, ultimo_id (tabla caliente), ultimo_id (archivo)
+CABECERA = struct.Struct("<5sQIQQQQ")
+
+
+def _config(nombre, default):
+    return getattr(settings, nombre, default)
+
+
+class FiltroBloom:
+    """
+    Bloom clasico sobre un bytearray con doble hashing (blake2b de 128 bits).
+    """
+
+    def __init__(self, capacidad, tasa_error=0.01, m=None, k=None):
+        capacidad = max(int(capacidad), 1)
+        if m is None:
+            m = int(math.ceil(-capacidad * math.log(tasa_error) / (math.log(2) ** 2)))
+        if k is None:
+            k = max(1, int(round((m / capacidad) * math.log(2))))
+        self.capacidad = capacidad
+        self.m = m
+        self.k = k
+        self.bits = bytearray((m + 7) // 8)
+        self.elementos = 0
+
+    def _posiciones(self, valor):
+        d = hashlib.blake2b(valor.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(d[:8], "little")
+        h2 = int.from_bytes(d[8:], "little") | 1
+        m = self.m
+        return [(h1 + i * h2) % m for i in range(self.k)]
+
+    def agregar(self, valor):
+        """
+        Agrega el valor. True si no estaba: solo entonces cuenta en
+        elementos (una fila archivada ya estaba como fila caliente).
+        """
+        bits = self.bits
+        nuevo = False
+        for p in self._posiciones(valor):
+            mascara = 1 << (p & 7)
+            if not bits[p >> 3] & mascara:
+                bits[p >> 3] |= mascara
+                nuevo = True
+        if nuevo:
+            self.elementos += 1
+        return nuevo
+
+    def __contains__(self, valor):
+        bits = self.bits
+        for p in self._posiciones(valor):
+            if not bits[p >> 3] & (1 << (p & 7)):
+                return False
+        return True
+
+    def tasa_falsos_positivos(self):
+        """Estimacion con los elementos cargados hasta ahora."""
+        if not self.elementos:
+            return 0.0
+        return (1 - math.exp(-self.k * self.elementos / self.m)) ** self.k
+
+
+class FiltroQR:
+    """
+    Filtro de un modelo de QR usados: construccion en segundo plano,
+    snapshot en disco y contadores de aciertos.
+    """
+
+    def __init__(self, modelo):
+        self.modelo = modelo
+        self.filtro = None
+        self.ultimos = [0, 0]       # marca de agua por fuente (caliente, archivo)
+        self.pendientes = 0         # inserciones desde el ultimo snapshot
+        self.lock = threading.Lock()
+        self.construyendo = False
+        archivo = modelo_archivo(modelo)
+        self.marca = marca_archivo(modelo) if archivo is not None else None
+        self.marca_cargada = None   # valor de la marca la ultima vez que se leyo el archivo
+        self.lock_archivo = threading.Lock()
+
+        self.consultas = 0
+        self.nuevos = 0             # respondidas sin ir a la BD
+        self.falsos_positivos = 0   # "quizas usado" que resulto nuevo
+
+    # ---------- snapshot ----------
+    def _ruta_snapshot(self):
+        db = connections[self.modelo.objects.db].settings_dict
+        huella = hashlib.sha1(f"{db['ENGINE']}|{db['NAME']}|{db.get('HOST', '')}".encode()).hexdigest()[:10]
+        directorio = _config("QR_FILTRO_DIR", settings.BASE_DIR / "tmp" / "qr_filtro")
+        return os.path.join(directorio, f"{huella}_{self.modelo._meta.label_lower}.bloom")
+
+    def _cargar_snapshot(self):
+        try:
+            with open(self._ruta_snapshot(), "rb") as fh:
+                magic, m, k, capacidad, elementos, *ultimos = CABECERA.unpack(fh.read(CABECERA.size))
+                if magic != MAGIC:
+                    return None, [0, 0]
+                filtro = FiltroBloom(capacidad, m=m, k=k)
+                bits = fh.read()
+                if len(bits) != len(filtro.bits):
+                    return None, [0, 0]
+                filtro.bits = bytearray(bits)
+                filtro.elementos = elementos
+                return filtro, ultimos
+        except (OSError, struct.error):
+            return None, [0, 0]
+
+    def guardar_snapshot(self):
+        filtro = self.filtro
+        if filtro is None:
+            return
+        self.ponerse_al_dia()
+        ruta = self._ruta_snapshot()
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        with self.lock:
+            cabecera = CABECERA.pack(MAGIC, filtro.m, filtro.k, filtro.capacidad, filtro.elementos, *self.ultimos)
+            bits = bytes(filtro.bits)
+            self.pendientes = 0
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(ruta), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                fh.write(cabecera)
+                fh.write(bits)
+            os.replace(tmp, ruta)
+        except OSError:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+
+    # ---------- construccion ----------
+    def _fuentes(self):
+        """
+        Modelos (id, qr_id) que alimentan el filtro: la tabla caliente y su
+        archivo (los QR archivados tambien dan "quizas usado").
+        """
+        archivo = modelo_archivo(self.modelo)
+        return [self.modelo, archivo] if archivo is not None else [self.modelo]
+
+    def ponerse_al_dia(self, solo_archivo=False):
+        """Agrega las filas con id mayor a la marca de agua de cada fuente."""
+        filtro = self.filtro
+        for i, fuente in enumerate(self._fuentes()):
+            if solo_archivo and i == 0:
+                continue
+            ultimo = self.ultimos[i]
+            filas = (fuente.objects.filter(id__gt=ultimo)
+                     .order_by("id")
+                     .values_list("id", "qr_id")
+                     .iterator(chunk_size=20000))
+            for pk, qr_id in filas:
+                with self.lock:
+                    filtro.agregar(qr_id)
+                ultimo = pk
+            self.ultimos[i] = ultimo
+
+    def lleno(self):
+        filtro = self.filtro
+        return filtro is not None and filtro.elementos > filtro.capacidad
+
+    def construir(self, desde_cero=False):
+        # leida antes de cargar: si se archiva durante la carga, la marca cambia
+        marca = self.marca.leer() if self.marca is not None else None
+        filtro, ultimos = (None, [0, 0]) if desde_cero else self._cargar_snapshot()
+        fuentes = self._fuentes()
+
+        if filtro is not None:
+            for i, fuente in enumerate(fuentes):
+                max_id = fuente.objects.order_by("-id").values_list("id", flat=True).first() or 0
+                if ultimos[i] > max_id:
+                    # la tabla se reinicio: el snapshot no sirve
+                    filtro = None
+                    break
+
+        if filtro is not None:
+            self.filtro = filtro
+            self.ultimos = list(ultimos)
+            self.ponerse_al_dia()
+            if self.lleno():
+                logger.info("Filtro QR %s sobre su capacidad (%d > %d): se reconstruye",
+                            self.modelo._meta.label, filtro.elementos, filtro.capacidad)
+                filtro = None
+
+        if filtro is None:
+            total = sum(fuente.objects.count() for fuente in fuentes)
+            capacidad = max(_config("QR_FILTRO_CAPACIDAD_MINIMA", 1_000_000), total * 2)
+            self.filtro = FiltroBloom(capacidad, _config("QR_FILTRO_TASA_ERROR", 0.01))
+            self.ultimos = [0, 0]
+            self.ponerse_al_dia()
+
+        self.marca_cargada = marca
+        self.guardar_snapshot()
+
+    def _construir_en_segundo_plano(self, desde_cero=False):
+        try:
+            self.construir(desde_cero)
+        except Exception:
+            logger.warning("No se pudo construir el filtro QR %s", self.modelo._meta.label, exc_info=True)
+            self.filtro = None
+        finally:
+            self.construyendo = False
+            connection.close()
+
+    def _guardar_en_segundo_plano(self):
+        try:
+            self.guardar_snapshot()
+        except Exception:
+            logger.warning("No se pudo guardar el filtro QR %s", self.modelo._meta.label, exc_info=True)
+        finally:
+            connection.close()
+
+    def asegurar(self, reconstruir=False):
+        """Arranca la construccion si no hay filtro (o si reconstruir)."""
+        if (self.filtro is not None and not reconstruir) or self.construyendo:
+            return
+        with self.lock:
+            if (self.filtro is not None and not reconstruir) or self.construyendo:
+                return
+            self.construyendo = True
+        threading.Thread(target=self._construir_en_segundo_plano, args=(reconstruir,), daemon=True).start()
+
+    def archivo_al_dia(self):
+        """
+        Carga las filas archivadas desde la ultima lectura del archivo. Si la
+        marca no cambio no consulta nada. False si otro hilo las esta
+        cargando (mientras tanto se consulta la BD).
+        """
+        if self.marca is None:
+            return True
+        marca = self.marca.leer()
+        if marca == self.marca_cargada:
+            return True
+        if not self.lock_archivo.acquire(blocking=False):
+            return False
+        try:
+            self.ponerse_al_dia(solo_archivo=True)
+            self.marca_cargada = marca
+        finally:
+            self.lock_archivo.release()
+        return True
+
+    # ---------- API ----------
+    def es_nuevo(self, qr_id):
+        """
+        True solo si el QR seguro no esta registrado (ni en la tabla
+        caliente ni en el archivo). False = no se sabe.
+        """
+        self.consultas += 1
+        if not _config("QR_FILTRO_ACTIVO", True):
+            return False
+        self.asegurar()
+        filtro = self.filtro
+        if filtro is None or self.construyendo or not self.archivo_al_dia():
+            return False
+        if qr_id in filtro:
+            return False
+        self.nuevos += 1
+        return True
+
+    def agregar(self, qr_id):
+        filtro = self.filtro
+        if filtro is None:
+            return
+        with self.lock:
+            if filtro.agregar(qr_id):
+                self.pendientes += 1
+        if self.lleno():
+            # mientras se reconstruye se consulta la BD, como al arrancar
+            self.asegurar(reconstruir=True)
+        elif self.pendientes >= _config("QR_FILTRO_GUARDAR_CADA", 50_000):
+            threading.Thread(target=self._guardar_en_segundo_plano, daemon=True).start()
+
+    def estadisticas(self):
+        filtro = self.filtro
+        return {
+            "listo": filtro is not None and not self.construyendo,
+            "elementos": filtro.elementos if filtro else 0,
+            "capacidad": filtro.capacidad if filtro else 0,
+            "memoria_bytes": len(filtro.bits) if filtro else 0,
+            "hashes": filtro.k if filtro else 0,
+            "tasa_fp_estimada": round(filtro.tasa_falsos_positivos(), 6) if filtro else None,
+            "consultas": self.consultas,
+            "nuevos_sin_bd": self.nuevos,
+            "falsos_positivos": self.falsos_positivos,
+            "tasa_acierto": round(self.nuevos / self.consultas, 4) if self.consultas else 0.0,
+        }
+
+
+_filtros = {}
+_filtros_lock = threading.Lock()
+
+
+def filtro_para(modelo):
+    f = _filtros.get(modelo)
+    if f is None:
+        with _filtros_lock:
+            f = _filtros.setdefault(modelo, FiltroQR(modelo))
+    return f
+
+
+def precalentar():
+    """
+    Arranca la construccion de los filtros de las tablas de QR usados sin
+    esperar al primer escaneo. Se llama al cargar la aplicacion del worker.
+    """
+    if not _config("QR_FILTRO_ACTIVO", True):
+        return
+    for modelo in modelos_calientes():
+        filtro_para(modelo).asegurar()
+
+
+def _descartar_en_hijo():
+    # un fork hereda filtros a medio construir sin el hilo que los construia
+    global _filtros_lock
+    _filtros.clear()
+    _filtros_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_descartar_en_hijo)
+
+
+def qr_es_nuevo(modelo, qr_id):
+    """True si el filtro garantiza que el QR no esta en la tabla."""
+    return filtro_para(modelo).es_nuevo(str(qr_id))
+
+
+def qr_ya_usado(modelo, qr_id):
+    """
+    Reemplazo de modelo.objects.filter(qr_id=...).exists(): solo consulta
+    la tabla caliente y el archivo si el filtro no puede descartar el QR.
+    Un QR que otro worker registro y que ya se archivo esta en el filtro
+    porque es_nuevo() carga antes las filas archivadas nuevas.
+    """
+    f = filtro_para(modelo)
+    if f.es_nuevo(str(qr_id)):
+        return False
+    usado = modelo.objects.filter(qr_id=qr_id).exists() or qr_en_archivo(modelo, qr_id)
+    if not usado and f.filtro is not None and not f.construyendo:
+        f.falsos_positivos += 1
+    return usado
+
+
+def registrar_qr_en_filtro(modelo, *codigos):
+    f = filtro_para(modelo)
+    for c in codigos:
+        f.agregar(str(c))
+
+
+def estadisticas(*modelos):
+    return {m._meta.label: filtro_para(m).estadisticas() for m in modelos}
+
+
+@atexit.register
+def _guardar_al_salir():
+    for f in list(_filtros.values()):
+        if f.pendientes and not f.construyendo:
+            try:
+                f.guardar_snapshot()
+            except Exception:
+                pass
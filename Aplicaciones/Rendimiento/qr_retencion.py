@@ -0,0 +1,155 @@
+# Rendimiento/qr_retencion.py
+"""
+Retencion de las tablas de "QR ya usado".
+
+Las filas mas viejas que el horizonte configurado se mueven a una tabla de
+archivo (una por registro, con el periodo AAAA-MM) para que la tabla caliente
+y su indice unico se mantengan pequenos. El chequeo de duplicados consulta
+primero la tabla caliente y, como respaldo, una sola busqueda por indice
+unico en el archivo. Tras cada lote archivado se incrementa la marca
+"qr-archivo-<modelo>" para que el filtro QR de cada worker cargue las
+filas nuevas del archivo (ver qr_filtro.py).
+"""
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models.constants import OnConflict
+from django.utils import timezone
+
+from Aplicaciones.Usuario.marca_version import MarcaVersion
+
+
+# tabla caliente -> tabla de archivo
+ARCHIVOS = {
+    "Rendimiento.QRUsado": "Rendimiento.QRUsadoArchivo",
+    "Disponibilidad.QRDisponibilidadUsado": "Disponibilidad.QRDisponibilidadUsadoArchivo",
+    "Disponibilidad.QRDisponibilidadSalidaUsado": "Disponibilidad.QRDisponibilidadSalidaUsadoArchivo",
+}
+
+
+def modelo_archivo(modelo):
+    label = ARCHIVOS.get(modelo._meta.label)
+    return apps.get_model(label) if label else None
+
+
+def modelos_calientes():
+    return [apps.get_model(label) for label in ARCHIVOS]
+
+
+def marca_archivo(modelo):
+    """Marca que cambia cada vez que se archivan filas de la tabla caliente."""
+    return MarcaVersion(f"qr-archivo-{modelo._meta.label_lower}")
+
+
+def qr_en_archivo(modelo, qr_id):
+    archivo = modelo_archivo(modelo)
+    return archivo is not None and archivo.objects.filter(qr_id=qr_id).exists()
+
+
+def qr_usados(modelo, codigos):
+    """
+    De una lista de QR devuelve el set de los ya registrados, mirando la
+    tabla caliente y, solo para los que no estan ahi, el archivo.
+    """
+    codigos = list(codigos)
+    usados = set(modelo.objects.filter(qr_id__in=codigos).values_list("qr_id", flat=True))
+    resto = [c for c in codigos if c not in usados]
+    archivo = modelo_archivo(modelo)
+    if resto and archivo is not None:
+        usados |= set(archivo.objects.filter(qr_id__in=resto).values_list("qr_id", flat=True))
+    return usados
+
+
+FILAS_POR_INSERT = 400
+
+
+def registrar_nuevos(modelo, codigos):
+    """
+    Inserta los QR en la tabla caliente ignorando los que ya estan y
+    devuelve el set de los que inserto esta llamada. Llamar dentro de la
+    transaccion que suma los bonches: los insertados por otra peticion al
+    mismo tiempo no vuelven aqui aunque la consulta previa no los viera.
+
+    Con RETURNING (SQLite >= 3.35, PostgreSQL, MariaDB >= 10.5) es una
+    sentencia por bloque; en MySQL, un INSERT IGNORE por QR mirando
+    rowcount.
+    """
+    codigos = list(dict.fromkeys(codigos))
+    if not codigos:
+        return set()
+
+    ops = connection.ops
+    tabla = ops.quote_name(modelo._meta.db_table)
+    campo_fecha = modelo._meta.get_field("fecha_escaneo")
+    columnas = ", ".join(ops.quote_name(f.column) for f in (modelo._meta.get_field("qr_id"), campo_fecha))
+    sufijo = ops.on_conflict_suffix_sql([], OnConflict.IGNORE, None, None) or ""
+    fecha = campo_fecha.get_db_prep_save(timezone.now(), connection)
+    inicio = f"{ops.insert_statement(on_conflict=OnConflict.IGNORE)} {tabla} ({columnas}) VALUES "
+
+    insertados = set()
+    with connection.cursor() as cursor:
+        if connection.features.can_return_rows_from_bulk_insert:
+            for i in range(0, len(codigos), FILAS_POR_INSERT):
+                bloque = codigos[i:i + FILAS_POR_INSERT]
+                cursor.execute(
+                    inicio + ", ".join(["(%s, %s)"] * len(bloque))
+                    + f" {sufijo} RETURNING {ops.quote_name('qr_id')}",
+                    [v for c in bloque for v in (c, fecha)],
+                )
+                insertados.update(fila[0] for fila in cursor.fetchall())
+        else:
+            for codigo in codigos:
+                cursor.execute(f"{inicio}(%s, %s) {sufijo}", [codigo, fecha])
+                if cursor.rowcount == 1:
+                    insertados.add(codigo)
+    return insertados
+
+
+def limite_retencion(dias=None):
+    dias = dias if dias is not None else getattr(settings, "QR_RETENCION_DIAS", 90)
+    return timezone.now() - timedelta(days=int(dias))
+
+
+def archivar(modelo, antes_de, lote=5000):
+    """
+    Mueve a la tabla de archivo las filas con fecha_escaneo < antes_de,
+    en lotes (cada lote en su propia transaccion). Devuelve cuantas movio.
+    """
+    archivo = modelo_archivo(modelo)
+    movidas = 0
+
+    while True:
+        with transaction.atomic():
+            filas = list(modelo.objects
+                         .filter(fecha_escaneo__lt=antes_de)
+                         .order_by("id")
+                         .values_list("id", "qr_id", "fecha_escaneo")[:lote])
+            if not filas:
+                break
+
+            archivo.objects.bulk_create(
+                [
+                    archivo(
+                        qr_id=qr_id,
+                        fecha_escaneo=fecha,
+                        periodo=timezone.localtime(fecha).strftime("%Y-%m"),
+                    )
+                    for _, qr_id, fecha in filas
+                ],
+                ignore_conflicts=True,
+            )
+            modelo.objects.filter(id__in=[f[0] for f in filas]).delete()
+            # despues del commit: antes el filtro no veria las filas nuevas
+            transaction.on_commit(marca_archivo(modelo).incrementar)
+
+        movidas += len(filas)
+        if len(filas) < lote:
+            break
+
+    return movidas
+
+
+def contar_pendientes(modelo, antes_de):
+    return modelo.objects.filter(fecha_escaneo__lt=antes_de).count()
@@ -0,0 +1,170 @@
+# Rendimiento/recalculo.py
+"""
+Recalculo por lotes de los campos derivados de Rendimiento con NumPy.
+
+Reproduce exactamente Rendimiento.recalcular() (mismas reglas de redondeo)
+pero con aritmetica entera / punto fijo sobre arrays:
+
+- Las horas "estilo Excel" (7:30 -> 7.30) se llevan a centesimas enteras
+  (hh * 100 + mm), asi (final - inicio - 1) queda exacto en centesimas.
+- Ramos base = rendimiento * horas, redondeado "por la decima": con
+  P = rendimiento * centesimas, base = P // 100 + (P % 100 >= 50).
+- extras_por_hora usa el mismo round(x, 2) de Python; los pocos valores que
+  caen justo en un empate .5 se resuelven con round() para no diferir.
+
+Las horas se toman de los datetimes tal como vienen de la BD (UTC con
+USE_TZ), igual que recalcular() sobre una instancia leida de la BD.
+"""
+from collections import defaultdict
+
+import numpy as np
+from django.db import transaction
+
+from .models import Rendimiento
+from .resumen_diario import clave as clave_resumen, sumar_por_clave
+
+
+CAMPOS_DERIVADOS = list(Rendimiento.CAMPOS_DERIVADOS)
+CAMPOS_LECTURA = (["id", "hora_inicio", "hora_final", "rendimiento", "bonches"]
+                  + CAMPOS_DERIVADOS
+                  + ["qr_id", "numero_mesa", "fecha_entrada"])
+
+
+def _hhmm(dt):
+    return dt.hour * 100 + dt.minute if dt is not None else 0
+
+
+def _redondear_2(x):
+    """round(x, 2) de Python, vectorizado."""
+    escalado = x * 100
+    resultado = np.rint(escalado) / 100
+    # cerca de un empate .5 la multiplicacion puede desempatar distinto
+    dudosos = np.nonzero(np.abs(escalado - np.floor(escalado) - 0.5) < 1e-6)[0]
+    for i in dudosos:
+        resultado[i] = round(float(x[i]), 2)
+    return resultado
+
+
+def calcular(filas):
+    """
+    filas: lista de tuplas en el orden de CAMPOS_LECTURA.
+    Devuelve una lista de tuplas (horas, esperados, extras, extras_por_hora)
+    con None donde recalcular() tambien deja None.
+    """
+    n = len(filas)
+    if not n:
+        return []
+
+    validos = np.fromiter(
+        (f[1] is not None and f[2] is not None and f[3] is not None for f in filas),
+        dtype=bool, count=n,
+    )
+    inicio = np.fromiter((_hhmm(f[1]) for f in filas), dtype=np.int64, count=n)
+    final = np.fromiter((_hhmm(f[2]) for f in filas), dtype=np.int64, count=n)
+    rend = np.fromiter((f[3] or 0 for f in filas), dtype=np.int64, count=n)
+    bonches = np.fromiter((f[4] or 0 for f in filas), dtype=np.int64, count=n)
+
+    # 1) horas trabajadas en centesimas: (final - inicio) - 1, minimo 0
+    centesimas = np.maximum(final - inicio - 100, 0)
+    horas = centesimas / 100.0
+
+    # 2) ramos base con redondeo por la decima
+    producto = rend * centesimas
+    base = producto // 100 + (producto % 100 >= 50)
+
+    # 3) extras = reales - base (entero exacto)
+    extras = bonches - base
+
+    # 4) extras por hora
+    positivos = rend > 0
+    cociente = np.divide(extras.astype(np.float64), rend, out=np.zeros(n), where=positivos)
+    por_hora = np.where(positivos, _redondear_2(cociente), 0.0)
+
+    resultado = []
+    for i in range(n):
+        if validos[i]:
+            resultado.append((float(horas[i]), float(base[i]), float(extras[i]), float(por_hora[i])))
+        else:
+            resultado.append((None, None, None, None))
+    return resultado
+
+
+def verificar(filas, calculados):
+    """
+    Compara contra Rendimiento.recalcular() fila por fila.
+    Devuelve la lista de ids que no coinciden.
+    """
+    distintos = []
+    for f, esperado in zip(filas, calculados):
+        obj = Rendimiento(id=f[0], hora_inicio=f[1], hora_final=f[2], rendimiento=f[3], bonches=f[4])
+        obj.recalcular()
+        real = tuple(getattr(obj, c) for c in CAMPOS_DERIVADOS)
+        if real != esperado:
+            distintos.append(f[0])
+    return distintos
+
+
+def recalcular_queryset(queryset, lote=5000, verificar_equivalencia=False, guardar=True, rendimiento=None):
+    """
+    Recorre el queryset por id en lotes, recalcula con NumPy y escribe con
+    bulk_update solo las filas cuyo resultado cambio; el resumen diario se
+    ajusta con la diferencia de cada dia/mesa afectado.
+
+    Cada lote se lee y se escribe en su propia transaccion, asi una corrida
+    larga no retiene bloqueos ni deja todo sin guardar si se corta (volver a
+    correrla sigue donde quedo: lo ya recalculado no cambia). Con
+    rendimiento se cambia primero el rendimiento base de las filas del
+    lote. Si se verifica y el lote no coincide con recalcular(), ese lote
+    no se escribe.
+    Genera un dict por lote con: leidas, cambiadas, distintos (si se verifica).
+    """
+    ultimo_id = 0
+    while True:
+        with transaction.atomic():
+            filas = list(queryset
+                         .filter(id__gt=ultimo_id)
+                         .order_by("id")
+                         .values_list(*CAMPOS_LECTURA)[:lote])
+            if not filas:
+                return
+            ultimo_id = filas[-1][0]
+
+            if rendimiento is not None:
+                filas = [f[:3] + (rendimiento,) + f[4:] for f in filas]
+                if guardar:
+                    Rendimiento.objects.filter(id__in=[f[0] for f in filas]).update(rendimiento=rendimiento)
+
+            calculados = calcular(filas)
+
+            cambiados = []
+            deltas = defaultdict(dict)
+            for f, nuevos in zip(filas, calculados):
+                previos = tuple(f[5:9])
+                if previos == nuevos:
+                    continue
+                obj = Rendimiento(id=f[0])
+                for campo, valor in zip(CAMPOS_DERIVADOS, nuevos):
+                    setattr(obj, campo, valor)
+                cambiados.append(obj)
+
+                k = clave_resumen(*f[9:12])
+                if k is not None:
+                    # extras_por_hora no se acumula en el resumen
+                    for campo, antes, despues in zip(CAMPOS_DERIVADOS[:3], previos, nuevos):
+                        deltas[k][campo] = deltas[k].get(campo, 0) + (despues or 0) - (antes or 0)
+
+            distintos = verificar(filas, calculados) if verificar_equivalencia else []
+            if distintos:
+                transaction.set_rollback(True)
+            elif guardar and cambiados:
+                Rendimiento.objects.bulk_update(cambiados, CAMPOS_DERIVADOS, batch_size=1000)
+                sumar_por_clave(deltas)
+
+        yield {
+            "leidas": len(filas),
+            "cambiadas": len(cambiados),
+            "distintos": distintos,
+        }
+
+        if len(filas) < lote:
+            return
@@ -0,0 +1,161 @@
+# Rendimiento/resumen_diario.py
+"""
+Mantenimiento del resumen diario por mesa (ResumenDiarioMesa).
+
+Cada jornada (qr_id="JORNADA") aporta a la fila (fecha local de
+fecha_entrada, numero_mesa): 1 jornada, sus bonches, horas y ramos. Cuando
+una jornada se crea, recibe escaneos, se edita o se borra, se aplica solo la
+diferencia con UPDATE ... SET campo = campo + delta, dentro de la misma
+transaccion que el cambio de la jornada.
+"""
+from collections import defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from Aplicaciones.Usuario.fecha_local import filtrar_por_fecha
+
+from .models import Rendimiento, ResumenDiarioMesa
+
+
+CAMPOS_RESUMEN = ("jornadas", "bonches", "horas_trabajadas", "ramos_esperados", "ramos_extras")
+CAMPOS_FILA = ("qr_id", "numero_mesa", "fecha_entrada", "bonches",
+               "horas_trabajadas", "ramos_esperados", "ramos_extras")
+
+
+def clave(qr_id, numero_mesa, fecha_entrada):
+    """(fecha, mesa) del resumen al que aporta una fila, o None si no aporta."""
+    if qr_id != "JORNADA" or fecha_entrada is None:
+        return None
+    return (timezone.localdate(fecha_entrada), str(numero_mesa).strip())
+
+
+def aporte(fila):
+    """
+    fila: dict (o instancia) con CAMPOS_FILA.
+    Devuelve (clave, {campo: valor}) o None.
+    """
+    if fila is None:
+        return None
+    if not isinstance(fila, dict):
+        fila = {c: getattr(fila, c) for c in CAMPOS_FILA}
+    k = clave(fila["qr_id"], fila["numero_mesa"], fila["fecha_entrada"])
+    if k is None:
+        return None
+    return k, {
+        "jornadas": 1,
+        "bonches": fila["bonches"] or 0,
+        "horas_trabajadas": fila["horas_trabajadas"] or 0,
+        "ramos_esperados": fila["ramos_esperados"] or 0,
+        "ramos_extras": fila["ramos_extras"] or 0,
+    }
+
+
+def aportes_guardados(pk):
+    """
+    Valores actuales en la BD de una fila (antes de guardarla o borrarla).
+    Llamar dentro de la transaccion del cambio: la fila queda bloqueada
+    (select_for_update) hasta el commit, asi un escaneo o un save()
+    concurrente no la cambia entre esta lectura y el delta.
+    """
+    return Rendimiento.objects.select_for_update().filter(pk=pk).values(*CAMPOS_FILA).first()
+
+
+def _aplicar(k, delta):
+    delta = {c: v for c, v in delta.items() if v}
+    if not delta:
+        return
+    fecha, mesa = k
+    filtro = ResumenDiarioMesa.objects.filter(fecha=fecha, numero_mesa=mesa)
+    cambios = {c: F(c) + v for c, v in delta.items()}
+    if filtro.update(**cambios):
+        if delta.get("jornadas", 0) < 0:
+            # el dia/mesa se quedo sin jornadas (borrada o movida)
+            filtro.filter(jornadas__lte=0).delete()
+        return
+    try:
+        with transaction.atomic():
+            ResumenDiarioMesa.objects.create(fecha=fecha, numero_mesa=mesa, **delta)
+    except IntegrityError:
+        # otra transaccion creo la fila del dia al mismo tiempo
+        filtro.update(**cambios)
+
+
+def aplicar_cambio(previo, nuevo):
+    """Resta el aporte previo y suma el nuevo (cualquiera puede ser None)."""
+    antes = aporte(previo)
+    despues = aporte(nuevo)
+    deltas = defaultdict(lambda: dict.fromkeys(CAMPOS_RESUMEN, 0))
+    if antes:
+        for c, v in antes[1].items():
+            deltas[antes[0]][c] -= v
+    if despues:
+        for c, v in despues[1].items():
+            deltas[despues[0]][c] += v
+    for k, delta in deltas.items():
+        _aplicar(k, delta)
+
+
+def sumar(obj, **delta):
+    """Suma deltas sueltos (p. ej. bonches de un escaneo) al dia/mesa de obj."""
+    k = clave(obj.qr_id, obj.numero_mesa, obj.fecha_entrada)
+    if k is not None:
+        _aplicar(k, delta)
+
+
+def sumar_por_clave(deltas):
+    """deltas: {(fecha, mesa): {campo: valor}} acumulados por el llamador."""
+    for k, delta in deltas.items():
+        _aplicar(k, delta)
+
+
+def reconstruir(desde=None, hasta=None, lote=5000):
+    """
+    Recalcula el resumen desde Rendimiento para el rango de fechas locales
+    dado (ambos inclusive; None = sin limite). Devuelve cuantas filas de
+    resumen quedaron.
+
+    Las jornadas del rango se leen bloqueadas dentro de la misma transaccion
+    que reemplaza el resumen: un escaneo que llega mientras tanto espera el
+    commit y suma su delta sobre las filas nuevas, no sobre las borradas.
+    """
+    jornadas = filtrar_por_fecha(Rendimiento.objects.filter(qr_id="JORNADA"), desde=desde, hasta=hasta)
+
+    existentes = ResumenDiarioMesa.objects.all()
+    if desde:
+        existentes = existentes.filter(fecha__gte=desde)
+    if hasta:
+        existentes = existentes.filter(fecha__lte=hasta)
+
+    with transaction.atomic():
+        totales = defaultdict(lambda: dict.fromkeys(CAMPOS_RESUMEN, 0))
+        for fila in jornadas.select_for_update().values(*CAMPOS_FILA).iterator(chunk_size=lote):
+            k, valores = aporte(fila)
+            for c, v in valores.items():
+                totales[k][c] += v
+
+        existentes.delete()
+        ResumenDiarioMesa.objects.bulk_create(
+            [ResumenDiarioMesa(fecha=f, numero_mesa=m, **v) for (f, m), v in totales.items()],
+            batch_size=1000,
+        )
+    return len(totales)
+
+
+def resumen_rango(desde=None, hasta=None, mesas=None):
+    """
+    Filas del resumen (por dia y mesa) y totales del rango.
+    Lee dias x mesas filas, no los escaneos.
+    """
+    qs = ResumenDiarioMesa.objects.all()
+    if desde:
+        qs = qs.filter(fecha__gte=desde)
+    if hasta:
+        qs = qs.filter(fecha__lte=hasta)
+    if mesas:
+        qs = qs.filter(numero_mesa__in=mesas)
+
+    filas = list(qs.values("fecha", "numero_mesa", *CAMPOS_RESUMEN))
+    totales = qs.aggregate(**{c: Sum(c) for c in CAMPOS_RESUMEN})
+    return filas, {c: (v or 0) for c, v in totales.items()}
@@ -3,4 +3,5 @@ from . import consumers
 
 websocket_urlpatterns = [
     path("ws/rendimientos/", consumers.RendimientoConsumer.as_asgi()),
+    path("ws/rendimientos/mesa/<str:mesa>/", consumers.RendimientoConsumer.as_asgi()),
 ]
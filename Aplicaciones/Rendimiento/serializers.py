@@ -1,13 +1,18 @@
 # Rendimiento/serializers.py
 from rest_framework import serializers
+from Aplicaciones.Usuario.serializacion_rapida import SerializadorRapido
 from .models import Rendimiento, JornadaLaboral
 
 class RendimientoSerializer(serializers.ModelSerializer):
     class Meta:
         model = Rendimiento
-        fields = '__all__'
+        exclude = ['mesa_orden', 'fecha_local']   # columnas internas de orden/filtro, no son parte de la API
         read_only_fields = ['horas_trabajadas', 'ramos_esperados', 'ramos_extras', 'extras_por_hora']
 
+
+# Listados y broadcasts: mismo JSON que RendimientoSerializer, leyendo values()
+rendimiento_rapido = SerializadorRapido(RendimientoSerializer)
+
 class JornadaLaboralSerializer(serializers.ModelSerializer):
     class Meta:
         model = JornadaLaboral
@@ -1,26 +1,57 @@
-from asgiref.sync import async_to_sync
-from channels.layers import get_channel_layer
 from .models import Rendimiento
-from .serializers import RendimientoSerializer
-from django.db.models.signals import post_save
+from .serializers import rendimiento_rapido
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
 from django.dispatch import receiver
-from .models import Rendimiento
+from Aplicaciones.Usuario.suscripciones import difundir_filtrado
+
+
+def notificar_rendimiento(rendimiento, data=None):
+    """
+    Unica entrada para difundir jornadas: se encola tras el commit para el
+    proximo lote del grupo "rendimientos" y del de su mesa (ver
+    Usuario/difusion.py y Usuario/suscripciones.py).
+    """
+    if data is None:
+        data = rendimiento_rapido.instancia(rendimiento)
+    difundir_filtrado("rendimientos", "lote_rendimientos", data)
+
+
+def notificar_rendimientos(data):
+    """Igual que notificar_rendimiento para una lista ya serializada."""
+    difundir_filtrado("rendimientos", "lote_rendimientos", data)
+
 
+def _invalidar_cache_jornadas(instance):
+    mesas = set()
+    if instance.qr_id == "JORNADA":
+        mesas.add(instance.numero_mesa)
+    # save() deja los valores que tenia la fila: una jornada que cambia de
+    # mesa invalida tambien la mesa anterior
+    previo = getattr(instance, "_previo_guardado", None)
+    if previo and previo["qr_id"] == "JORNADA":
+        mesas.add(previo["numero_mesa"])
+    if not mesas:
+        return
+    from .jornada_cache import invalidar
+    # despues del commit, para que otro worker no relea el estado anterior
+    for mesa in mesas:
+        transaction.on_commit(lambda mesa=mesa: invalidar(mesa))
 
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
 
-channel_layer = get_channel_layer()
+@receiver(post_save, sender=Rendimiento)
+def jornada_guardada(sender, instance, **kwargs):
+    _invalidar_cache_jornadas(instance)
 
-def notificar_rendimiento(rendimiento):
-    data = RendimientoSerializer(rendimiento).data
-    async_to_sync(channel_layer.group_send)(
-        "rendimientos",
-        {
-            "type": "nuevo_rendimiento",
-            "data": data
-        }
-    )
 
+@receiver(post_delete, sender=Rendimiento)
+def jornada_eliminada(sender, instance, **kwargs):
+    _invalidar_cache_jornadas(instance)
 
 
+@receiver(pre_delete, sender=Rendimiento)
+def restar_del_resumen_diario(sender, instance, **kwargs):
+    # pre_delete corre dentro de la transaccion del borrado; se resta lo que
+    # la fila tiene guardado en la BD, no la copia en memoria.
+    from .resumen_diario import aplicar_cambio, aportes_guardados
+    aplicar_cambio(aportes_guardados(instance.pk), None)
@@ -1,3 +1,1123 @@
-from django.test import TestCase
+import io
+import math
+import os
+import random
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone as dt_timezone
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, OperationalError, connection
+from asgiref.testing import ApplicationCommunicator
+from channels.layers import get_channel_layer
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from Aplicaciones.Usuario.jwt_utils import crear_access_token
+from Aplicaciones.Usuario.json_rapido import JSONRendererRapido, loads
+from Aplicaciones.Usuario.models import Usuario
+from Aplicaciones.Usuario.respuesta_stream import respuesta_stream
+from Aplicaciones.Usuario import cuerpo_json, jwt_decorators, paginacion, suscripciones
+from Aplicaciones.Usuario.marca_version import MarcasCompartidas, MarcaVersion
+from Aplicaciones.Usuario import usuario_cache
+
+from . import jornada_cache, qr_filtro, recalculo, resumen_diario
+from . import api_views
+from .models import Rendimiento, QRUsado, QRUsadoArchivo, ResumenDiarioMesa, orden_mesa
+from .consumers import RendimientoConsumer
+from .management.commands.verificar_indices import _tablas_recorridas_sqlite
+from .qr_retencion import archivar, limite_retencion, registrar_nuevos
+from .serializers import RendimientoSerializer, rendimiento_rapido
+from .views import listado_rendimientos, registrar_escaneo
+
+
+def crear_usuario(mesa="7"):
+    # los ids se repiten entre tests: que no quede un usuario de otro test
+    usuario_cache.invalidar()
+    usuario = Usuario(nombres="Ana", apellidos="Paz", mesa=mesa, cargo="ADMIN", username=f"admin{mesa}")
+    usuario.set_password("secreto1")
+    usuario.save()
+    return usuario
+
+
+def cabecera_jwt(usuario):
+    token = crear_access_token({
+        "sub": str(usuario.id), "type": "access", "username": usuario.username,
+        "cargo": usuario.cargo, "mesa": usuario.mesa,
+    })
+    return {"HTTP_AUTHORIZATION": "Bearer " + token}
+
+
+def crear_jornada(mesa="7", **campos):
+    ahora = timezone.now()
+    datos = {"qr_id": "JORNADA", "numero_mesa": mesa, "fecha_entrada": ahora, "hora_inicio": ahora,
+             "rendimiento": 10, "ramos_base": 100}
+    datos.update(campos)
+    return Rendimiento.objects.create(**datos)
+
+
+class RegistrarNuevosTests(TestCase):
+
+    def test_devuelve_solo_los_insertados(self):
+        QRUsado.objects.create(qr_id="A")
+        self.assertEqual(registrar_nuevos(QRUsado, ["A", "B", "C", "B"]), {"B", "C"})
+        self.assertEqual(registrar_nuevos(QRUsado, ["B", "C"]), set())
+        self.assertEqual(QRUsado.objects.count(), 3)
+
+    def test_sin_returning_un_insert_por_qr(self):
+        # MySQL: INSERT IGNORE fila por fila mirando rowcount
+        with mock.patch.object(type(connection.features), "can_return_rows_from_bulk_insert", False):
+            QRUsado.objects.create(qr_id="A")
+            self.assertEqual(registrar_nuevos(QRUsado, ["A", "B"]), {"B"})
+
+
+class FiltroQRTests(TestCase):
+
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        ajustes = override_settings(QR_FILTRO_DIR=directorio.name)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+    def filtro_listo(self, modelo=QRUsado):
+        filtro = qr_filtro.FiltroQR(modelo)
+        filtro.construir()
+        patcher = mock.patch.dict(qr_filtro._filtros, {modelo: filtro})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return filtro
+
+    def test_qr_archivado_por_otro_worker_no_se_acepta(self):
+        filtro = self.filtro_listo()
+        self.assertTrue(filtro.es_nuevo("ARCH-1"))
+        # otro worker lo registro y luego se archivo: este filtro no lo vio
+        qr = QRUsado.objects.create(qr_id="ARCH-1")
+        QRUsado.objects.filter(pk=qr.pk).update(fecha_escaneo=timezone.now() - timedelta(days=400))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(archivar(QRUsado, limite_retencion(90)), 1)
+
+        self.assertTrue(qr_filtro.qr_ya_usado(QRUsado, "ARCH-1"))
+        self.assertEqual(filtro.ultimos[1], QRUsadoArchivo.objects.get(qr_id="ARCH-1").id)
+
+    def test_qr_nuevo_sin_consultas(self):
+        QRUsado.objects.create(qr_id="USADO-1")
+        self.filtro_listo()
+        with self.assertNumQueries(0):
+            self.assertFalse(qr_filtro.qr_ya_usado(QRUsado, "NUEVO-1"))
+        # "quizas usado": se confirma en la BD
+        with self.assertNumQueries(1):
+            self.assertTrue(qr_filtro.qr_ya_usado(QRUsado, "USADO-1"))
+
+    @override_settings(QR_FILTRO_CAPACIDAD_MINIMA=1000)
+    def test_se_reconstruye_al_superar_la_capacidad(self):
+        filtro = self.filtro_listo()
+        self.assertEqual(filtro.filtro.capacidad, 1000)
+        # algunos codigos caen en bits ya puestos y no cuentan: 1100 > 1000 de sobra
+        codigos = [f"CAP-{i}" for i in range(1100)]
+        with mock.patch.object(filtro, "asegurar") as asegurar:
+            qr_filtro.registrar_qr_en_filtro(QRUsado, *codigos)
+        asegurar.assert_called_with(reconstruir=True)
+
+        QRUsado.objects.bulk_create([QRUsado(qr_id=c) for c in codigos])
+        filtro.construir(desde_cero=True)
+        self.assertEqual(filtro.filtro.capacidad, 2200)
+        self.assertGreater(filtro.filtro.elementos, 1080)
+        self.assertLess(filtro.filtro.tasa_falsos_positivos(), 0.01)
+
+    @override_settings(QR_FILTRO_CAPACIDAD_MINIMA=1000)
+    def test_snapshot_chico_no_se_reutiliza_lleno(self):
+        self.filtro_listo()  # guarda un snapshot de capacidad 1000
+        QRUsado.objects.bulk_create([QRUsado(qr_id=f"SNAP-{i}") for i in range(3000)])
+        filtro = qr_filtro.FiltroQR(QRUsado)
+        filtro.construir()
+        self.assertEqual(filtro.filtro.capacidad, 6000)
+        self.assertTrue(all(f"SNAP-{i}" in filtro.filtro for i in range(3000)))
+
+    def test_filas_archivadas_no_cuentan_dos_veces(self):
+        viejo = timezone.now() - timedelta(days=400)
+        QRUsado.objects.bulk_create([QRUsado(qr_id=f"ARCH-{i}") for i in range(50)])
+        QRUsado.objects.update(fecha_escaneo=viejo)
+        filtro = self.filtro_listo()
+        self.assertEqual(filtro.filtro.elementos, 50)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            archivar(QRUsado, limite_retencion(90))
+        self.assertTrue(filtro.archivo_al_dia())
+        self.assertEqual(filtro.ultimos[1], QRUsadoArchivo.objects.order_by("-id").first().id)
+        self.assertEqual(filtro.filtro.elementos, 50)
+
+    def test_benchmark_qr_ya_usado_a_escala(self):
+        """
+        qr_ya_usado() con un filtro de QR_BENCH_CODIGOS codigos (20 millones
+        por defecto) contra las dos consultas por indice unico de antes.
+        El filtro se llena con la densidad de bits que dejan esos codigos
+        (insertarlos uno por uno tardaria minutos); las filas reales de la
+        BD se agregan encima y deben dar siempre "quizas usado".
+        """
+        codigos = int(os.environ.get("QR_BENCH_CODIGOS", 20_000_000))
+        filas = int(os.environ.get("QR_BENCH_FILAS", 100_000))
+        QRUsado.objects.bulk_create([QRUsado(qr_id=f"USADO-{i}") for i in range(filas)], batch_size=10_000)
+        QRUsadoArchivo.objects.bulk_create(
+            [QRUsadoArchivo(qr_id=f"ARCH-{i}", fecha_escaneo=timezone.now(), periodo="2026-01")
+             for i in range(filas // 4)], batch_size=10_000)
+
+        filtro = self.filtro_listo()
+        bloom = qr_filtro.FiltroBloom(codigos * 2)
+        densidad = 1 - math.exp(-bloom.k * codigos / bloom.m)
+        azar = np.random.default_rng(3)
+        tramo = 1 << 26
+        for inicio in range(0, bloom.m, tramo):
+            n = min(tramo, bloom.m - inicio)
+            bloque = np.packbits(azar.random(n, dtype=np.float32) < densidad, bitorder="little")
+            bloom.bits[inicio // 8:inicio // 8 + len(bloque)] = bloque.tobytes()
+        bloom.elementos = codigos
+        for (qr_id,) in QRUsado.objects.values_list("qr_id").iterator(chunk_size=20_000):
+            bloom.agregar(qr_id)
+        for (qr_id,) in QRUsadoArchivo.objects.values_list("qr_id").iterator(chunk_size=20_000):
+            bloom.agregar(qr_id)
+        filtro.filtro = bloom
+
+        nuevos = [f"NUEVO-{i}" for i in range(20_000)]
+        with CaptureQueriesContext(connection) as consultas:
+            inicio = time.perf_counter()
+            aceptados = sum(1 for c in nuevos if not qr_filtro.qr_ya_usado(QRUsado, c))
+            seg_filtro = (time.perf_counter() - inicio) / len(nuevos)
+        falsos_positivos = filtro.falsos_positivos
+
+        muestra = nuevos[:2000]
+        inicio = time.perf_counter()
+        for c in muestra:
+            QRUsado.objects.filter(qr_id=c).exists() or QRUsadoArchivo.objects.filter(qr_id=c).exists()
+        seg_bd = (time.perf_counter() - inicio) / len(muestra)
+
+        print(f"\n  filtro QR: {codigos:,} codigos en {len(bloom.bits) / 2**20:.0f} MiB, "
+              f"qr_ya_usado {seg_filtro * 1e6:.1f} us/escaneo ({len(consultas)} consultas en {len(nuevos)}), "
+              f"BD (caliente + archivo, {filas:,} filas) {seg_bd * 1e6:.1f} us/escaneo, "
+              f"falsos positivos {falsos_positivos}/{len(nuevos)} "
+              f"(estimado {bloom.tasa_falsos_positivos():.4f})")
+        self.assertEqual(aceptados, len(nuevos))
+        self.assertTrue(all(qr_filtro.qr_ya_usado(QRUsado, f"USADO-{i}") for i in range(0, filas, 97)))
+        self.assertTrue(all(qr_filtro.qr_ya_usado(QRUsado, f"ARCH-{i}") for i in range(0, filas // 4, 97)))
+        # solo los falsos positivos van a la BD (tabla caliente y archivo)
+        self.assertEqual(len(consultas), 2 * falsos_positivos)
+        self.assertLess(falsos_positivos / len(nuevos), 0.02)
+        self.assertLess(seg_filtro, seg_bd)
+
+
+# sin el filtro QR: su hilo de construccion no debe tocar la BD de los tests
+@override_settings(QR_FILTRO_ACTIVO=False)
+class RendimientoLoteTests(TestCase):
+
+    def setUp(self):
+        jornada_cache.invalidar()
+        self.usuario = crear_usuario()
+        self.jornada = crear_jornada()
+        self.url = "/api/rendimientos/lote/"
+
+    def enviar(self, codigos, mesa="7"):
+        escaneos = [{"qr_id": c, "numero_mesa": mesa} for c in codigos]
+        return self.client.post(self.url, {"escaneos": escaneos}, content_type="application/json",
+                                **cabecera_jwt(self.usuario))
+
+    def estados(self, respuesta):
+        return {r["qr_id"]: r["estado"] for r in respuesta.json()["resultados"]}
+
+    def test_acepta_y_suma_solo_los_nuevos(self):
+        QRUsado.objects.create(qr_id="L1")
+        QRUsadoArchivo.objects.create(qr_id="L2", fecha_escaneo=timezone.now(), periodo="2026-01")
+        respuesta = self.enviar(["L1", "L2", "L3", "L4"])
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(self.estados(respuesta),
+                         {"L1": "duplicado", "L2": "duplicado", "L3": "aceptado", "L4": "aceptado"})
+        self.jornada.refresh_from_db()
+        self.assertEqual(self.jornada.bonches, 2)
+
+    def test_insertado_por_otra_peticion_no_se_cuenta(self):
+        # la consulta previa no ve el QR (otra peticion lo inserta despues)
+        with mock.patch("Aplicaciones.Rendimiento.views.qr_usados", return_value=set()):
+            QRUsado.objects.create(qr_id="C1")
+            respuesta = self.enviar(["C1", "C2"])
+        self.assertEqual(self.estados(respuesta), {"C1": "duplicado", "C2": "aceptado"})
+        self.assertEqual(respuesta.json()["aceptados"], 1)
+        self.jornada.refresh_from_db()
+        self.assertEqual(self.jornada.bonches, 1)
+
+    def test_jornada_cerrada_a_mitad_de_lote_no_deja_qr_usados(self):
+        with mock.patch.object(Rendimiento, "sumar_bonches", return_value=None):
+            respuesta = self.enviar(["S1", "S2"])
+        self.assertEqual(self.estados(respuesta), {"S1": "sin_jornada", "S2": "sin_jornada"})
+        self.assertEqual(respuesta.json()["aceptados"], 0)
+        self.assertFalse(QRUsado.objects.filter(qr_id__in=["S1", "S2"]).exists())
+
+        # con jornada otra vez se pueden escanear
+        respuesta = self.enviar(["S1", "S2"])
+        self.assertEqual(self.estados(respuesta), {"S1": "aceptado", "S2": "aceptado"})
+
+
+@override_settings(QR_FILTRO_ACTIVO=False)
+class FinalizarJornadaTests(TestCase):
+
+    def setUp(self):
+        jornada_cache.invalidar()
+        self.usuario = crear_usuario()
+        self.jornada = crear_jornada(hora_inicio=timezone.now() - timedelta(hours=3))
+
+    def finalizar(self):
+        return self.client.post("/api/jornada/finalizar/", {"mesa": "7"}, content_type="application/json",
+                                **cabecera_jwt(self.usuario))
+
+    def test_no_pisa_bonches_de_un_escaneo_concurrente(self):
+        cargada = Rendimiento.objects.get(pk=self.jornada.pk)  # la vista ya la leyo...
+        Rendimiento.sumar_bonches(self.jornada.pk, 5)           # ...y entra un escaneo
+        with mock.patch("Aplicaciones.Rendimiento.api_views.jornada_activa", return_value=cargada):
+            respuesta = self.finalizar()
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.json()["data"]["bonches"], 5)
+        self.jornada.refresh_from_db()
+        self.assertEqual(self.jornada.bonches, 5)
+        self.assertIsNotNone(self.jornada.hora_final)
+        self.assertIsNotNone(self.jornada.horas_trabajadas)
+
+    def test_escaneo_despues_de_cerrar_no_suma(self):
+        self.assertEqual(self.finalizar().status_code, 200)
+        self.assertIsNone(Rendimiento.sumar_bonches(self.jornada.pk))
+        self.assertEqual(self.finalizar().status_code, 404)
+        self.assertIsNone(Rendimiento.finalizar(self.jornada.pk))
+
+
+@override_settings(QR_FILTRO_ACTIVO=False)
+class ResumenDiarioTests(TestCase):
+    """El resumen mantenido en linea debe quedar igual que reconstruir()."""
+
+    def setUp(self):
+        jornada_cache.invalidar()
+        self.usuario = crear_usuario()
+        self.cabecera = cabecera_jwt(self.usuario)
+
+    def resumen(self):
+        return sorted(
+            (f["fecha"], f["numero_mesa"], f["jornadas"], f["bonches"],
+             round(f["horas_trabajadas"], 6), round(f["ramos_esperados"], 6), round(f["ramos_extras"], 6))
+            for f in ResumenDiarioMesa.objects.values()
+        )
+
+    def assert_como_reconstruir(self, esperadas=None):
+        incremental = self.resumen()
+        resumen_diario.reconstruir()
+        self.assertEqual(incremental, self.resumen())
+        if esperadas is not None:
+            self.assertEqual(len(incremental), esperadas)
+
+    def post(self, url, datos):
+        # on_commit: invalida el cache de jornadas como en produccion
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(url, datos, content_type="application/json", **self.cabecera)
+
+    def test_ciclo_de_una_jornada(self):
+        # inicio
+        self.assertEqual(self.post("/api/jornada/iniciar/", {"mesa": "7"}).status_code, 201)
+        self.assert_como_reconstruir(1)
+        jornada = Rendimiento.objects.get(qr_id="JORNADA", numero_mesa="7")
+        Rendimiento.objects.filter(pk=jornada.pk).update(hora_inicio=timezone.now() - timedelta(hours=5))
+
+        # escaneos sueltos y en lote
+        for i in range(3):
+            self.assertEqual(registrar_escaneo(f"R{i}", "7")[0], "aceptado")
+        self.assert_como_reconstruir(1)
+        lote = self.post("/api/rendimientos/lote/", {"escaneos": [{"qr_id": f"L{i}", "numero_mesa": "7"}
+                                                                 for i in range(4)]})
+        self.assertEqual(lote.json()["aceptados"], 4)
+        self.assert_como_reconstruir(1)
+
+        # fin: horas y ramos pasan a contar
+        self.assertEqual(self.post("/api/jornada/finalizar/", {"mesa": "7"}).status_code, 200)
+        self.assert_como_reconstruir(1)
+        self.assertEqual(ResumenDiarioMesa.objects.get().bonches, 7)
+
+        # edicion por la API y con una copia cargada antes de otro cambio
+        respuesta = self.client.put(f"/api/rendimientos/{jornada.pk}/", {"bonches": 40, "rendimiento": 9},
+                                    content_type="application/json", **self.cabecera)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assert_como_reconstruir(1)
+        vieja = Rendimiento.objects.get(pk=jornada.pk)
+        Rendimiento.objects.get(pk=jornada.pk).save()
+        vieja.hora_inicio -= timedelta(hours=1)
+        vieja.save()
+        self.assert_como_reconstruir(1)
+
+        # cambio de mesa y de dia: la fila vieja se vacia y se borra
+        vieja.numero_mesa = "8"
+        vieja.save()
+        self.assert_como_reconstruir(1)
+        self.assertEqual(ResumenDiarioMesa.objects.get().numero_mesa, "8")
+        vieja.fecha_entrada -= timedelta(days=1)
+        vieja.save()
+        self.assert_como_reconstruir(1)
+
+        # borrado
+        self.assertEqual(self.client.delete(f"/api/rendimientos/{jornada.pk}/", **self.cabecera).status_code, 204)
+        self.assert_como_reconstruir(0)
+
+    def test_varias_mesas_y_borrado_por_queryset(self):
+        for mesa in ("1", "2", "2"):
+            crear_jornada(mesa=mesa, hora_inicio=timezone.now() - timedelta(hours=4),
+                          hora_final=timezone.now(), bonches=30)
+        crear_jornada(mesa="3")  # abierta
+        for i in range(5):
+            registrar_escaneo(f"Q{i}", "3")
+        self.assert_como_reconstruir(3)
+        self.assertEqual(ResumenDiarioMesa.objects.get(numero_mesa="2").jornadas, 2)
+
+        Rendimiento.objects.filter(numero_mesa="2").delete()
+        self.assert_como_reconstruir(2)
+
+    def test_reconstruir_por_rango_no_toca_otros_dias(self):
+        ayer = timezone.now() - timedelta(days=1)
+        crear_jornada(fecha_entrada=ayer, hora_inicio=ayer, hora_final=ayer + timedelta(hours=3), bonches=10)
+        hoy = crear_jornada(bonches=5)
+        ResumenDiarioMesa.objects.filter(fecha=timezone.localdate(ayer)).update(bonches=999)
+
+        resumen_diario.reconstruir(desde=timezone.localdate(ayer), hasta=timezone.localdate(ayer))
+        self.assertEqual(ResumenDiarioMesa.objects.get(fecha=timezone.localdate(ayer)).bonches, 10)
+        self.assertEqual(ResumenDiarioMesa.objects.get(fecha=timezone.localdate(hoy.fecha_entrada)).bonches, 5)
+
+
+def _bloqueada(error):
+    return isinstance(error, OperationalError) and "locked" in str(error)
+
+
+def _esperar_bloqueos(execute, sql, params, many, context):
+    # SQLite en memoria de los tests bloquea tablas enteras y falla en vez
+    # de esperar el lock como MySQL. Fuera de una transaccion se reintenta
+    # la sentencia; dentro se deja fallar (esperar con locks tomados puede
+    # trabarse) y _reintentar() repite la transaccion completa.
+    while True:
+        try:
+            return execute(sql, params, many, context)
+        except OperationalError as error:
+            if not _bloqueada(error) or connection.in_atomic_block:
+                raise
+            time.sleep(0.0002)
+
+
+# hace de lock de la fila de la jornada: en MySQL las transacciones que la
+# actualizan esperan en cola; sin esto SQLite las reintenta al azar
+_fila_jornada = threading.Lock()
+
+
+def _reintentar(funcion):
+    with _fila_jornada:
+        while True:
+            try:
+                return funcion()
+            except OperationalError as error:
+                if not _bloqueada(error):
+                    raise
+                time.sleep(0.0002)
+
+
+def _escaneo_anterior(codigo, mesa):
+    """El camino de escaneo de antes: leer la jornada, exists(), insertar y save() completo."""
+    jornada = (Rendimiento.objects
+               .filter(qr_id="JORNADA", numero_mesa=mesa, hora_final__isnull=True)
+               .order_by("-hora_inicio", "-fecha_entrada")
+               .first())
+    if jornada is None or QRUsado.objects.filter(qr_id=codigo).exists():
+        return
+    try:
+        QRUsado.objects.create(qr_id=codigo)
+    except IntegrityError:
+        return
+    jornada.bonches += 1
+    jornada.recalcular()
+    _reintentar(jornada.save)
+
+
+def _escaneo_nuevo(codigo, mesa):
+    _reintentar(lambda: registrar_escaneo(codigo, mesa))
+
+
+class EscaneoConcurrenteTests(TransactionTestCase):
+    """
+    Benchmark: TABLETS hilos escaneando la misma mesa con el camino anterior
+    y con registrar_escaneo(). Escaneos por segundo, p99 y bonches perdidos.
+    """
+
+    TABLETS = 8
+    ESCANEOS = 60  # por tablet
+
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        ajustes = override_settings(QR_FILTRO_DIR=directorio.name, VERSIONES_DIR=directorio.name)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        jornada_cache.invalidar()
+
+        filtro = qr_filtro.FiltroQR(QRUsado)
+        filtro.construir()
+        parche = mock.patch.dict(qr_filtro._filtros, {QRUsado: filtro})
+        parche.start()
+        self.addCleanup(parche.stop)
+
+    def correr(self, escanear, prefijo):
+        jornada = crear_jornada()
+        latencias = []
+        barrera = threading.Barrier(self.TABLETS)
+
+        def tablet(n):
+            try:
+                with connection.execute_wrapper(_esperar_bloqueos):
+                    propias = []
+                    barrera.wait()
+                    for i in range(self.ESCANEOS):
+                        inicio = time.perf_counter()
+                        escanear(f"{prefijo}-{n}-{i}", "7")
+                        propias.append(time.perf_counter() - inicio)
+                    latencias.extend(propias)
+            finally:
+                connection.close()
+
+        hilos = [threading.Thread(target=tablet, args=(n,)) for n in range(self.TABLETS)]
+        inicio = time.perf_counter()
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        segundos = time.perf_counter() - inicio
+
+        jornada.refresh_from_db()
+        jornada.delete()
+        latencias.sort()
+        total = self.TABLETS * self.ESCANEOS
+        return {
+            "por_seg": total / segundos,
+            "p99": latencias[int(len(latencias) * 0.99) - 1],
+            "perdidos": total - jornada.bonches,
+        }
+
+    def test_benchmark_escaneos_concurrentes(self):
+        antes = self.correr(_escaneo_anterior, "ANTES")
+        despues = self.correr(_escaneo_nuevo, "DESPUES")
+        for nombre, r in (("antes", antes), ("despues", despues)):
+            print(f"\n  escaneos {nombre}: {self.TABLETS} tablets, {r['por_seg']:.0f} escaneos/s, "
+                  f"p99 {r['p99'] * 1000:.1f} ms, bonches perdidos {r['perdidos']}", end="")
+        print()
+        self.assertEqual(despues["perdidos"], 0)
+        self.assertEqual(QRUsado.objects.filter(qr_id__startswith="DESPUES-").count(),
+                         self.TABLETS * self.ESCANEOS)
+
+
+def hora(h, m):
+    return datetime(2026, 10, 18, h, m, tzinfo=dt_timezone.utc)
+
+
+class RecalculoNumpyTests(TestCase):
+
+    def test_calcular_igual_que_recalcular(self):
+        azar = random.Random(6)
+        filas = [
+            (1, hora(7, 0), None, 10, 50),            # jornada abierta: hora_final NULL
+            (2, None, hora(15, 0), 10, 50),
+            (3, hora(7, 0), hora(15, 30), 0, 80),     # rendimiento 0
+            (4, hora(7, 0), hora(15, 30), None, 80),
+            (5, hora(7, 30), hora(8, 0), 12, 0),      # menos de una hora: 0 horas
+            (6, hora(7, 0), hora(16, 45), 13, 0),
+            (7, hora(6, 59), hora(18, 1), 7, 1000),
+        ]
+        for i in range(8, 5000):
+            inicio = hora(azar.randint(0, 12), azar.randint(0, 59))
+            final = inicio + timedelta(minutes=azar.randint(0, 720)) if azar.random() > 0.1 else None
+            filas.append((i, inicio, final, azar.choice([0, 1, 3, 7, 9, 10, 11, 12, 13, 15, 17, 23, 40]),
+                          azar.randint(0, 600)))
+
+        calculados = recalculo.calcular(filas)
+        self.assertEqual(recalculo.verificar(filas, calculados), [])
+        self.assertEqual(calculados[0], (None, None, None, None))
+        self.assertEqual(calculados[2][3], 0)
+
+    def crear_filas(self):
+        filas = [
+            crear_jornada(hora_inicio=hora(7, 0), hora_final=hora(15, 30), bonches=90),
+            crear_jornada(mesa="8", hora_inicio=hora(7, 0), hora_final=None, bonches=40),  # abierta
+            crear_jornada(mesa="9", hora_inicio=hora(7, 0), hora_final=hora(16, 0), rendimiento=0, bonches=30),
+            crear_jornada(mesa="10", hora_inicio=hora(8, 15), hora_final=hora(17, 50), rendimiento=13, bonches=7),
+        ]
+        # valores derivados viejos (p. ej. antes de cambiar la regla)
+        Rendimiento.objects.update(horas_trabajadas=99, ramos_esperados=99, ramos_extras=99, extras_por_hora=99)
+        return filas
+
+    def assert_como_recalcular(self, ids):
+        for fila in Rendimiento.objects.filter(id__in=ids):
+            campos = [getattr(fila, c) for c in Rendimiento.CAMPOS_DERIVADOS]
+            fila.recalcular()
+            self.assertEqual(campos, [getattr(fila, c) for c in Rendimiento.CAMPOS_DERIVADOS], fila.id)
+
+    def test_recalcular_queryset_deja_lo_mismo_que_recalcular(self):
+        filas = self.crear_filas()
+        resumenes = list(recalculo.recalcular_queryset(Rendimiento.objects.all(), lote=3,
+                                                       verificar_equivalencia=True))
+        self.assertEqual([r["leidas"] for r in resumenes], [3, 1])
+        self.assertEqual(sum(r["cambiadas"] for r in resumenes), 4)
+        self.assertEqual([d for r in resumenes for d in r["distintos"]], [])
+        self.assert_como_recalcular([f.id for f in filas])
+
+    def test_comando_guarda_cada_lote(self):
+        filas = self.crear_filas()
+        verificar = recalculo.verificar
+        llamadas = []
+
+        def falla_en_el_segundo_lote(lote_filas, calculados):
+            llamadas.append(lote_filas)
+            return [lote_filas[0][0]] if len(llamadas) == 2 else verificar(lote_filas, calculados)
+
+        with mock.patch.object(recalculo, "verificar", falla_en_el_segundo_lote):
+            with self.assertRaises(CommandError):
+                call_command("recalcular_rendimientos", lote=2, verificar=True, stdout=io.StringIO())
+
+        # el primer lote quedo guardado, el segundo no
+        self.assert_como_recalcular([f.id for f in filas[:2]])
+        self.assertEqual(Rendimiento.objects.get(id=filas[2].id).horas_trabajadas, 99)
+
+
+class VerificarIndicesTests(TestCase):
+    """EXPLAIN de las consultas calientes (SQLite en los tests)."""
+
+    def setUp(self):
+        if connection.vendor != "sqlite":
+            self.skipTest("los planes de estos tests son de SQLite")
+
+    def test_consultas_calientes_sin_recorrido_completo(self):
+        salida = io.StringIO()
+        call_command("verificar_indices", stdout=salida)
+        self.assertNotIn("FULL SCAN", salida.getvalue())
+
+    def test_detecta_recorrido_completo(self):
+        plan = Rendimiento.objects.filter(bonches=3).explain()
+        self.assertTrue(_tablas_recorridas_sqlite(plan))
+
+    def test_ordenar_por_mesa_lee_en_orden_del_indice(self):
+        for params in ({"ordenar": "mesa"}, {"ordenar": "mesa", "fecha": "2026-10-18"}):
+            plan = listado_rendimientos(params)[0].explain()
+            self.assertIn("rend_qr_mesa_orden_idx", plan)
+            self.assertNotIn("TEMP B-TREE", plan, params)
+
+
+@override_settings(QR_FILTRO_ACTIVO=False)
+class JornadaCacheTests(TestCase):
+
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        ajustes = override_settings(VERSIONES_DIR=directorio.name)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        jornada_cache.invalidar()
+        jornada_cache.aciertos = jornada_cache.fallos = 0
+
+    def consultar(self, mesa):
+        """(id, "acierto" o "fallo") de una lectura del cache."""
+        antes = jornada_cache.aciertos
+        jornada_id = jornada_cache.jornada_activa_id(mesa)
+        return jornada_id, "acierto" if jornada_cache.aciertos > antes else "fallo"
+
+    def test_aciertos_y_fallos(self):
+        jornada = crear_jornada("7")
+        self.assertEqual(self.consultar("7"), (jornada.id, "fallo"))
+        self.assertEqual(self.consultar(" 7 "), (jornada.id, "acierto"))
+        self.assertEqual(self.consultar(8), (None, "fallo"))
+        self.assertEqual(self.consultar("8"), (None, "acierto"))
+        self.assertEqual(jornada_cache.estadisticas(),
+                         {"mesas_en_cache": 2, "aciertos": 2, "fallos": 2, "tasa_acierto": 0.5})
+
+    def test_iniciar_finalizar_y_borrar_solo_invalidan_su_mesa(self):
+        otra = crear_jornada("8")
+        self.consultar("7")
+        self.consultar("8")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            jornada = crear_jornada("7")
+        self.assertEqual(self.consultar("7"), (jornada.id, "fallo"))
+        self.assertEqual(self.consultar("8"), (otra.id, "acierto"))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Rendimiento.finalizar(jornada.id)
+        self.assertEqual(self.consultar("7"), (None, "fallo"))
+        self.assertEqual(self.consultar("8"), (otra.id, "acierto"))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            otra.delete()
+        self.assertEqual(self.consultar("8"), (None, "fallo"))
+        self.assertEqual(self.consultar("7"), (None, "acierto"))
+
+    def test_cambio_de_mesa_invalida_las_dos(self):
+        jornada = crear_jornada("7")
+        self.consultar("7")
+        self.consultar("8")
+        jornada.numero_mesa = "8"
+        with self.captureOnCommitCallbacks(execute=True):
+            jornada.save()
+        self.assertEqual(self.consultar("7"), (None, "fallo"))
+        self.assertEqual(self.consultar("8"), (jornada.id, "fallo"))
+
+    def test_marca_de_otro_worker(self):
+        # otro proceso: su propio mapeo del mismo archivo de marcas
+        otro_worker = MarcasCompartidas()
+        jornada = crear_jornada("7")
+        self.consultar("7")
+        self.consultar("8")
+        # el otro worker cerro la jornada; aqui no llego ninguna senal
+        Rendimiento.objects.filter(pk=jornada.pk).update(hora_final=timezone.now())
+        self.assertEqual(self.consultar("7"), (jornada.id, "acierto"))
+
+        MarcaVersion("jornada-mesa-7", compartidas=otro_worker).incrementar()
+        self.assertEqual(self.consultar("7"), (None, "fallo"))
+        self.assertEqual(self.consultar("8"), (None, "acierto"))
+
+        MarcaVersion("jornadas", compartidas=otro_worker).incrementar()
+        self.assertEqual(self.consultar("8"), (None, "fallo"))
+
+    def test_id_obsoleto_se_recupera(self):
+        vieja = crear_jornada("7")
+        self.assertEqual(self.consultar("7"), (vieja.id, "fallo"))
+        # cerrada y reemplazada sin senales (p. ej. otro worker antes del aviso)
+        Rendimiento.objects.filter(pk=vieja.pk).update(hora_final=timezone.now())
+        nueva, = Rendimiento.objects.bulk_create([
+            Rendimiento(qr_id="JORNADA", numero_mesa="7", fecha_entrada=timezone.now(),
+                        hora_inicio=timezone.now(), rendimiento=10)])
+
+        self.assertEqual(jornada_cache.jornada_activa("7").id, nueva.id)
+        self.assertEqual(self.consultar("7"), (nueva.id, "acierto"))
+
+        Rendimiento.objects.filter(pk=nueva.pk).update(hora_final=timezone.now())
+        otra, = Rendimiento.objects.bulk_create([
+            Rendimiento(qr_id="JORNADA", numero_mesa="7", fecha_entrada=timezone.now(),
+                        hora_inicio=timezone.now(), rendimiento=10)])
+        # el escaneo con el id cacheado obsoleto suma en la jornada abierta
+        estado, jornada = registrar_escaneo("QR-obsoleto", "7")
+        self.assertEqual((estado, jornada.id, jornada.bonches), ("aceptado", otra.id, 1))
+        nueva.refresh_from_db()
+        self.assertEqual(nueva.bonches, 0)
+
+
+@override_settings(QR_FILTRO_ACTIVO=False)
+class JornadaApiCpuTests(TestCase):
+    """CPU por peticion de /api/jornada/* para un operario (el decorador lee la mesa del body)."""
+
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        ajustes = override_settings(VERSIONES_DIR=directorio.name)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        usuario_cache.invalidar()
+        jornada_cache.invalidar()
+        operario = Usuario(nombres="Ana", apellidos="Paz", mesa="7", cargo="EMBONCHADOR/A", username="operaria7")
+        operario.set_password("secreto1")
+        operario.save()
+        self.cabecera = cabecera_jwt(operario)
+
+    def ciclos(self, vueltas):
+        """CPU (ms por peticion) de iniciar, actual y finalizar."""
+        cpu = {"iniciar": 0.0, "actual": 0.0, "finalizar": 0.0}
+        pedidos = {
+            "iniciar": lambda: self.client.post("/api/jornada/iniciar/", {"mesa": "7", "rendimiento": 20},
+                                                content_type="application/json", **self.cabecera),
+            "actual": lambda: self.client.get("/api/jornada/actual/", {"mesa": "7"}, **self.cabecera),
+            "finalizar": lambda: self.client.post("/api/jornada/finalizar/", {"mesa": "7"},
+                                                  content_type="application/json", **self.cabecera),
+        }
+        esperado = {"iniciar": 201, "actual": 200, "finalizar": 200}
+        for _ in range(vueltas):
+            for nombre, pedir in pedidos.items():
+                with self.captureOnCommitCallbacks(execute=True):
+                    inicio = time.process_time()
+                    respuesta = pedir()
+                    cpu[nombre] += time.process_time() - inicio
+                self.assertEqual(respuesta.status_code, esperado[nombre], respuesta.content)
+        return {nombre: total * 1000 / vueltas for nombre, total in cpu.items()}
+
+    def test_benchmark_cpu_por_peticion(self):
+        vueltas = int(os.environ.get("VUELTAS_JORNADA", 200))
+        original = cuerpo_json.cuerpo_json
+
+        def sin_guardar(request):
+            # como antes: decorador y vista parsean el body cada uno
+            request.__dict__.pop(cuerpo_json._ATRIBUTO, None)
+            return original(request)
+
+        self.ciclos(10)  # calienta caches
+        resultados = {}
+        for modo, funcion in (("dos lecturas", sin_guardar), ("una lectura", original)):
+            with mock.patch.object(jwt_decorators, "cuerpo_json", funcion), \
+                    mock.patch.object(api_views, "cuerpo_json", funcion), \
+                    mock.patch.object(cuerpo_json, "_parsear", wraps=cuerpo_json._parsear) as parsear:
+                resultados[modo] = self.ciclos(vueltas)
+            # iniciar y finalizar traen body
+            resultados[modo]["parseos"] = parsear.call_count / (2 * vueltas)
+
+        self.assertEqual(resultados["dos lecturas"]["parseos"], 2)
+        self.assertEqual(resultados["una lectura"]["parseos"], 1)
+        for modo, r in resultados.items():
+            print(f"\n  /api/jornada/ {modo} ({r['parseos']:.0f} por POST): iniciar {r['iniciar']:.2f} ms, "
+                  f"actual {r['actual']:.2f} ms, finalizar {r['finalizar']:.2f} ms de CPU por peticion", end="")
+        print()
+
+
+class PaginacionTests(TestCase):
+
+    def setUp(self):
+        self.cabecera = cabecera_jwt(crear_usuario())
+        ahora = timezone.now()
+        # mesas repetidas y fechas iguales: el orden depende del desempate por id
+        for i, mesa in enumerate(["10", "2", "A", "3", "2", "10", "B", "2", "A", "3", "10", "2"]):
+            crear_jornada(mesa, fecha_entrada=ahora - timedelta(minutes=i // 3), bonches=i)
+
+    def listar(self, **params):
+        respuesta = self.client.get("/api/rendimientos/", params, **self.cabecera)
+        if respuesta.streaming:
+            return respuesta.status_code, loads(b"".join(respuesta.streaming_content))
+        return respuesta.status_code, respuesta.json()
+
+    def paginas(self, limite, **params):
+        filas, cursor = [], None
+        while True:
+            extra = {"cursor": cursor} if cursor else {}
+            estado, cuerpo = self.listar(limit=limite, **params, **extra)
+            self.assertEqual(estado, 200, cuerpo)
+            self.assertLessEqual(len(cuerpo["results"]), limite)
+            filas += cuerpo["results"]
+            cursor = cuerpo["next"]
+            if not cursor:
+                return filas
+
+    def assert_mismo_orden(self, **params):
+        _, completa = self.listar(**params)
+        _, stream = self.listar(stream="true", **params)
+        self.assertEqual(len(completa), 12)
+        self.assertEqual(stream, completa)
+        for limite in (1, 5, 12, 50):
+            self.assertEqual(self.paginas(limite, **params), completa, (limite, params))
+        return completa
+
+    def test_cursor_ida_y_vuelta(self):
+        orden = ["-fecha_entrada", "numero_mesa", "id"]
+        fila = Rendimiento.objects.order_by("id").last()
+        valores = [fila.fecha_entrada, fila.numero_mesa, fila.id]
+        cursor = paginacion._codificar(orden, valores)
+        self.assertNotIn("=", cursor)
+        self.assertEqual(paginacion._decodificar(cursor, orden, Rendimiento), valores)
+
+    def test_lista_paginas_y_stream_en_el_mismo_orden(self):
+        for params in ({}, {"ordenar": "fecha"}, {"ordenar": "fecha", "reciente": "true"}, {"ordenar": "mesa"}):
+            self.assert_mismo_orden(**params)
+
+    def test_mesa_reciente_mezcla_direcciones(self):
+        # mesa_orden y numero_mesa descendentes, id ascendente
+        filas = self.assert_mismo_orden(ordenar="mesa", reciente="true")
+        mesa_orden = dict(Rendimiento.objects.values_list("id", "mesa_orden"))
+        claves = [(mesa_orden[f["id"]], f["numero_mesa"], -f["id"]) for f in filas]
+        self.assertEqual([f["numero_mesa"] for f in filas][:5], ["B", "A", "A", "10", "10"])
+        self.assertEqual(claves, sorted(claves, reverse=True))
+
+    def test_cursor_y_limit_invalidos(self):
+        _, pagina = self.listar(limit=2, ordenar="fecha")
+        otro_orden = pagina["next"]
+        invalidos = [
+            {"cursor": "no-es-base64!!"},
+            {"cursor": paginacion._codificar(["id"], [1, 2])},
+            {"cursor": otro_orden, "ordenar": "mesa"},
+            {"cursor": paginacion._codificar(["id"], ["x"])},
+            {"limit": "0"},
+            {"limit": "-3"},
+            {"limit": "diez"},
+        ]
+        for params in invalidos:
+            estado, cuerpo = self.listar(**params)
+            self.assertEqual(estado, 400, params)
+            self.assertIn("error", cuerpo)
+
+    def test_limit_se_recorta_al_maximo(self):
+        with mock.patch.object(paginacion, "LIMITE_MAXIMO", 4):
+            _, cuerpo = self.listar(limit=500)
+        self.assertEqual(len(cuerpo["results"]), 4)
+        self.assertIsNotNone(cuerpo["next"])
+        _, cuerpo = self.listar(limit="")
+        self.assertEqual(len(cuerpo["results"]), 12)
+        self.assertIsNone(cuerpo["next"])
+
+
+class SerializacionRapidaTests(TestCase):
+    """rendimiento_rapido contra RendimientoSerializer: mismos datos y mismos bytes."""
+
+    def setUp(self):
+        base = datetime(2026, 10, 18, 7, 0, tzinfo=dt_timezone.utc)
+        crear_jornada("7", fecha_entrada=base, hora_inicio=base)  # segundos exactos
+        crear_jornada("Ñandú-3", qr_id="QR-ñ-日本", fecha_entrada=base + timedelta(microseconds=123456),
+                      hora_inicio=base + timedelta(hours=1, microseconds=7),
+                      hora_final=base + timedelta(hours=9, minutes=20, seconds=1, microseconds=999999))
+        # campos nulos y flotantes con muchos decimales
+        crear_jornada("12", fecha_entrada=base, hora_inicio=None, rendimiento=0, ramos_base=0)
+        Rendimiento.objects.filter(numero_mesa="12").update(ramos_extras=1 / 3, extras_por_hora=-0.1)
+
+    def test_igual_que_el_serializer_drf(self):
+        qs = Rendimiento.objects.order_by("id")
+        for zona in ("America/Guayaquil", "UTC", "Asia/Kolkata", "Europe/Madrid"):
+            with timezone.override(zona):
+                esperado = RendimientoSerializer(qs, many=True).data
+                rapido = rendimiento_rapido.lista(qs)
+                self.assertEqual(rapido, [dict(d) for d in esperado], zona)
+                self.assertEqual([list(d) for d in rapido], [list(d) for d in esperado])
+                self.assertEqual(JSONRendererRapido().render(rapido), JSONRenderer().render(esperado), zona)
+                obj = qs.last()
+                self.assertEqual(rendimiento_rapido.instancia(obj), dict(RendimientoSerializer(obj).data))
+        fila = rendimiento_rapido.lista(qs.filter(numero_mesa="Ñandú-3"))[0]
+        self.assertEqual(fila["fecha_entrada"], "2026-10-18T02:00:00.123456-05:00")
+        self.assertIsNone(rendimiento_rapido.lista(qs.filter(numero_mesa="12"))[0]["hora_final"])
+
+    def test_benchmark_filas_por_segundo(self):
+        filas = int(os.environ.get("FILAS_SERIALIZACION", 20_000))
+        ahora = timezone.now()
+        Rendimiento.objects.bulk_create([
+            Rendimiento(qr_id="JORNADA", numero_mesa=str(i % 50), fecha_entrada=ahora, hora_inicio=ahora,
+                        hora_final=ahora, bonches=i, horas_trabajadas=8.5, ramos_esperados=850.0,
+                        ramos_extras=i / 7, extras_por_hora=i / 60)
+            for i in range(filas)
+        ], batch_size=2000)
+        qs = Rendimiento.objects.filter(qr_id="JORNADA")
+
+        def medir(funcion):
+            mejor = math.inf
+            for _ in range(3):
+                inicio = time.perf_counter()
+                funcion()
+                mejor = min(mejor, time.perf_counter() - inicio)
+            return filas / mejor
+
+        # ambos leen de la BD en cada vuelta (qs.all(): sin el cache del queryset)
+        drf = medir(lambda: JSONRenderer().render(RendimientoSerializer(qs.all(), many=True).data))
+        rapido = medir(lambda: JSONRendererRapido().render(rendimiento_rapido.lista(qs.all())))
+        print(f"\n  serializar + renderizar {filas} filas: ModelSerializer {drf:,.0f} filas/s, "
+              f"serializacion_rapida {rapido:,.0f} filas/s ({rapido / drf:.1f}x)")
+        self.assertGreater(rapido, drf)
+
+
+def _mesa_sort_key(item):
+    # orden en Python que usaba la vista antes de mesa_orden
+    try:
+        return (0, int(str(item.numero_mesa).strip()))
+    except (TypeError, ValueError):
+        return (1, str(item.numero_mesa).strip().lower())
+
+
+class OrdenarPorMesaTests(TestCase):
+
+    def test_benchmark_ordenar_por_mesa(self):
+        """ordenar=mesa sobre FILAS_MESA jornadas (100k por defecto): Python contra SQL + keyset."""
+        filas = int(os.environ.get("FILAS_MESA", 100_000))
+        ahora = timezone.now()
+        mesas = [str(m) for m in range(1, 61)] + ["empaque", "reproceso"]
+        Rendimiento.objects.bulk_create([
+            Rendimiento(qr_id="JORNADA", numero_mesa=mesas[i * 7919 % len(mesas)],
+                        mesa_orden=orden_mesa(mesas[i * 7919 % len(mesas)]),
+                        fecha_entrada=ahora, fecha_local=ahora.date(), hora_inicio=ahora)
+            for i in range(filas)
+        ], batch_size=5000)
+        qs = Rendimiento.objects.filter(qr_id="JORNADA")
+
+        def medir(funcion):
+            inicio = time.perf_counter()
+            resultado = funcion()
+            return resultado, (time.perf_counter() - inicio) * 1000
+
+        antes, ms_antes = medir(lambda: sorted(qs.all(), key=_mesa_sort_key))
+        ahora_sql, ms_sql = medir(lambda: list(listado_rendimientos({"ordenar": "mesa"})[0]))
+        self.assertEqual([r.id for r in ahora_sql], [r.id for r in antes])
+
+        orden = listado_rendimientos({"ordenar": "mesa"})[1]
+        mitad = ahora_sql[filas // 2 - 1]
+        cursor = paginacion._codificar(orden, paginacion._valores_de(mitad, orden))
+        pedidos = {
+            "primera": SimpleNamespace(query_params={"limit": "100"}),
+            "mitad": SimpleNamespace(query_params={"limit": "100", "cursor": cursor}),
+        }
+        tiempos = {}
+        for nombre, peticion in pedidos.items():
+            (pagina, _), tiempos[nombre] = medir(lambda: paginacion.paginar(peticion, qs, orden))
+            esperado = 0 if nombre == "primera" else filas // 2
+            self.assertEqual([r.id for r in pagina], [r.id for r in antes[esperado:esperado + 100]])
+
+        print(f"\n  ordenar {filas} jornadas por mesa: Python {ms_antes:.0f} ms, SQL {ms_sql:.0f} ms, "
+              f"pagina de 100 por cursor {tiempos['primera']:.1f} ms (primera) / {tiempos['mitad']:.1f} ms (mitad)")
+        self.assertLess(max(tiempos.values()), ms_antes / 10)
+
+
+class RespuestaStreamTests(TestCase):
+
+    def crear_jornadas(self, desde, hasta):
+        ahora = timezone.now()
+        Rendimiento.objects.bulk_create([
+            Rendimiento(qr_id="JORNADA", numero_mesa=str(i % 50), mesa_orden=i % 50, fecha_entrada=ahora,
+                        fecha_local=ahora.date(), hora_inicio=ahora, bonches=i)
+            for i in range(desde, hasta)
+        ], batch_size=2000)
+
+    def consumir(self, queryset):
+        """(cuerpo, pico de memoria) recorriendo la respuesta parte por parte."""
+        respuesta = respuesta_stream(queryset, ["id"], rendimiento_rapido, lote=500)
+        tamano = 0
+        tracemalloc.start()
+        try:
+            for parte in respuesta.streaming_content:
+                tamano += len(parte)  # la parte se descarta, como al enviarla
+            _, pico = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        return tamano, pico
+
+    def test_memoria_acotada_por_el_lote(self):
+        """FILAS_STREAM filas (200k por defecto) contra 1/20 de ellas."""
+        filas = int(os.environ.get("FILAS_STREAM", 200_000))
+        qs = Rendimiento.objects.filter(qr_id="JORNADA")
+        self.crear_jornadas(0, filas // 20)
+        self.consumir(qs)  # calienta caches de SQL y del serializador
+        tamano_chico, pico_chico = self.consumir(qs)
+
+        self.crear_jornadas(filas // 20, filas)
+        inicio = time.perf_counter()
+        tamano_grande, pico_grande = self.consumir(qs)
+        segundos = time.perf_counter() - inicio
+
+        # sin stream: toda la lista y el JSON completo en memoria
+        tracemalloc.start()
+        try:
+            JSONRendererRapido().render(rendimiento_rapido.lista(qs))
+            _, pico_sin_stream = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        print(f"\n  stream de {filas} filas: {tamano_grande / 1e6:.1f} MB en {segundos:.1f} s, "
+              f"pico {pico_grande / 1e6:.1f} MB (con {filas // 20}: {pico_chico / 1e6:.1f} MB, "
+              f"sin stream: {pico_sin_stream / 1e6:.1f} MB)")
+        self.assertGreater(tamano_grande, 18 * tamano_chico)
+        # 20 veces las filas, casi la misma memoria
+        self.assertLess(pico_grande, 1.5 * pico_chico)
+        self.assertLess(pico_grande, pico_sin_stream / 20)
+
+    def test_mismo_cuerpo_que_sin_stream(self):
+        self.crear_jornadas(0, 1200)
+        qs = Rendimiento.objects.filter(qr_id="JORNADA").order_by("id")
+        respuesta = respuesta_stream(qs, ["id"], rendimiento_rapido, lote=500)
+        self.assertEqual(loads(b"".join(respuesta.streaming_content)), rendimiento_rapido.lista(qs))
+
+    def test_api_mismos_bytes_con_y_sin_stream(self):
+        # fechas repetidas: sin el desempate por id el orden no esta definido
+        self.crear_jornadas(0, 5000)
+        cabecera = cabecera_jwt(crear_usuario())
+        for params in ({}, {"ordenar": "fecha"}, {"ordenar": "mesa", "reciente": "true"}):
+            completa = self.client.get("/api/rendimientos/", params, **cabecera)
+            stream = self.client.get("/api/rendimientos/", {**params, "stream": "true"}, **cabecera)
+            self.assertTrue(stream.streaming)
+            self.assertEqual(b"".join(stream.streaming_content), completa.content, params)
+
+
+@override_settings(CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer",
+                                               "CONFIG": {"capacity": 10_000}}})
+class SuscripcionesPorMesaTests(SimpleTestCase):
+    """Volumen de mensajes por cliente con 50 mesas: grupo general contra grupo de la mesa."""
+
+    MESAS = 50
+    ESCANEOS = 1000
+
+    async def conectar(self, mesa=None):
+        ruta = {"mesa": str(mesa)} if mesa is not None else {}
+        cliente = ApplicationCommunicator(RendimientoConsumer.as_asgi(), {
+            "type": "websocket", "path": "/ws/rendimientos/", "query_string": b"",
+            "headers": [], "subprotocols": [], "url_route": {"args": (), "kwargs": ruta},
+        })
+        await cliente.send_input({"type": "websocket.connect"})
+        self.assertEqual((await cliente.receive_output(5))["type"], "websocket.accept")
+        return cliente
+
+    async def recibidos(self, cliente):
+        """(mensajes, filas) que le llegaron al cliente."""
+        mensajes = filas = 0
+        while not await cliente.receive_nothing(0.01):
+            salida = await cliente.receive_output(1)
+            mensajes += 1
+            filas += len(loads(salida["text"]))
+        return mensajes, filas
+
+    async def test_volumen_por_cliente_con_50_mesas(self):
+        capa = get_channel_layer()
+        generales = [await self.conectar() for _ in range(5)]
+        por_mesa = {mesa: [await self.conectar(mesa), await self.conectar(mesa)]
+                    for mesa in range(1, self.MESAS + 1)}
+
+        # un lote por escaneo, como difundir() sin ventana
+        enviados = []
+        with mock.patch.object(suscripciones, "difundir",
+                               lambda grupo, tipo, filas: enviados.append((grupo, tipo, filas))):
+            for i in range(self.ESCANEOS):
+                mesa = i % self.MESAS + 1
+                suscripciones.difundir_filtrado("rendimientos", "lote_rendimientos",
+                                                [{"id": mesa, "numero_mesa": str(mesa), "bonches": i}])
+        for grupo, tipo, filas in enviados:
+            await capa.group_send(grupo, {"type": tipo, "data": filas})
+
+        volumen_general = [await self.recibidos(c) for c in generales]
+        volumen_mesa = [await self.recibidos(c) for clientes in por_mesa.values() for c in clientes]
+        for cliente in generales + [c for clientes in por_mesa.values() for c in clientes]:
+            await cliente.send_input({"type": "websocket.disconnect", "code": 1000})
+            await cliente.wait(1)
+
+        escaneos_por_mesa = self.ESCANEOS // self.MESAS
+        self.assertEqual(set(volumen_general), {(self.ESCANEOS, self.ESCANEOS)})
+        self.assertEqual(set(volumen_mesa), {(escaneos_por_mesa, escaneos_por_mesa)})
+        entregas_mesa = sum(m for m, _ in volumen_mesa)
+        print(f"\n  suscripciones: {self.MESAS} mesas, {self.ESCANEOS} escaneos; por cliente "
+              f"{self.ESCANEOS} mensajes (general) contra {escaneos_por_mesa} (su mesa); "
+              f"{entregas_mesa} entregas para {len(volumen_mesa)} clientes de mesa "
+              f"en vez de {self.ESCANEOS * len(volumen_mesa)}")
+
+
+class ConsumerConSecuenciaTests(SimpleTestCase):
+
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory(prefix="canales-")
+        self.addCleanup(directorio.cleanup)
+        ajustes = override_settings(CHANNEL_LAYERS={"default": {
+            "BACKEND": "COMEXIGER.capa_canales.CapaUnixDatagrama",
+            "CONFIG": {"directorio": directorio.name},
+        }})
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+    async def test_cliente_con_seq_solo_recibe_lotes_numerados(self):
+        cliente = ApplicationCommunicator(RendimientoConsumer.as_asgi(), {
+            "type": "websocket", "path": "/ws/rendimientos/mesa/7/", "query_string": b"seq=0",
+            "headers": [], "subprotocols": [], "url_route": {"args": (), "kwargs": {"mesa": "7"}},
+        })
+        await cliente.send_input({"type": "websocket.connect"})
+        self.assertEqual((await cliente.receive_output(5))["type"], "websocket.accept")
+        self.assertEqual(loads((await cliente.receive_output(5))["text"])["type"], "estado")
+
+        capa = get_channel_layer()
+        for bonches in (1, 2):
+            await capa.group_send("rendimientos.mesa.7", {"type": "lote_rendimientos",
+                                                          "data": [{"id": 1, "bonches": bonches}]})
+        marcos = [loads((await cliente.receive_output(5))["text"]) for _ in range(2)]
+        self.assertEqual([(m["type"], m["seq"]) for m in marcos], [("lote", 1), ("lote", 2)])
+        self.assertTrue(await cliente.receive_nothing(0.05))
+
+        await cliente.send_input({"type": "websocket.disconnect", "code": 1000})
+        await cliente.wait(1)
+        capa.cerrar()
@@ -16,6 +16,8 @@ urlpatterns = [
 
     path('api/', include(router.urls)),
     path('api/rendimientos/', views.api_rendimiento_list, name='api-rendimiento-list'),
+    path('api/rendimientos/lote/', views.api_rendimiento_lote, name='api-rendimiento-lote'),
     path('api/rendimientos/<int:pk>/', views.api_rendimiento_detail, name='api-rendimiento-detail'),
     path('api/rendimientos/stats/', views.api_rendimiento_stats, name='api-rendimiento-stats'),
+    path('api/rendimientos/resumen/', views.api_rendimiento_resumen, name='api-rendimiento-resumen'),
 ]
@@ -1,16 +1,18 @@
-from django.db.models import Sum
-from django.db import IntegrityError
+from django.db import IntegrityError, transaction
 from django.shortcuts import render, redirect
 from django.contrib import messages
-from datetime import datetime
+from datetime import date, datetime
 from django.utils import timezone
 from django.views.decorators.http import require_POST
 
 from .models import Rendimiento, QRUsado
-from .serializers import RendimientoSerializer
+from .serializers import RendimientoSerializer, rendimiento_rapido
+from .qr_filtro import qr_ya_usado, registrar_qr_en_filtro, estadisticas as estadisticas_filtro_qr
+from .qr_retencion import qr_usados, registrar_nuevos
+from .resumen_diario import resumen_rango
+from .jornada_cache import jornada_activa_id, olvidar as olvidar_jornada, estadisticas as estadisticas_cache_jornadas
 
-from asgiref.sync import async_to_sync
-from channels.layers import get_channel_layer
+from .signals import notificar_rendimiento, notificar_rendimientos
 
 from rest_framework import viewsets, status
 from rest_framework.decorators import api_view, action, permission_classes
@@ -19,16 +21,10 @@ from rest_framework.response import Response
 
 
 from Aplicaciones.Usuario.web_decorators import web_admin_required
-
-
-def _mesa_sort_key(item):
-    """
-    Ordena mesas numéricas correctamente (2, 3, 10) y deja fallback para textos.
-    """
-    try:
-        return (0, int(str(item.numero_mesa).strip()))
-    except (TypeError, ValueError):
-        return (1, str(item.numero_mesa).strip().lower())
+from Aplicaciones.Usuario.paginacion import ordenar_con_id, pide_paginacion, respuesta_paginada
+from Aplicaciones.Usuario.respuesta_stream import pide_stream, respuesta_stream
+from Aplicaciones.Usuario.fecha_local import filtrar_por_fecha
+from Aplicaciones.Usuario.difusion import estadisticas as estadisticas_difusion
 
 
 # ================== VISTAS WEB ==================
@@ -74,11 +70,7 @@ def guardar_rendimiento(request):
             nuevo.recalcular()
             nuevo.save()
 
-            channel_layer = get_channel_layer()
-            async_to_sync(channel_layer.group_send)(
-                "rendimientos",
-                {"type": "nuevo_rendimiento", "data": RendimientoSerializer(nuevo).data}
-            )
+            notificar_rendimiento(nuevo)
 
             messages.success(request, "Rendimiento guardado exitosamente")
             return redirect('rendimiento')
@@ -150,11 +142,7 @@ def procesar_edicion_rendimiento(request):
             rendimiento.recalcular()
             rendimiento.save()
 
-            channel_layer = get_channel_layer()
-            async_to_sync(channel_layer.group_send)(
-                "rendimientos",
-                {"type": "nuevo_rendimiento", "data": RendimientoSerializer(rendimiento).data}
-            )
+            notificar_rendimiento(rendimiento)
 
             messages.success(request, "Rendimiento actualizado correctamente")
 
@@ -170,13 +158,21 @@ class RendimientoViewSet(viewsets.ModelViewSet):
     queryset = Rendimiento.objects.all().order_by('-fecha_entrada')
     serializer_class = RendimientoSerializer
 
+    def _listar(self, queryset):
+        if pide_paginacion(self.request):
+            return respuesta_paginada(self.request, queryset, ['-fecha_entrada'], rendimiento_rapido)
+        if pide_stream(self.request):
+            return respuesta_stream(queryset, ['-fecha_entrada'], rendimiento_rapido)
+        return Response(rendimiento_rapido.lista(ordenar_con_id(queryset, ['-fecha_entrada'])))
+
+    def list(self, request, *args, **kwargs):
+        return self._listar(self.get_queryset())
+
     @action(detail=False, methods=['get'])
     def activos(self, request):
-        serializer = self.get_serializer(
-            Rendimiento.objects.filter(qr_id="JORNADA", hora_final__isnull=True).order_by('-fecha_entrada'),
-            many=True
+        return self._listar(
+            Rendimiento.objects.filter(qr_id="JORNADA", hora_final__isnull=True).order_by('-fecha_entrada')
         )
-        return Response(serializer.data)
 
     @action(detail=False, methods=['get'])
     def por_mesa(self, request):
@@ -184,11 +180,86 @@ class RendimientoViewSet(viewsets.ModelViewSet):
         if not mesa:
             return Response({"error": "Parámetro 'mesa' requerido"}, status=400)
 
-        serializer = self.get_serializer(
-            Rendimiento.objects.filter(qr_id="JORNADA", numero_mesa=mesa).order_by('-fecha_entrada'),
-            many=True
+        return self._listar(
+            Rendimiento.objects.filter(qr_id="JORNADA", numero_mesa=mesa).order_by('-fecha_entrada')
         )
-        return Response(serializer.data)
+
+
+def listado_rendimientos(params):
+    """
+    (queryset, orden) de GET /api/rendimientos/ para los parametros dados.
+    El queryset ya viene ordenado (con desempate por id), igual que las
+    paginas y el stream. verificar_indices hace EXPLAIN de este queryset.
+    """
+    rendimientos = Rendimiento.objects.filter(qr_id="JORNADA")
+
+    # fecha_local indexada en vez de fecha_entrada__date (no usa indice)
+    rendimientos = filtrar_por_fecha(
+        rendimientos,
+        fecha=params.get("fecha"),
+        desde=params.get("desde"),
+        hasta=params.get("hasta"),
+    )
+
+    ordenar = params.get("ordenar")
+    reciente = params.get("reciente")
+    orden = ["id"]
+
+    if ordenar:
+        # mesa: numericas por valor (2, 3, 10) y luego las de texto,
+        # con la clave entera mesa_orden que se llena en save()
+        campos = {
+            "fecha": ["fecha_entrada"],
+            "mesa": ["mesa_orden", "numero_mesa", "id"],
+        }.get(ordenar)
+        if campos:
+            if reciente == "true":
+                campos = [c if c == "id" else f"-{c}" for c in campos]
+            orden = campos
+
+    return ordenar_con_id(rendimientos, orden), orden
+
+
+def registrar_escaneo(codigo, mesa):
+    """
+    Registra un QR escaneado en la jornada abierta de la mesa. Devuelve
+    ("aceptado", jornada), ("duplicado", None) o ("sin_jornada", None).
+    """
+    if not jornada_activa_id(mesa):
+        return "sin_jornada", None
+
+    # El filtro en memoria descarta los QR nuevos sin ir a la BD;
+    # solo los "quizas usados" se consultan antes de abrir la transaccion.
+    if qr_ya_usado(QRUsado, codigo):
+        return "duplicado", None
+
+    # Camino rapido: una transaccion corta que registra el QR (el indice
+    # unico decide si ya fue usado) y suma el bonche en la BD con F().
+    # Con la jornada cacheada solo hay escrituras por clave primaria.
+    jornada = None
+    try:
+        for _ in range(2):
+            jornada_id = jornada_activa_id(mesa)
+            if not jornada_id:
+                break
+            with transaction.atomic():
+                QRUsado.objects.create(qr_id=codigo)
+                jornada = Rendimiento.sumar_bonches(jornada_id)
+                if jornada is None:
+                    # id cacheado obsoleto (jornada cerrada o borrada)
+                    transaction.set_rollback(True)
+            if jornada is not None:
+                break
+            olvidar_jornada(mesa)
+    except IntegrityError:
+        # QR repetido (incluye escaneo concurrente del mismo QR)
+        registrar_qr_en_filtro(QRUsado, codigo)
+        return "duplicado", None
+
+    if jornada is None:
+        return "sin_jornada", None
+    registrar_qr_en_filtro(QRUsado, codigo)
+    return "aceptado", jornada
 
 
 @api_view(['GET', 'POST'])
@@ -196,47 +267,15 @@ class RendimientoViewSet(viewsets.ModelViewSet):
 def api_rendimiento_list(request):
     # ---------- GET ----------
     if request.method == 'GET':
-        rendimientos = Rendimiento.objects.filter(qr_id="JORNADA")
+        rendimientos, orden = listado_rendimientos(request.query_params)
+        paginado = pide_paginacion(request)
 
-        if request.query_params.get("fecha"):
-            rendimientos = rendimientos.filter(
-                fecha_entrada__date=request.query_params["fecha"]
-            )
-
-        if request.query_params.get("desde") and request.query_params.get("hasta"):
-            rendimientos = rendimientos.filter(
-                fecha_entrada__date__range=[
-                    request.query_params["desde"],
-                    request.query_params["hasta"]
-                ]
-            )
-        elif request.query_params.get("desde"):
-            rendimientos = rendimientos.filter(
-                fecha_entrada__date__gte=request.query_params["desde"]
-            )
-        elif request.query_params.get("hasta"):
-            rendimientos = rendimientos.filter(
-                fecha_entrada__date__lte=request.query_params["hasta"]
-            )
+        if paginado:
+            return respuesta_paginada(request, rendimientos, orden, rendimiento_rapido)
+        if pide_stream(request):
+            return respuesta_stream(rendimientos, orden, rendimiento_rapido)
 
-        ordenar = request.query_params.get("ordenar")
-        reciente = request.query_params.get("reciente")
-
-        if ordenar:
-            if ordenar == "mesa":
-                data = list(rendimientos)
-                data.sort(key=_mesa_sort_key, reverse=(reciente == "true"))
-                serializer = RendimientoSerializer(data, many=True)
-                return Response(serializer.data)
-
-            campo = {"fecha": "fecha_entrada"}.get(ordenar)
-            if campo:
-                if reciente == "true":
-                    campo = f"-{campo}"
-                rendimientos = rendimientos.order_by(campo)
-
-        serializer = RendimientoSerializer(rendimientos, many=True)
-        return Response(serializer.data)
+        return Response(rendimiento_rapido.lista(rendimientos))
 
     # ---------- POST (QR) ----------
     data = request.data
@@ -246,41 +285,147 @@ def api_rendimiento_list(request):
     if not codigo or not mesa:
         return Response({"error": "Datos incompletos"}, status=status.HTTP_400_BAD_REQUEST)
 
-    hoy = timezone.localdate()
+    estado, jornada_base = registrar_escaneo(codigo, mesa)
+    if estado == "duplicado":
+        return Response({"error": "Este QR ya fue utilizado"}, status=status.HTTP_409_CONFLICT)
+    if estado == "sin_jornada":
+        return Response(
+            {"error": "No hay jornada iniciada para esta mesa hoy. Primero inicia jornada."},
+            status=status.HTTP_409_CONFLICT
+        )
 
-    jornada_base = (Rendimiento.objects
-        .filter(qr_id="JORNADA", numero_mesa=mesa, hora_final__isnull=True)
-        .order_by("-hora_inicio", "-fecha_entrada")
-        .first()
-    )
+    data = rendimiento_rapido.instancia(jornada_base)
 
+    notificar_rendimiento(jornada_base, data)
 
-    if not jornada_base:
+    return Response(data, status=200)
+
+
+MAX_ESCANEOS_LOTE = 1000
+
+
+def _leer_escaneos_lote(request):
+    """
+    Acepta {"escaneos": [...]} o directamente una lista de escaneos.
+    """
+    data = request.data
+    if isinstance(data, dict):
+        data = data.get("escaneos")
+    if not isinstance(data, list):
+        return None
+    return data
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def api_rendimiento_lote(request):
+    """
+    POST: /api/rendimientos/lote/
+    Body: {"escaneos": [{"qr_id": "...", "numero_mesa": "7"}, ...]}
+
+    Para estaciones que estuvieron sin red y reenvian los QR acumulados:
+    registra los QR de una vez (solo cuentan los que inserta esta peticion),
+    suma el neto por jornada en una transaccion y manda una sola
+    actualizacion por WebSocket. Los QR de una mesa sin jornada abierta no
+    quedan registrados ("sin_jornada").
+    """
+    escaneos = _leer_escaneos_lote(request)
+    if not escaneos:
+        return Response({"error": "Se requiere una lista de escaneos"}, status=status.HTTP_400_BAD_REQUEST)
+    if len(escaneos) > MAX_ESCANEOS_LOTE:
         return Response(
-            {"error": "No hay jornada iniciada para esta mesa hoy. Primero inicia jornada."},
-            status=status.HTTP_409_CONFLICT
+            {"error": f"Maximo {MAX_ESCANEOS_LOTE} escaneos por lote"},
+            status=status.HTTP_400_BAD_REQUEST
         )
 
-    if QRUsado.objects.filter(qr_id=codigo).exists():
-        return Response({"error": "Este QR ya fue utilizado"}, status=status.HTTP_409_CONFLICT)
+    resultados = []
+    mesa_por_codigo = {}
+    for item in escaneos:
+        item = item if isinstance(item, dict) else {}
+        codigo = item.get("qr_id")
+        mesa = str(item.get("numero_mesa") or "").strip()
+
+        if not codigo or not mesa:
+            resultados.append({"qr_id": codigo, "estado": "invalido"})
+        elif str(codigo) in mesa_por_codigo:
+            # repetido dentro del mismo lote
+            resultados.append({"qr_id": str(codigo), "estado": "duplicado"})
+        else:
+            mesa_por_codigo[str(codigo)] = mesa
+            resultados.append({"qr_id": str(codigo), "estado": None, "numero_mesa": mesa})
+
+    # Jornada abierta por mesa (desde el cache de jornadas); una consulta
+    # confirma que los ids cacheados siguen abiertos.
+    jornada_por_mesa = {}
+    for mesa in set(mesa_por_codigo.values()):
+        jornada_id = jornada_activa_id(mesa)
+        if jornada_id:
+            jornada_por_mesa[mesa] = jornada_id
+
+    abiertas = set(Rendimiento.objects
+                   .filter(pk__in=jornada_por_mesa.values(), hora_final__isnull=True)
+                   .values_list("id", flat=True))
+    for mesa, jornada_id in list(jornada_por_mesa.items()):
+        if jornada_id not in abiertas:
+            olvidar_jornada(mesa)
+            jornada_id = jornada_activa_id(mesa)
+            if jornada_id:
+                jornada_por_mesa[mesa] = jornada_id
+            else:
+                del jornada_por_mesa[mesa]
+
+    codigos = [c for c, m in mesa_por_codigo.items() if m in jornada_por_mesa]
+    actualizados = []
+
+    with transaction.atomic():
+        usados = qr_usados(QRUsado, codigos)
+        # solo cuentan los QR que inserto esta transaccion
+        nuevos = registrar_nuevos(QRUsado, [c for c in codigos if c not in usados])
+
+        netos = {}
+        for c in nuevos:
+            netos.setdefault(mesa_por_codigo[c], []).append(c)
+
+        for mesa, codigos_mesa in netos.items():
+            jornada = Rendimiento.sumar_bonches(jornada_por_mesa[mesa], len(codigos_mesa))
+            if jornada is None:
+                # la jornada se cerro mientras tanto: una vez con el id fresco
+                olvidar_jornada(mesa)
+                jornada_id = jornada_activa_id(mesa)
+                if jornada_id and jornada_id != jornada_por_mesa[mesa]:
+                    jornada = Rendimiento.sumar_bonches(jornada_id, len(codigos_mesa))
+            if jornada is None:
+                # como en el escaneo suelto: sin jornada el QR no queda usado
+                QRUsado.objects.filter(qr_id__in=codigos_mesa).delete()
+                nuevos.difference_update(codigos_mesa)
+                del jornada_por_mesa[mesa]
+            else:
+                actualizados.append(jornada)
 
-    try:
-        QRUsado.objects.create(qr_id=codigo)
-    except IntegrityError:
-        # Evita 500 por escaneo concurrente del mismo QR
-        return Response({"error": "Este QR ya fue utilizado"}, status=status.HTTP_409_CONFLICT)
+    registrar_qr_en_filtro(QRUsado, *nuevos)
 
-    jornada_base.bonches += 1
-    jornada_base.recalcular()
-    jornada_base.save()
+    for r in resultados:
+        if r["estado"] is not None:
+            continue
+        mesa = r.pop("numero_mesa")
+        if r["qr_id"] in nuevos:
+            r["estado"] = "aceptado"
+        elif mesa not in jornada_por_mesa:
+            r["estado"] = "sin_jornada"
+        else:
+            r["estado"] = "duplicado"
 
-    channel_layer = get_channel_layer()
-    async_to_sync(channel_layer.group_send)(
-        "rendimientos",
-        {"type": "nuevo_rendimiento", "data": RendimientoSerializer(jornada_base).data}
-    )
+    data = rendimiento_rapido.instancias(actualizados)
 
-    return Response(RendimientoSerializer(jornada_base).data, status=200)
+    if data:
+        notificar_rendimientos(data)
+
+    return Response({
+        "aceptados": len(nuevos),
+        "duplicados": sum(1 for r in resultados if r["estado"] == "duplicado"),
+        "resultados": resultados,
+        "jornadas": data,
+    }, status=200)
 
 
 @api_view(['GET', 'PUT', 'DELETE'])
@@ -301,11 +446,7 @@ def api_rendimiento_detail(request, pk):
             obj.recalcular()          
             obj.save()                
 
-            channel_layer = get_channel_layer()
-            async_to_sync(channel_layer.group_send)(
-                "rendimientos",
-                {"type": "nuevo_rendimiento", "data": RendimientoSerializer(obj).data}
-            )
+            notificar_rendimiento(obj)
 
             return Response(RendimientoSerializer(obj).data)
 
@@ -317,13 +458,56 @@ def api_rendimiento_detail(request, pk):
 
 
 
+def _rango_fechas(request):
+    """desde/hasta (AAAA-MM-DD) de la query; ValueError si el formato es invalido."""
+    desde = request.query_params.get("desde")
+    hasta = request.query_params.get("hasta")
+    return (
+        date.fromisoformat(desde) if desde else None,
+        date.fromisoformat(hasta) if hasta else None,
+    )
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def api_rendimiento_stats(request):
+    try:
+        desde, hasta = _rango_fechas(request)
+    except ValueError:
+        return Response({"error": "Formato de fecha invalido. Use AAAA-MM-DD."}, status=400)
+
+    # Totales desde el resumen diario: dias x mesas filas, no todos los escaneos
+    _, totales = resumen_rango(desde, hasta)
     jornadas = Rendimiento.objects.filter(qr_id="JORNADA")
     return Response({
-        'total_rendimientos': jornadas.count(),
+        'total_rendimientos': totales['jornadas'],
         'rendimientos_activos': jornadas.filter(hora_final__isnull=True).count(),
-        'total_bonches': jornadas.aggregate(Sum('bonches'))['bonches__sum'] or 0,
-        'mesas_activas': jornadas.filter(hora_final__isnull=True).values('numero_mesa').distinct().count()
+        'total_bonches': totales['bonches'],
+        'mesas_activas': jornadas.filter(hora_final__isnull=True).values('numero_mesa').distinct().count(),
+        'filtro_qr': estadisticas_filtro_qr(QRUsado),
+        'cache_jornadas': estadisticas_cache_jornadas(),
+        'difusion': estadisticas_difusion(),
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def api_rendimiento_resumen(request):
+    """
+    Produccion por dia y mesa (para graficos): ?desde=&hasta=&mesa=1&mesa=2
+    """
+    try:
+        desde, hasta = _rango_fechas(request)
+    except ValueError:
+        return Response({"error": "Formato de fecha invalido. Use AAAA-MM-DD."}, status=400)
+
+    filas, totales = resumen_rango(desde, hasta, request.query_params.getlist("mesa"))
+    for f in filas:
+        for campo in ("horas_trabajadas", "ramos_esperados", "ramos_extras"):
+            f[campo] = round(f[campo], 2)
+    return Response({
+        "desde": desde,
+        "hasta": hasta,
+        "totales": {c: round(v, 2) for c, v in totales.items()},
+        "dias": filas,
     })
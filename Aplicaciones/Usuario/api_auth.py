@@ -1,7 +1,8 @@
 from functools import wraps
-from django.http import JsonResponse
+from Aplicaciones.Usuario.json_rapido import JsonResponse
 from .jwt_utils import decodificar_token
 from .models import Usuario
+from .usuario_cache import TokenDesactualizado, usuario_de_payload
 
 def jwt_required(view_func):
     """
@@ -42,10 +43,12 @@ def jwt_required(view_func):
             return JsonResponse({"success": False, "error": "Token sin sub/user_id"}, status=401)
 
         try:
-            request.api_user = Usuario.objects.get(id=int(user_id))
+            request.api_user = usuario_de_payload(payload, user_id)
             request.api_admin = False
         except Usuario.DoesNotExist:
             return JsonResponse({"success": False, "error": "Usuario no existe"}, status=401)
+        except TokenDesactualizado:
+            return JsonResponse({"success": False, "error": "Token desactualizado: renueva el token"}, status=401)
 
         return view_func(request, *args, **kwargs)
 
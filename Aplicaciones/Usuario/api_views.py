@@ -1,13 +1,16 @@
 # Aplicaciones/Usuario/api_views.py
 
-from django.http import JsonResponse
+from Aplicaciones.Usuario.json_rapido import JSONDecodeError, JsonResponse
 from django.views.decorators.csrf import csrf_exempt
-from django.contrib.auth.hashers import make_password, check_password
-import json
 
 from .models import Usuario, Mesa
+from .clave_normalizada import clave_normalizada
 from .jwt_utils import crear_access_token, crear_refresh_token
+from .usuario_cache import claims_de
+from .hash_contrasenas import HashNoDisponible
+from .importar_usuarios import ArchivoInvalido, importar, leer_filas
 from Aplicaciones.Usuario.jwt_decorators import jwt_required
+from .cuerpo_json import CuerpoDemasiadoGrande, cuerpo_json, respuesta_demasiado_grande
 
 @csrf_exempt
 def registrar_usuario_api(request):
@@ -19,7 +22,7 @@ def registrar_usuario_api(request):
         return JsonResponse({"success": False, "error": "Método no permitido. Use POST"}, status=405)
 
     try:
-        data = json.loads(request.body.decode("utf-8"))
+        data = cuerpo_json(request)
 
         campos_requeridos = ["nombres", "apellidos", "mesa", "cargo", "username", "password"]
         faltantes = [c for c in campos_requeridos if not str(data.get(c, "")).strip()]
@@ -30,7 +33,7 @@ def registrar_usuario_api(request):
             )
 
         username = data["username"].strip()
-        if Usuario.objects.filter(username__iexact=username).exists():
+        if Usuario.objects.filter(username_clave=clave_normalizada(username)).exists():
             return JsonResponse({"success": False, "error": f"El usuario '{username}' ya existe"}, status=400)
 
         usuario = Usuario(
@@ -40,7 +43,7 @@ def registrar_usuario_api(request):
             cargo=data["cargo"].strip(),
             username=username,
         )
-        usuario.password = make_password(data["password"].strip())
+        usuario.set_password(data["password"].strip())
         usuario.save()
 
         return JsonResponse({
@@ -56,7 +59,11 @@ def registrar_usuario_api(request):
             }
         }, status=201)
 
-    except json.JSONDecodeError:
+    except HashNoDisponible:
+        return JsonResponse({"success": False, "error": "Servidor ocupado, intenta de nuevo en unos segundos"}, status=503)
+    except CuerpoDemasiadoGrande:
+        return respuesta_demasiado_grande()
+    except JSONDecodeError:
         return JsonResponse({"success": False, "error": "JSON inválido en el cuerpo de la solicitud"}, status=400)
     except Exception as e:
         return JsonResponse({"success": False, "error": f"Error del servidor: {str(e)}"}, status=500)
@@ -76,7 +83,7 @@ def login_usuario_api(request):
         return JsonResponse({"success": False, "error": "Método no permitido. Use POST"}, status=405)
 
     try:
-        data = json.loads(request.body.decode("utf-8"))
+        data = cuerpo_json(request)
         username = (data.get("username") or "").strip()
         password = (data.get("password") or "").strip()
 
@@ -84,19 +91,17 @@ def login_usuario_api(request):
             return JsonResponse({"success": False, "error": "Usuario y contraseña son requeridos"}, status=400)
 
 
-        usuario = Usuario.objects.filter(username__iexact=username).first()
+        usuario = Usuario.objects.filter(username_clave=clave_normalizada(username)).first()
         if not usuario:
             return JsonResponse({"success": False, "error": "Usuario no encontrado"}, status=404)
 
-        if not check_password(password, usuario.password):
+        if not usuario.check_password(password):
             return JsonResponse({"success": False, "error": "Credenciales incorrectas"}, status=401)
 
         payload_access = {
             "sub": str(usuario.id),
             "type": "access",
-            "username": usuario.username,
-            "cargo": usuario.cargo,
-            "mesa": usuario.mesa,
+            **claims_de(usuario),
         }
 
         payload_refresh = {
@@ -123,7 +128,11 @@ def login_usuario_api(request):
             }
         }, status=200)
 
-    except json.JSONDecodeError:
+    except HashNoDisponible:
+        return JsonResponse({"success": False, "error": "Servidor ocupado, intenta de nuevo en unos segundos"}, status=503)
+    except CuerpoDemasiadoGrande:
+        return respuesta_demasiado_grande()
+    except JSONDecodeError:
         return JsonResponse({"success": False, "error": "JSON inválido en el cuerpo de la solicitud"}, status=400)
     except Exception as e:
         return JsonResponse({"success": False, "error": f"Error del servidor: {str(e)}"}, status=500)
@@ -160,17 +169,49 @@ def verificar_mesa_api(request):
         return JsonResponse({"success": False, "error": "Método no permitido. Use POST"}, status=405)
 
     try:
-        data = json.loads(request.body.decode("utf-8"))
+        data = cuerpo_json(request)
         nombre_mesa = (data.get("nombre") or "").strip()
 
         if not nombre_mesa:
             return JsonResponse({"success": False, "error": "El nombre de la mesa es requerido"}, status=400)
 
-        existe = Mesa.objects.filter(nombre__iexact=nombre_mesa).exists()
+        existe = Mesa.objects.filter(nombre_clave=clave_normalizada(nombre_mesa)).exists()
 
         return JsonResponse({"success": True, "existe": existe, "nombre": nombre_mesa}, status=200)
 
-    except json.JSONDecodeError:
+    except CuerpoDemasiadoGrande:
+        return respuesta_demasiado_grande()
+    except JSONDecodeError:
         return JsonResponse({"success": False, "error": "JSON inválido"}, status=400)
     except Exception as e:
         return JsonResponse({"success": False, "error": f"Error del servidor: {str(e)}"}, status=500)
+
+
+@csrf_exempt
+@jwt_required(allowed_cargos=["ADMIN"])
+def importar_usuarios_api(request):
+    """
+    Importa usuarios desde CSV o Excel (solo ADMIN)
+    POST: /api/usuarios/importar/  (multipart, archivo en 'file')
+    ?validar=true solo valida, sin crear nada.
+
+    Devuelve el resultado por fila y las filas por segundo.
+    """
+    if request.method != "POST":
+        return JsonResponse({"success": False, "error": "Método no permitido. Use POST"}, status=405)
+
+    archivo = request.FILES.get("file")
+    if not archivo:
+        return JsonResponse({"success": False, "error": "Debes enviar un archivo en 'file'"}, status=400)
+
+    try:
+        filas = leer_filas(archivo.name, archivo.read())
+        informe = importar(filas, solo_validar=request.GET.get("validar") == "true")
+        return JsonResponse({"success": True, **informe}, status=200)
+
+    except ArchivoInvalido as e:
+        return JsonResponse({"success": False, "error": str(e)}, status=400)
+    except HashNoDisponible:
+        return JsonResponse({"success": False, "error": "Servidor ocupado, intenta de nuevo en unos segundos"}, status=503)
+    except Exception as e:
+        return JsonResponse({"success": False, "error": f"Error del servidor: {str(e)}"}, status=500)
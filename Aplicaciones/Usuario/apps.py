@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class UsuarioConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'Aplicaciones.Usuario'
+
+    def ready(self):
+        import Aplicaciones.Usuario.signals
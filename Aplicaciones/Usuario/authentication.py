@@ -2,6 +2,7 @@ from rest_framework.authentication import BaseAuthentication
 from rest_framework.exceptions import AuthenticationFailed
 from .models import Usuario
 from .jwt_utils import decodificar_token
+from .usuario_cache import TokenDesactualizado, obtener_usuario, usuario_de_payload
 class WebSessionAuthentication(BaseAuthentication):
     """
     Autenticación para la WEB usando request.session.
@@ -14,8 +15,8 @@ class WebSessionAuthentication(BaseAuthentication):
             return None  # DRF probará el siguiente auth (JWT)
 
         try:
-            usuario = Usuario.objects.get(id=int(user_id))
-        except Usuario.DoesNotExist:
+            usuario = obtener_usuario(user_id)
+        except (ValueError, TypeError, Usuario.DoesNotExist):
             # si hay sesión pero el usuario ya no existe
             request.session.flush()
             return None
@@ -50,9 +51,11 @@ class UsuarioJWTAuthentication(BaseAuthentication):
             raise AuthenticationFailed("Token sin 'sub'")
 
         try:
-            usuario = Usuario.objects.get(id=int(usuario_id))
+            usuario = usuario_de_payload(payload, usuario_id)
         except Usuario.DoesNotExist:
             raise AuthenticationFailed("Usuario no existe")
+        except TokenDesactualizado:
+            raise AuthenticationFailed("Token desactualizado: renueva el token")
 
         # DRF espera (user, auth). auth puede ser None
         return (usuario, None)
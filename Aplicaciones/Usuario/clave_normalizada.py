@@ -0,0 +1,36 @@
+# Aplicaciones/Usuario/clave_normalizada.py
+"""
+Clave de comparacion sin mayusculas para nombres unicos (username, mesa,
+variedad).
+
+username__iexact y nombre__iexact envuelven la columna en UPPER()/LIKE y no
+usan el indice unico. Los modelos guardan al hacer save() una columna
+*_clave con el valor sin espacios en los extremos y en casefold(), con
+indice unico, y las busquedas comparan por igualdad contra ella.
+
+Las filas que ya existian y solo se diferenciaban en mayusculas quedaron
+con "<clave>#dup<id>" (migraciones Usuario 0005 y Disponibilidad 0008);
+clave_para_guardar() se la conserva hasta que se cambie el nombre.
+"""
+
+
+def clave_normalizada(valor):
+    """'  Admin ' -> 'admin'; casefold() tambien iguala p. ej. 'ß' y 'ss'."""
+    return str(valor or "").strip().casefold()
+
+
+SUFIJO_DUPLICADO = "#dup"
+
+
+def clave_para_guardar(valor, clave_actual=None):
+    """
+    Clave que guarda save(): la normalizada, salvo que la fila tenga una
+    clave "#dup" de la migracion para ese mismo nombre (si no, cualquier
+    edicion chocaria con el indice unico).
+    """
+    clave = clave_normalizada(valor)
+    if clave_actual and SUFIJO_DUPLICADO in clave_actual:
+        base, _, pk = clave_actual.rpartition(SUFIJO_DUPLICADO)
+        if base == clave and pk.isdigit():
+            return clave_actual
+    return clave
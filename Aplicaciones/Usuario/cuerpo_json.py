@@ -0,0 +1,66 @@
+# Aplicaciones/Usuario/cuerpo_json.py
+"""
+Cuerpo JSON de la peticion, leido y parseado una sola vez.
+
+jwt_required(enforce_mesa=True) mira la mesa del body y la vista vuelve a
+necesitar el mismo body: el resultado (o el error) se guarda en el request y
+la segunda llamada no vuelve a parsear. Antes de leer se comprueba el
+tamano (Content-Length) contra settings.API_CUERPO_MAXIMO.
+"""
+from django.conf import settings
+from django.core.exceptions import RequestDataTooBig
+
+from .json_rapido import JsonResponse, loads
+
+
+_ATRIBUTO = "_cuerpo_json"
+
+
+class CuerpoDemasiadoGrande(ValueError):
+    pass
+
+
+def _maximo():
+    return getattr(settings, "API_CUERPO_MAXIMO", 64 * 1024)
+
+
+def _parsear(request):
+    try:
+        largo = int(request.META.get("CONTENT_LENGTH") or 0)
+    except ValueError:
+        largo = 0
+    if largo > _maximo():
+        raise CuerpoDemasiadoGrande(f"El cuerpo supera {_maximo()} bytes")
+    try:
+        crudo = request.body
+    except RequestDataTooBig as e:
+        raise CuerpoDemasiadoGrande(str(e)) from e
+    # sin Content-Length (chunked) el limite se comprueba tras leer
+    if len(crudo) > _maximo():
+        raise CuerpoDemasiadoGrande(f"El cuerpo supera {_maximo()} bytes")
+    return loads(crudo)
+
+
+def cuerpo_json(request):
+    """
+    Body parseado del request (dict, lista...). Lanza JSONDecodeError o
+    CuerpoDemasiadoGrande; el mismo error se repite en llamadas posteriores.
+    """
+    guardado = getattr(request, _ATRIBUTO, None)
+    if guardado is None:
+        try:
+            guardado = (_parsear(request), None)
+        except ValueError as e:
+            guardado = (None, e)
+        setattr(request, _ATRIBUTO, guardado)
+    datos, error = guardado
+    if error is not None:
+        raise error
+    return datos
+
+
+def respuesta_demasiado_grande():
+    return JsonResponse(
+        {"success": False, "error": f"El cuerpo de la solicitud supera {_maximo()} bytes"},
+        status=413,
+    )
@@ -0,0 +1,280 @@
+# Aplicaciones/Usuario/difusion.py
+"""
+Bandeja de salida (outbox) de la difusion por WebSocket.
+
+Las vistas no llaman a group_send: notificar_*() en signals.py de cada
+app llama a difundir(), que deja las filas para despues del commit
+(transaction.on_commit; si no hay transaccion abierta, en el momento).
+Un hilo por proceso con su propio event loop las envia, asi que una capa
+de canales lenta no suma latencia al escaneo y nunca se difunde algo que
+luego hace rollback.
+
+En la bandeja las filas se agrupan por grupo durante DIFUSION_VENTANA
+segundos (0.2 por defecto), se queda solo el ultimo estado de cada id y
+se manda un unico mensaje de lote ("lote_rendimientos",
+"lote_disponibilidad") con la lista de filas, el mismo formato que ya
+usan los endpoints de lote y que los templates aceptan. Con
+DIFUSION_VENTANA = 0 se envia en cuanto el hilo lo toma.
+
+La bandeja guarda como mucho DIFUSION_COLA_MAXIMA filas. Si se llena,
+DIFUSION_DESBORDE decide: "descartar_antiguas" (por defecto) saca la fila
+pendiente mas vieja del grupo mas grande; "descartar_nuevas" ignora la
+que llega. Una fila con un id ya pendiente nunca desborda (reemplaza).
+
+Si la capa de canales escucha en un event loop (consumers de este
+proceso, ver COMEXIGER/capa_canales.py) el envio se hace en ese loop; si
+no (workers WSGI), en el loop del hilo. Al salir del proceso, vaciar()
+envia lo pendiente en su propio loop con ESPERA_SALIDA segundos en total:
+el loop de los consumers ya puede estar detenido.
+"""
+import asyncio
+import atexit
+import itertools
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import transaction
+
+
+logger = logging.getLogger(__name__)
+
+ESPERA_ENVIO = 5  # segundos maximos por group_send
+ESPERA_SALIDA = 1  # segundos en total para vaciar la bandeja al salir
+DESCARTAR_ANTIGUAS = "descartar_antiguas"
+DESCARTAR_NUEVAS = "descartar_nuevas"
+
+_lock = threading.Lock()
+_pendientes = {}  # grupo -> {"tipo", "filas": OrderedDict(id -> fila), "vence"}
+_total = 0        # filas en _pendientes
+_loop = None
+_despertar = None  # asyncio.Event del loop del hilo
+_sin_id = itertools.count()
+
+_metricas = {
+    "llamadas": 0,      # difundir() recibidos (antes: un mensaje cada uno)
+    "filas": 0,         # filas recibidas
+    "mensajes": 0,      # lotes enviados de verdad
+    "filas_enviadas": 0,
+    "descartadas": 0,   # por bandeja llena
+    "errores": 0,
+}
+
+
+def _ventana():
+    return getattr(settings, "DIFUSION_VENTANA", 0.2)
+
+
+def _maximo_filas():
+    return getattr(settings, "DIFUSION_MAX_FILAS", 500)
+
+
+def _cola_maxima():
+    return max(1, getattr(settings, "DIFUSION_COLA_MAXIMA", 10_000))
+
+
+def _desborde():
+    return getattr(settings, "DIFUSION_DESBORDE", DESCARTAR_ANTIGUAS)
+
+
+# ---------- hilo de envio ----------
+
+async def _enviar(grupo, tipo, filas, directo=False):
+    capa = get_channel_layer()
+    mensaje = {"type": tipo, "data": filas}
+    destino = None if directo else getattr(capa, "loop", None)
+    try:
+        if destino is not None and destino.is_running() and destino is not asyncio.get_running_loop():
+            futuro = asyncio.run_coroutine_threadsafe(capa.group_send(grupo, mensaje), destino)
+            await asyncio.wait_for(asyncio.wrap_future(futuro), ESPERA_ENVIO)
+        else:
+            await asyncio.wait_for(capa.group_send(grupo, mensaje), ESPERA_ENVIO)
+    except Exception:
+        logger.exception("No se pudo difundir el lote de %s (%d filas)", grupo, len(filas))
+        with _lock:
+            _metricas["errores"] += 1
+        return
+    with _lock:
+        _metricas["mensajes"] += 1
+        _metricas["filas_enviadas"] += len(filas)
+
+
+def _tomar_vencidos(todos=False):
+    """Saca de la bandeja los grupos cuya ventana termino. Llamar con _lock."""
+    global _total
+    ahora = time.monotonic()
+    listos = [(g, p) for g, p in _pendientes.items() if todos or p["vence"] <= ahora]
+    for grupo, pendiente in listos:
+        del _pendientes[grupo]
+        _total -= len(pendiente["filas"])
+    return [(g, p["tipo"], list(p["filas"].values())) for g, p in listos]
+
+
+async def _emisor():
+    while True:
+        with _lock:
+            proximo = min((p["vence"] for p in _pendientes.values()), default=None)
+        if proximo is None:
+            await _despertar.wait()
+            _despertar.clear()
+            continue
+        espera = proximo - time.monotonic()
+        if espera > 0:
+            try:
+                # un lote lleno puede adelantar el envio
+                await asyncio.wait_for(_despertar.wait(), espera)
+                _despertar.clear()
+            except asyncio.TimeoutError:
+                pass
+        with _lock:
+            listos = _tomar_vencidos()
+        # uno detras de otro: mientras se envia, lo nuevo sigue fusionandose
+        for grupo, tipo, filas in listos:
+            await _enviar(grupo, tipo, filas)
+
+
+def _correr(loop, listo):
+    global _despertar
+    asyncio.set_event_loop(loop)
+    _despertar = asyncio.Event()
+    listo.set()
+    loop.run_until_complete(_emisor())
+
+
+def _asegurar_hilo():
+    """Loop del hilo de envio (lo arranca la primera vez). Llamar con _lock."""
+    global _loop
+    if _loop is None:
+        _loop = asyncio.new_event_loop()
+        listo = threading.Event()
+        threading.Thread(target=_correr, args=(_loop, listo), name="difusion-websocket", daemon=True).start()
+        listo.wait()
+    return _loop
+
+
+def _despues_de_fork():
+    # Passenger y similares hacen fork: el hijo no tiene el hilo del padre
+    global _lock, _pendientes, _total, _loop, _despertar
+    _lock = threading.Lock()
+    _pendientes = {}
+    _total = 0
+    _loop = None
+    _despertar = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_despues_de_fork)
+
+
+# ---------- bandeja ----------
+
+def _descartar_antigua():
+    """Saca la fila mas vieja del grupo con mas pendientes. Llamar con _lock."""
+    global _total
+    grupo = max(_pendientes, key=lambda g: len(_pendientes[g]["filas"]))
+    _pendientes[grupo]["filas"].popitem(last=False)
+    _total -= 1
+    if not _pendientes[grupo]["filas"]:
+        del _pendientes[grupo]
+
+
+def _encolar(grupo, tipo_lote, filas):
+    global _total
+    ventana = _ventana()
+    with _lock:
+        pendiente = _pendientes.get(grupo)
+        # el hilo solo necesita despertar si hay un plazo nuevo o adelantado
+        despertar = pendiente is None
+        if pendiente is None:
+            pendiente = _pendientes[grupo] = {
+                "tipo": tipo_lote,
+                "filas": OrderedDict(),
+                "vence": time.monotonic() + ventana,
+            }
+        for fila in filas:
+            clave = fila.get("id")
+            if clave is None:
+                clave = ("sin_id", next(_sin_id))
+            if clave in pendiente["filas"]:
+                pendiente["filas"].move_to_end(clave)
+            else:
+                if _total >= _cola_maxima():
+                    _metricas["descartadas"] += 1
+                    if _desborde() == DESCARTAR_NUEVAS:
+                        continue
+                    _descartar_antigua()
+                    if grupo not in _pendientes:
+                        _pendientes[grupo] = pendiente
+                _total += 1
+            pendiente["filas"][clave] = fila
+        if not pendiente["filas"]:
+            del _pendientes[grupo]
+            return
+        if (len(pendiente["filas"]) >= _maximo_filas() or ventana <= 0) and pendiente["vence"]:
+            pendiente["vence"] = 0
+            despertar = True
+        loop = _asegurar_hilo()
+    if despertar:
+        loop.call_soon_threadsafe(_despertar.set)
+
+
+def difundir(grupo, tipo_lote, filas):
+    """
+    Encola filas (dicts con "id") para el grupo, despues del commit de la
+    transaccion en curso. Se envian juntas como {"type": tipo_lote,
+    "data": [filas]} al terminar la ventana; una fila con el mismo id que
+    otra pendiente la reemplaza.
+    """
+    if isinstance(filas, dict):
+        filas = [filas]
+    if not filas:
+        return
+    with _lock:
+        _metricas["llamadas"] += 1
+        _metricas["filas"] += len(filas)
+    # las filas se serializaron antes: se difunde el estado que se guardo
+    transaction.on_commit(lambda: _encolar(grupo, tipo_lote, filas))
+
+
+def vaciar(espera=None):
+    """
+    Envia ya todo lo pendiente en el hilo que llama (al salir del proceso),
+    con espera segundos en total (ESPERA_SALIDA). No pasa por el loop de
+    los consumers, que al salir puede estar detenido: la capa entrega en el
+    loop nuevo (a los otros procesos por su socket).
+    """
+    with _lock:
+        listos = _tomar_vencidos(todos=True)
+    if not listos:
+        return
+
+    async def enviar_todos():
+        for grupo, tipo, filas in listos:
+            await _enviar(grupo, tipo, filas, directo=True)
+
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(asyncio.wait_for(enviar_todos(), ESPERA_SALIDA if espera is None else espera))
+    except asyncio.TimeoutError:
+        logger.warning("Difusion: no se alcanzo a enviar todo al salir (%d lotes)", len(listos))
+    finally:
+        loop.close()
+
+
+atexit.register(vaciar)
+
+
+def estadisticas():
+    with _lock:
+        datos = dict(_metricas)
+        datos["pendientes"] = _total
+    datos["ventana"] = _ventana()
+    datos["cola_maxima"] = _cola_maxima()
+    datos["mensajes_ahorrados"] = max(0, datos["llamadas"] - datos["mensajes"])
+    datos["filas_fusionadas"] = max(
+        0, datos["filas"] - datos["filas_enviadas"] - datos["pendientes"] - datos["descartadas"])
+    return datos
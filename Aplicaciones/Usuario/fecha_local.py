@@ -0,0 +1,30 @@
+# Aplicaciones/Usuario/fecha_local.py
+"""
+Fecha de negocio local (America/Guayaquil) guardada como columna.
+
+Filtrar con fecha_entrada__date envuelve la columna en una conversion de
+zona horaria y ningun indice sirve. Los modelos guardan fecha_local al
+hacer save(), y aqui se traducen los filtros de fecha a esa columna.
+"""
+from django.utils import timezone
+
+
+def fecha_local(dt):
+    """Fecha local de un datetime (None si no hay)."""
+    return timezone.localdate(dt) if dt is not None else None
+
+
+def filtrar_por_fecha(qs, fecha=None, desde=None, hasta=None, campo="fecha_local"):
+    """
+    Equivale a fecha_entrada__date=fecha / __gte=desde / __lte=hasta pero
+    sobre la columna indexada. Acepta date o "AAAA-MM-DD".
+    """
+    if fecha:
+        qs = qs.filter(**{campo: fecha})
+    if desde and hasta:
+        qs = qs.filter(**{f"{campo}__range": [desde, hasta]})
+    elif desde:
+        qs = qs.filter(**{f"{campo}__gte": desde})
+    elif hasta:
+        qs = qs.filter(**{f"{campo}__lte": hasta})
+    return qs
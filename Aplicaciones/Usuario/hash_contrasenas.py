@@ -0,0 +1,245 @@
+# Aplicaciones/Usuario/hash_contrasenas.py
+"""
+Hash y verificacion de contrasenas en un pool de procesos acotado.
+
+Cada check_password/make_password (PBKDF2 o Argon2) ocupa la CPU cientos
+de milisegundos. Al inicio del turno todos inician sesion a la vez: aqui el
+trabajo se manda a HASH_PROCESOS procesos (pocos: cada worker web tiene su
+propio pool y cada hijo carga Django). Nunca hay mas hashes enviados que
+procesos, asi que un hash no espera en la cola del pool: las peticiones
+esperan un proceso libre hasta HASH_ESPERA segundos, como mucho
+HASH_COLA_MAXIMA a la vez, y HASH_TIMEOUT cuenta solo el hash. Si no hay
+cupo o se agota el tiempo se lanza HashNoDisponible (las vistas responden
+503 y el cliente reintenta) en vez de acumular hilos bloqueados.
+
+Con HASH_PROCESOS = 0 todo se ejecuta en el hilo que llama. Si el pool se
+cae (p. ej. forkserver/spawn vuelven a importar un script de entrada sin
+guardia `if __name__ == "__main__"`) el hash se hace en el hilo y, tras
+varias caidas seguidas, el pool se desactiva en ese proceso.
+
+Al verificar, si el hash guardado usa un algoritmo o parametros antiguos
+(p. ej. PBKDF2 con Argon2 activado en PASSWORD_HASHERS) se recalcula con el
+preferido y se guarda: la migracion ocurre sola en el siguiente login.
+"""
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures import TimeoutError as FuturesTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+from django.db import transaction
+
+
+logger = logging.getLogger(__name__)
+
+CAIDAS_MAXIMAS = 3
+
+
+class HashNoDisponible(Exception):
+    pass
+
+
+_lock = threading.Lock()
+_ejecutor = None
+_libres = None     # un cupo por proceso del pool
+_en_cola = 0       # peticiones esperando cupo
+_caidas = 0        # caidas seguidas del pool
+_desactivado = False
+
+
+def _procesos():
+    return 0 if _desactivado else getattr(settings, "HASH_PROCESOS", 0)
+
+
+# ---------- en el proceso hijo ----------
+
+def _iniciar_proceso(modulo_settings, hashers):
+    # forkserver/spawn arrancan un interprete nuevo: cargar Django con los
+    # mismos PASSWORD_HASHERS que el proceso web
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", modulo_settings)
+    import django
+    django.setup()
+    settings.PASSWORD_HASHERS = hashers
+
+
+def _hashear(password):
+    return make_password(password)
+
+
+def _hashear_varios(passwords):
+    return [make_password(p) for p in passwords]
+
+
+def _verificar(password, encoded):
+    """(correcta, nuevo_hash o None si no hace falta rehash)."""
+    nuevo = []
+    correcta = check_password(password, encoded, setter=lambda raw: nuevo.append(make_password(raw)))
+    return correcta, (nuevo[0] if nuevo else None)
+
+
+# ---------- en el proceso web ----------
+
+def _pool():
+    global _ejecutor, _libres
+    with _lock:
+        if _ejecutor is None:
+            # fork desde un servidor con hilos puede heredar locks tomados
+            metodos = multiprocessing.get_all_start_methods()
+            contexto = multiprocessing.get_context("forkserver" if "forkserver" in metodos else "spawn")
+            _ejecutor = ProcessPoolExecutor(
+                max_workers=_procesos(),
+                mp_context=contexto,
+                initializer=_iniciar_proceso,
+                initargs=(os.environ.get("DJANGO_SETTINGS_MODULE", "COMEXIGER.settings"),
+                          list(settings.PASSWORD_HASHERS)),
+            )
+            _libres = threading.BoundedSemaphore(_procesos())
+        return _ejecutor, _libres
+
+
+def _descartar_pool():
+    global _ejecutor
+    with _lock:
+        if _ejecutor is not None:
+            _ejecutor.shutdown(wait=False, cancel_futures=True)
+            _ejecutor = None
+
+
+def _pool_caido():
+    global _caidas, _desactivado
+    _descartar_pool()
+    with _lock:
+        _caidas += 1
+        if _caidas >= CAIDAS_MAXIMAS and not _desactivado:
+            _desactivado = True
+            logger.error("Pool de hash caido %d veces seguidas: se hashea en el hilo de la peticion", _caidas)
+            return
+    logger.warning("Pool de hash caido: este hash se hace en el hilo de la peticion")
+
+
+def _pool_sano():
+    global _caidas
+    _caidas = 0
+
+
+def _tomar_cupo(libres, bloquear=True):
+    """Espera un proceso libre (HASH_ESPERA) si la cola no esta llena."""
+    global _en_cola
+    if not bloquear:
+        return libres.acquire(blocking=False)
+    with _lock:
+        if _en_cola >= getattr(settings, "HASH_COLA_MAXIMA", 64):
+            raise HashNoDisponible("Cola de hash llena")
+        _en_cola += 1
+    try:
+        if not libres.acquire(timeout=getattr(settings, "HASH_ESPERA", 15)):
+            raise HashNoDisponible("Cola de hash llena")
+    finally:
+        with _lock:
+            _en_cola -= 1
+    return True
+
+
+def _ejecutar(funcion, *args):
+    if _procesos() <= 0:
+        return funcion(*args)
+
+    ejecutor, libres = _pool()
+    _tomar_cupo(libres)
+    try:
+        futuro = ejecutor.submit(funcion, *args)
+        # el cupo garantiza un proceso libre: el tiempo es el del hash
+        resultado = futuro.result(timeout=getattr(settings, "HASH_TIMEOUT", 30))
+    except FuturesTimeout:
+        # el hijo termina igual ese hash; el cupo se libera antes, asi que
+        # el siguiente puede esperar un poco en la cola del pool
+        futuro.cancel()
+        raise HashNoDisponible("Tiempo de hash agotado")
+    except BrokenProcessPool:
+        _pool_caido()
+        return funcion(*args)
+    finally:
+        libres.release()
+    _pool_sano()
+    return resultado
+
+
+def hashear(password):
+    """make_password() en el pool."""
+    return _ejecutar(_hashear, password)
+
+
+def hashear_lote(passwords):
+    """
+    make_password() de muchas contrasenas (importaciones), en trozos. Usa
+    los procesos libres que haya (al menos uno) sin dejar trozos en la cola
+    del pool, asi los logins que llegan mientras tanto no esperan detras.
+    """
+    passwords = list(passwords)
+    procesos = _procesos()
+    if procesos <= 0 or len(passwords) <= 1:
+        return [_ejecutar(_hashear, p) for p in passwords]
+
+    ejecutor, libres = _pool()
+    _tomar_cupo(libres)
+    cupos = 1
+    while cupos < procesos and _tomar_cupo(libres, bloquear=False):
+        cupos += 1
+
+    tamano = max(1, -(-len(passwords) // (procesos * 4)))
+    trozos = [(i, passwords[i:i + tamano]) for i in range(0, len(passwords), tamano)]
+    limite = getattr(settings, "HASH_TIMEOUT", 30) * tamano
+    hashes = [None] * len(passwords)
+    en_curso = {}
+    try:
+        while trozos or en_curso:
+            while trozos and len(en_curso) < cupos:
+                inicio, trozo = trozos.pop(0)
+                en_curso[ejecutor.submit(_hashear_varios, trozo)] = inicio
+            listos, _ = wait(en_curso, timeout=limite, return_when=FIRST_COMPLETED)
+            if not listos:
+                raise FuturesTimeout()
+            for futuro in listos:
+                inicio = en_curso.pop(futuro)
+                resultado = futuro.result()
+                hashes[inicio:inicio + len(resultado)] = resultado
+    except FuturesTimeout:
+        for futuro in en_curso:
+            futuro.cancel()
+        raise HashNoDisponible("Tiempo de hash agotado")
+    except BrokenProcessPool:
+        _pool_caido()
+        return [h if h is not None else make_password(p) for h, p in zip(hashes, passwords)]
+    finally:
+        for _ in range(cupos):
+            libres.release()
+    _pool_sano()
+    return hashes
+
+
+def verificar(password, encoded):
+    """(correcta, nuevo_hash o None). Lanza HashNoDisponible."""
+    if not encoded:
+        return False, None
+    return _ejecutar(_verificar, password, encoded)
+
+
+def verificar_usuario(usuario, password):
+    """
+    check_password() del usuario en el pool; si hace falta, guarda el hash
+    recalculado (solo la columna password). update() no pasa por post_save:
+    el cache de usuarios se invalida aqui.
+    """
+    correcta, nuevo = verificar(password, usuario.password)
+    if correcta and nuevo:
+        from .usuario_cache import invalidar
+
+        usuario.password = nuevo
+        type(usuario).objects.filter(pk=usuario.pk).update(password=nuevo)
+        usuario_id = usuario.pk
+        transaction.on_commit(lambda: invalidar(usuario_id))
+    return correcta
@@ -0,0 +1,211 @@
+# Aplicaciones/Usuario/importar_usuarios.py
+"""
+Importacion de usuarios desde CSV o Excel (personal de temporada).
+
+Columnas (primera fila): nombres, apellidos, mesa, cargo, username,
+password. Se validan todas las filas con las mismas reglas que el
+formulario web (guardar_usuario), los username se comparan contra la BD
+con una sola consulta IN sobre username_clave, las contrasenas se
+hashean en el pool de procesos y los usuarios validos se crean con
+bulk_create. Las mesas que no existan se crean.
+
+Si otro proceso crea uno de esos username entre la consulta y el
+bulk_create, el indice unico lo rechaza: se buscan los que ya existen, se
+informan como error y se crean los demas.
+"""
+import csv
+import io
+import time
+
+from django.db import IntegrityError, transaction
+from openpyxl import load_workbook
+
+from .clave_normalizada import clave_normalizada
+from .hash_contrasenas import hashear_lote
+from .models import Mesa, Usuario
+from .views import CARGOS_MESA_CERO, CARGOS_PERMITIDOS
+
+
+COLUMNAS = ("nombres", "apellidos", "mesa", "cargo", "username", "password")
+# encabezados alternativos que ya usan las planillas del formulario web
+ALIAS = {"usuario": "username", "contrasena": "password", "contraseña": "password"}
+LOTE_IN = 500
+REINTENTOS_CREAR = 3
+
+
+class ArchivoInvalido(ValueError):
+    pass
+
+
+def _texto(valor):
+    if valor is None:
+        return ""
+    if isinstance(valor, float) and valor.is_integer():
+        # Excel guarda la mesa 5 como 5.0
+        valor = int(valor)
+    return str(valor).strip()
+
+
+def leer_filas(nombre_archivo, contenido):
+    """
+    Lista de dicts (una por fila de datos) desde bytes de un .csv o .xlsx.
+    Lanza ArchivoInvalido si no se puede leer o faltan columnas.
+    """
+    if contenido[:2] == b"PK" or (nombre_archivo or "").lower().endswith((".xlsx", ".xlsm")):
+        try:
+            hoja = load_workbook(filename=io.BytesIO(contenido), read_only=True, data_only=True).active
+            filas = [list(f) for f in hoja.iter_rows(values_only=True)]
+        except Exception as e:
+            raise ArchivoInvalido(f"No se pudo leer el Excel: {e}")
+    else:
+        try:
+            texto = contenido.decode("utf-8-sig")
+        except UnicodeDecodeError:
+            texto = contenido.decode("latin-1")
+        try:
+            dialecto = csv.Sniffer().sniff(texto[:4096], delimiters=",;\t")
+        except csv.Error:
+            dialecto = csv.excel
+        filas = list(csv.reader(io.StringIO(texto), dialecto))
+
+    if not filas:
+        raise ArchivoInvalido("El archivo está vacío.")
+
+    encabezado = [_texto(c).lower() for c in filas[0]]
+    encabezado = [ALIAS.get(c, c) for c in encabezado]
+    faltantes = [c for c in COLUMNAS if c not in encabezado]
+    if faltantes:
+        raise ArchivoInvalido(f"Faltan columnas: {', '.join(faltantes)}")
+    indices = {c: encabezado.index(c) for c in COLUMNAS}
+
+    datos = []
+    for fila in filas[1:]:
+        if not any(_texto(c) for c in fila):
+            continue
+        datos.append({c: _texto(fila[i]) if i < len(fila) else "" for c, i in indices.items()})
+    return datos
+
+
+def _validar(fila):
+    """Fila normalizada o mensaje de error (mismas reglas que guardar_usuario)."""
+    fila = dict(fila)
+    fila["cargo"] = fila["cargo"].upper()
+
+    if not fila["nombres"] or not fila["apellidos"] or not fila["username"] or not fila["password"]:
+        return None, "Todos los campos son obligatorios."
+    if fila["cargo"] not in CARGOS_PERMITIDOS:
+        return None, "Cargo no permitido."
+    if len(fila["password"]) < 6:
+        return None, "La contrasena debe tener al menos 6 caracteres."
+    if fila["cargo"] in CARGOS_MESA_CERO:
+        fila["mesa"] = "0"
+    elif not fila["mesa"].isdigit() or int(fila["mesa"]) <= 0:
+        return None, "La mesa debe ser un numero mayor a 0."
+    else:
+        fila["mesa"] = str(int(fila["mesa"]))
+    return fila, None
+
+
+def _usernames_existentes(claves):
+    """Claves normalizadas de username que ya existen, con consultas IN por lotes."""
+    claves = list(claves)
+    existentes = set()
+    for i in range(0, len(claves), LOTE_IN):
+        existentes.update(
+            Usuario.objects
+            .filter(username_clave__in=claves[i:i + LOTE_IN])
+            .values_list("username_clave", flat=True)
+        )
+    return existentes
+
+
+def _crear(usuarios):
+    """Crea las mesas que falten y los usuarios; devuelve las mesas creadas."""
+    mesas = {u.mesa for u in usuarios if u.mesa != "0"}
+    with transaction.atomic():
+        existentes = set(Mesa.objects.filter(nombre_clave__in=mesas).values_list("nombre_clave", flat=True))
+        mesas_creadas = sorted(mesas - existentes, key=int)
+        Mesa.objects.bulk_create([Mesa(nombre=m, nombre_clave=clave_normalizada(m)) for m in mesas_creadas],
+                                 ignore_conflicts=True)
+        Usuario.objects.bulk_create(usuarios, batch_size=500)
+    return mesas_creadas
+
+
+def importar(filas, solo_validar=False):
+    """
+    Valida e importa las filas de leer_filas(). Las filas con error se
+    informan y no se crean; las demas se crean juntas en una transaccion.
+    Devuelve el informe (dict serializable). Lanza HashNoDisponible.
+    """
+    inicio = time.perf_counter()
+    resultados = []
+    validas = []
+    vistos = set()
+
+    for numero, fila in enumerate(filas, start=2):  # fila 1 = encabezado
+        limpia, error = _validar(fila)
+        clave = clave_normalizada(fila["username"])
+        if error is None and clave in vistos:
+            error = "Username repetido en el archivo."
+        vistos.add(clave)
+        resultados.append({"fila": numero, "username": fila["username"], "estado": "error" if error else "ok", "error": error})
+        if error is None:
+            validas.append((resultados[-1], limpia))
+
+    existentes = _usernames_existentes(clave_normalizada(limpia["username"]) for _, limpia in validas)
+    nuevas = []
+    for resultado, limpia in validas:
+        if clave_normalizada(limpia["username"]) in existentes:
+            resultado.update(estado="error", error="Ese usuario ya existe.")
+        else:
+            nuevas.append((resultado, limpia))
+
+    mesas_creadas = []
+    if not solo_validar and nuevas:
+        hashes = hashear_lote(limpia["password"] for _, limpia in nuevas)
+        usuarios = [
+            Usuario(
+                nombres=limpia["nombres"],
+                apellidos=limpia["apellidos"],
+                mesa=limpia["mesa"],
+                cargo=limpia["cargo"],
+                username=limpia["username"],
+                # bulk_create no pasa por save()
+                username_clave=clave_normalizada(limpia["username"]),
+                password=hash_,
+            )
+            for (_, limpia), hash_ in zip(nuevas, hashes)
+        ]
+        for intento in range(REINTENTOS_CREAR):
+            try:
+                mesas_creadas = _crear(usuarios)
+                break
+            except IntegrityError:
+                # un username creado por otro proceso despues de la consulta
+                ocupados = _usernames_existentes(u.username_clave for u in usuarios)
+                if not ocupados or intento == REINTENTOS_CREAR - 1:
+                    raise
+                pendientes = []
+                for (resultado, limpia), usuario in zip(nuevas, usuarios):
+                    if usuario.username_clave in ocupados:
+                        resultado.update(estado="error", error="Ese usuario ya existe.")
+                    else:
+                        pendientes.append(((resultado, limpia), usuario))
+                nuevas = [n for n, _ in pendientes]
+                usuarios = [u for _, u in pendientes]
+                if not usuarios:
+                    break
+        for resultado, _ in nuevas:
+            resultado["estado"] = "creado"
+
+    segundos = time.perf_counter() - inicio
+    return {
+        "total": len(resultados),
+        "creados": sum(1 for r in resultados if r["estado"] == "creado"),
+        "validos": len(nuevas),
+        "errores": sum(1 for r in resultados if r["estado"] == "error"),
+        "mesas_creadas": mesas_creadas,
+        "segundos": round(segundos, 3),
+        "filas_por_segundo": round(len(resultados) / segundos, 1) if segundos else None,
+        "filas": resultados,
+    }
@@ -0,0 +1,143 @@
+# Aplicaciones/Usuario/json_rapido.py
+"""
+Codificacion JSON con orjson (si esta instalado) y respaldo en json estandar.
+
+Lo usan el renderer y el parser de DRF (ver REST_FRAMEWORK en settings),
+el JsonResponse de las vistas de funcion y los consumers de Channels.
+Las fechas y los Decimal siguen saliendo como hoy: orjson no los toca
+(OPT_PASSTHROUGH_DATETIME) y se delegan al default() del encoder de DRF o
+de Django, segun quien respondia antes.
+
+orjson escribe NaN e Infinity como null. Si la salida tiene algun null se
+revisa el objeto y, si hay flotantes no finitos, se codifica con la
+libreria estandar: estilo "drf" lanza ValueError como el JSONRenderer
+estricto de DRF y estilo "django" escribe NaN como JsonResponse.
+
+Unica diferencia de bytes conocida: los flotantes muy grandes o muy chicos
+salen con otro exponente (orjson 1e16 / 0.00001, json 1e+16 / 1e-05);
+el valor leido es el mismo.
+
+settings.JSON_BACKEND = "json" fuerza la libreria estandar.
+"""
+import json
+import math
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder as DRFJSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depende del entorno
+    orjson = None
+
+
+JSONDecodeError = json.JSONDecodeError  # orjson.JSONDecodeError hereda de esta
+
+_OPCIONES = (orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS) if orjson else 0
+_default_drf = DRFJSONEncoder().default
+_default_django = DjangoJSONEncoder().default
+
+
+def usa_orjson():
+    return orjson is not None and getattr(settings, "JSON_BACKEND", "orjson") != "json"
+
+
+def _hay_no_finitos(obj):
+    pendientes = [obj]
+    while pendientes:
+        valor = pendientes.pop()
+        if isinstance(valor, float):
+            if not math.isfinite(valor):
+                return True
+        elif isinstance(valor, dict):
+            pendientes.extend(valor.values())
+        elif isinstance(valor, (list, tuple)):
+            pendientes.extend(valor)
+        elif isinstance(valor, Decimal) and not valor.is_finite():
+            return True
+    return False
+
+
+def dumps(obj, estilo="drf"):
+    """
+    bytes JSON compactos en UTF-8.
+    estilo="drf": datetime con "Z", Decimal -> float (como JSONRenderer).
+    estilo="django": datetime en milisegundos, Decimal -> str (como JsonResponse).
+    """
+    default = _default_drf if estilo == "drf" else _default_django
+    if usa_orjson():
+        try:
+            contenido = orjson.dumps(obj, default=default, option=_OPCIONES)
+        except orjson.JSONEncodeError:
+            # p. ej. enteros de mas de 64 bits: lo resuelve la libreria estandar
+            pass
+        else:
+            # sin null en la salida no hubo NaN/Infinity convertidos
+            if b"null" not in contenido or not _hay_no_finitos(obj):
+                return contenido
+    encoder = DRFJSONEncoder if estilo == "drf" else DjangoJSONEncoder
+    return json.dumps(obj, cls=encoder, ensure_ascii=False, separators=(",", ":"),
+                      allow_nan=estilo != "drf").encode()
+
+
+def dumps_texto(obj, estilo="drf"):
+    return dumps(obj, estilo).decode()
+
+
+def loads(data):
+    """Acepta bytes o str. Lanza JSONDecodeError (subclase de ValueError)."""
+    if usa_orjson():
+        return orjson.loads(data)
+    if isinstance(data, (bytes, bytearray)):
+        data = data.decode("utf-8")
+    return json.loads(data)
+
+
+class JSONRendererRapido(JSONRenderer):
+    """JSONRenderer de DRF con orjson; con ?indent usa el original."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        # igual que DRF: U+2028 y U+2029 escapados (JSON valido como JavaScript)
+        return (dumps(data)
+                .replace("\u2028".encode(), b"\\u2028")
+                .replace("\u2029".encode(), b"\\u2029"))
+
+
+class JSONParserRapido(JSONParser):
+    renderer_class = JSONRendererRapido
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return loads(stream.read())
+        except ValueError as exc:
+            raise ParseError("JSON parse error - %s" % str(exc))
+
+
+class JsonResponse(HttpResponse):
+    """
+    Reemplazo de django.http.JsonResponse con la misma firma.
+    Con encoder o json_dumps_params propios se usa la libreria estandar.
+    """
+
+    def __init__(self, data, encoder=DjangoJSONEncoder, safe=True, json_dumps_params=None, **kwargs):
+        if safe and not isinstance(data, dict):
+            raise TypeError(
+                "In order to allow non-dict objects to be serialized set the "
+                "safe parameter to False."
+            )
+        kwargs.setdefault("content_type", "application/json")
+        if encoder is DjangoJSONEncoder and not json_dumps_params:
+            contenido = dumps(data, estilo="django")
+        else:
+            contenido = json.dumps(data, cls=encoder, **(json_dumps_params or {}))
+        super().__init__(content=contenido, **kwargs)
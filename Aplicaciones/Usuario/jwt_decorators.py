@@ -1,9 +1,11 @@
 # Aplicaciones/Usuario/jwt_decorators.py
 
 from functools import wraps
-from django.http import JsonResponse
+from Aplicaciones.Usuario.cuerpo_json import cuerpo_json
+from Aplicaciones.Usuario.json_rapido import JsonResponse
 from Aplicaciones.Usuario.jwt_utils import decodificar_token
 from Aplicaciones.Usuario.models import Usuario
+from Aplicaciones.Usuario.usuario_cache import TokenDesactualizado, usuario_de_payload
 
 def jwt_required(view_func=None, *, allowed_cargos=None, enforce_mesa=False):
     def decorator(func):
@@ -36,17 +38,22 @@ def jwt_required(view_func=None, *, allowed_cargos=None, enforce_mesa=False):
                 return JsonResponse({"success": False, "error": "Token sin 'sub'"}, status=401)
 
             try:
-                usuario = Usuario.objects.get(id=int(usuario_id))
+                usuario = usuario_de_payload(payload, usuario_id)
             except Usuario.DoesNotExist:
                 return JsonResponse({"success": False, "error": "Usuario no existe"}, status=401)
+            except TokenDesactualizado:
+                return JsonResponse({"success": False, "error": "Token desactualizado: renueva el token"}, status=401)
 
 
             request.usuario = usuario
             request.jwt_payload = payload
 
 
+            # permisos con los claims firmados (usuario_de_payload ya
+            # comprobo que siguen vigentes)
+            cargo_user = (payload.get("cargo", usuario.cargo) or "").strip().upper()
+
             if allowed_cargos:
-                cargo_user = (usuario.cargo or "").strip().upper()
                 allowed = [c.strip().upper() for c in allowed_cargos]
                 if cargo_user not in allowed:
                     return JsonResponse(
@@ -56,7 +63,6 @@ def jwt_required(view_func=None, *, allowed_cargos=None, enforce_mesa=False):
 
        
             if enforce_mesa:
-                cargo_user = (usuario.cargo or "").strip().upper()
                 # cargos con acceso global (ajusta si quieres)
                 cargos_globales = {"ADMIN", "SUPERVISOR"}
 
@@ -67,17 +73,17 @@ def jwt_required(view_func=None, *, allowed_cargos=None, enforce_mesa=False):
                         or None
                     )
                     if request.method in ("POST", "PUT", "PATCH"):
-                        # intenta leer mesa desde body JSON si viene
+                        # intenta leer mesa desde body JSON si viene (queda
+                        # guardado en el request para la vista)
                         try:
-                            import json
-                            body = json.loads(request.body.decode("utf-8") or "{}")
+                            body = cuerpo_json(request)
                             mesa_req = mesa_req or body.get("mesa") or body.get("numero_mesa")
                         except Exception:
                             pass
 
                     if mesa_req is not None:
                         mesa_req = str(mesa_req).strip()
-                        mesa_user = str(usuario.mesa).strip()
+                        mesa_user = str(payload.get("mesa", usuario.mesa)).strip()
                         if mesa_req and mesa_user and mesa_req != mesa_user:
                             return JsonResponse(
                                 {"success": False, "error": "No puedes operar sobre otra mesa"},
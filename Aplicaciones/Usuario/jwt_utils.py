@@ -1,5 +1,9 @@
+import hashlib
 import jwt
+import threading
+import time
 import uuid
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from django.conf import settings
 
@@ -34,14 +38,49 @@ def crear_refresh_token(payload: dict, days: int = 7):
     return _crear_token(payload, timedelta(days=int(days)))
 
 
-def decodificar_token(token: str):
-    """
-    Decodifica JWT y valida firma + expiración.
-    Leeway=60 permite tolerancia de reloj (evita iat "del futuro" por segundos).
-    """
+LEEWAY = 60
+
+# Tokens ya verificados: sha256(token) -> (payload, valido_hasta).
+# Cada dispositivo repite el mismo access token miles de veces por turno;
+# con esto la firma HS256 se verifica una vez por token y proceso.
+TOKENS_EN_CACHE = 4096
+_tokens = OrderedDict()
+_tokens_lock = threading.Lock()
+
+
+def _verificar_token(token: str):
     return jwt.decode(
         token,
         settings.SECRET_KEY,
         algorithms=["HS256"],
-        leeway=60
+        leeway=LEEWAY
     )
+
+
+def decodificar_token(token: str):
+    """
+    Decodifica JWT y valida firma + expiración.
+    Leeway=60 permite tolerancia de reloj (evita iat "del futuro" por segundos).
+    Un token ya verificado se sirve del cache hasta su exp + leeway; uno
+    alterado tiene otro digest y vuelve a verificarse (y falla).
+    """
+    clave = hashlib.sha256(token.encode()).digest()
+    ahora = time.time()
+    with _tokens_lock:
+        entrada = _tokens.get(clave)
+        if entrada is not None:
+            if entrada[1] > ahora:
+                _tokens.move_to_end(clave)
+                return dict(entrada[0])
+            del _tokens[clave]
+
+    # si expiro, jwt lanza ExpiredSignatureError igual que antes
+    payload = _verificar_token(token)
+
+    exp = payload.get("exp")
+    if isinstance(exp, (int, float)):
+        with _tokens_lock:
+            _tokens[clave] = (payload, exp + LEEWAY)
+            while len(_tokens) > TOKENS_EN_CACHE:
+                _tokens.popitem(last=False)
+    return dict(payload)
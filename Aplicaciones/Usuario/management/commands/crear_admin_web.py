@@ -1,6 +1,16 @@
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from Aplicaciones.Usuario.clave_normalizada import clave_normalizada
+from Aplicaciones.Usuario.hash_contrasenas import HashNoDisponible
 from Aplicaciones.Usuario.models import Usuario
 
+
+def _poner_password(usuario, password):
+    try:
+        usuario.set_password(password)
+    except HashNoDisponible as e:
+        raise CommandError(f"No se pudo calcular el hash de la contrasena: {e}")
+
+
 class Command(BaseCommand):
     help = "Crea un usuario ADMIN para la web si no existe"
 
@@ -22,14 +32,14 @@ class Command(BaseCommand):
         if cargo.upper() == "ADMIN":
             mesa = ""
 
-        u = Usuario.objects.filter(username__iexact=username).first()
+        u = Usuario.objects.filter(username_clave=clave_normalizada(username)).first()
 
         if u:
             u.nombres = opts["nombres"]
             u.apellidos = opts["apellidos"]
             u.mesa = mesa
             u.cargo = cargo
-            u.set_password(opts["password"])
+            _poner_password(u, opts["password"])
             u.save()
             self.stdout.write(self.style.SUCCESS(f"Admin actualizado: {u.username}"))
             return
@@ -41,6 +51,6 @@ class Command(BaseCommand):
             cargo=cargo,
             username=username,
         )
-        u.set_password(opts["password"])
+        _poner_password(u, opts["password"])
         u.save()
         self.stdout.write(self.style.SUCCESS(f" Admin creado: {u.username}"))
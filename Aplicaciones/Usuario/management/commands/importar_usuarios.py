@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from Aplicaciones.Usuario.hash_contrasenas import HashNoDisponible
+from Aplicaciones.Usuario.importar_usuarios import ArchivoInvalido, importar, leer_filas
+
+
+class Command(BaseCommand):
+    help = "Importa usuarios desde un CSV o Excel (nombres, apellidos, mesa, cargo, username, password)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("archivo")
+        parser.add_argument("--validar", action="store_true", help="Solo valida, no crea nada")
+
+    def handle(self, *args, **opts):
+        try:
+            with open(opts["archivo"], "rb") as fh:
+                filas = leer_filas(opts["archivo"], fh.read())
+        except OSError as e:
+            raise CommandError(str(e))
+        except ArchivoInvalido as e:
+            raise CommandError(str(e))
+
+        try:
+            informe = importar(filas, solo_validar=opts["validar"])
+        except HashNoDisponible as e:
+            raise CommandError(f"No se pudo calcular el hash de las contrasenas: {e}")
+
+        for fila in informe["filas"]:
+            if fila["estado"] == "error":
+                self.stdout.write(self.style.ERROR(f"  fila {fila['fila']} ({fila['username']}): {fila['error']}"))
+
+        if informe["mesas_creadas"]:
+            self.stdout.write(f"Mesas creadas: {', '.join(informe['mesas_creadas'])}")
+        accion = "validos" if opts["validar"] else "creados"
+        cantidad = informe["validos"] if opts["validar"] else informe["creados"]
+        self.stdout.write(self.style.SUCCESS(
+            f"{cantidad} {accion}, {informe['errores']} con error de {informe['total']} "
+            f"en {informe['segundos']}s ({informe['filas_por_segundo']} filas/s)"
+        ))
@@ -0,0 +1,93 @@
+# Aplicaciones/Usuario/marca_version.py
+"""
+Marcas de version compartidas entre procesos del mismo servidor.
+
+Cada worker guarda caches en memoria; cuando algo cambia, el proceso que lo
+cambio "incrementa" la marca y los demas lo notan en su siguiente lectura,
+sin consultar la BD.
+
+Todas las marcas viven en un solo archivo de tamano fijo mapeado en memoria
+(MarcasCompartidas): RANURAS contadores de 8 bytes y cada clave ("usuarios",
+"usuario-17", "jornada-mesa-7", ...) cae en una ranura por crc32. Leer una
+marca no hace llamadas al sistema y el archivo no crece con las claves; si
+dos claves comparten ranura, incrementar una invalida tambien la otra (una
+lectura de mas en la BD, nunca un dato viejo).
+"""
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+
+from django.conf import settings
+
+
+RANURAS = 16384
+_CONTADOR = struct.Struct("<Q")
+
+
+class MarcasCompartidas:
+    def __init__(self, nombre="marcas", ranuras=RANURAS):
+        self.nombre = nombre
+        self.ranuras = ranuras
+        self._lock = threading.Lock()
+        self._abierto = None  # (ruta, mmap)
+
+    @property
+    def ruta(self):
+        directorio = getattr(settings, "VERSIONES_DIR", settings.BASE_DIR / "tmp" / "versiones")
+        return os.path.join(directorio, f"{self.nombre}.marcas")
+
+    def _mapa(self):
+        ruta = self.ruta
+        abierto = self._abierto
+        if abierto is not None and abierto[0] == ruta:
+            return abierto[1]
+        with self._lock:
+            if self._abierto is not None and self._abierto[0] == ruta:
+                return self._abierto[1]
+            os.makedirs(os.path.dirname(ruta), exist_ok=True)
+            tamano = self.ranuras * _CONTADOR.size
+            fd = os.open(ruta, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                if os.fstat(fd).st_size < tamano:
+                    # extender rellena con ceros; si dos procesos lo hacen a la vez da igual
+                    os.ftruncate(fd, tamano)
+                mapa = mmap.mmap(fd, tamano)
+            finally:
+                os.close(fd)
+            self._abierto = (ruta, mapa)
+            return mapa
+
+    def _posicion(self, clave):
+        return (zlib.crc32(str(clave).encode("utf-8")) % self.ranuras) * _CONTADOR.size
+
+    def leer(self, clave):
+        """Valor opaco: cambia cada vez que alguien llama a incrementar(clave)."""
+        return _CONTADOR.unpack_from(self._mapa(), self._posicion(clave))[0]
+
+    def incrementar(self, clave):
+        mapa = self._mapa()
+        posicion = self._posicion(clave)
+        actual = _CONTADOR.unpack_from(mapa, posicion)[0]
+        # la hora en ns hace que dos procesos que incrementan a la vez no
+        # escriban el valor que otro ya leyo
+        _CONTADOR.pack_into(mapa, posicion, max(time.time_ns(), actual + 1))
+
+
+marcas = MarcasCompartidas()
+
+
+class MarcaVersion:
+    """Una sola marca con nombre, dentro de las marcas compartidas."""
+
+    def __init__(self, nombre, compartidas=marcas):
+        self.nombre = nombre
+        self.compartidas = compartidas
+
+    def leer(self):
+        return self.compartidas.leer(self.nombre)
+
+    def incrementar(self):
+        self.compartidas.incrementar(self.nombre)
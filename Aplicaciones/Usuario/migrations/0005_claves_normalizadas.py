@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:40
+
+from django.db import migrations, models
+
+
+def clave_normalizada(valor):
+    # copia congelada de Aplicaciones/Usuario/clave_normalizada.py: la
+    # migracion no debe cambiar si ese modulo cambia
+    return str(valor or "").strip().casefold()
+
+
+def llenar_claves(modelo, campo, destino):
+    """
+    Clave normalizada de cada fila. Si dos filas ya existentes solo se
+    diferencian en mayusculas, la de menor id se queda con la clave (es la
+    que devolvia filter(__iexact).first()) y las demas reciben un sufijo
+    "#dup<id>" para que el indice unico se pueda crear.
+    """
+    def llenar(apps, schema_editor):
+        Modelo = apps.get_model('Usuario', modelo)
+        vistas = set()
+        pendientes = []
+        for pk, valor in Modelo.objects.order_by('id').values_list('id', campo).iterator(chunk_size=5000):
+            clave = clave_normalizada(valor)
+            if clave in vistas:
+                clave = f"{clave}#dup{pk}"
+            vistas.add(clave)
+            pendientes.append(Modelo(id=pk, **{destino: clave}))
+        Modelo.objects.bulk_update(pendientes, [destino], batch_size=1000)
+    return llenar
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Usuario', '0004_mesa'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usuario',
+            name='username_clave',
+            field=models.CharField(editable=False, max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name='mesa',
+            name='nombre_clave',
+            field=models.CharField(editable=False, max_length=255, null=True),
+        ),
+        migrations.RunPython(llenar_claves('Usuario', 'username', 'username_clave'), migrations.RunPython.noop),
+        migrations.RunPython(llenar_claves('Mesa', 'nombre', 'nombre_clave'), migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='usuario',
+            name='username_clave',
+            field=models.CharField(editable=False, max_length=255, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='mesa',
+            name='nombre_clave',
+            field=models.CharField(editable=False, max_length=255, unique=True),
+        ),
+    ]
@@ -1,7 +1,15 @@
 from django.db import models
-from django.contrib.auth.hashers import make_password, check_password
+
+from .clave_normalizada import clave_para_guardar
+
 class Mesa(models.Model):
     nombre = models.CharField(max_length=100, unique=True) 
+    # nombre sin mayusculas, para buscar sin __iexact (ver clave_normalizada.py)
+    nombre_clave = models.CharField(max_length=255, unique=True, editable=False)
+
+    def save(self, *args, **kwargs):
+        self.nombre_clave = clave_para_guardar(self.nombre, self.nombre_clave)
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return self.nombre
@@ -13,6 +21,12 @@ class Usuario(models.Model):
     cargo = models.CharField(max_length=100)
     username = models.CharField(max_length=150, unique=True)
     password = models.CharField(max_length=128)
+    # username sin mayusculas, para buscar sin __iexact (ver clave_normalizada.py)
+    username_clave = models.CharField(max_length=255, unique=True, editable=False)
+
+    def save(self, *args, **kwargs):
+        self.username_clave = clave_para_guardar(self.username, self.username_clave)
+        super().save(*args, **kwargs)
 
 
     
@@ -20,10 +34,13 @@ class Usuario(models.Model):
         return f"{self.nombres} {self.apellidos} ({self.username})"
     
     def set_password(self, raw_password):
-        self.password = make_password(raw_password)
+        from .hash_contrasenas import hashear
+        self.password = hashear(raw_password)
     
     def check_password(self, raw_password):
-        return check_password(raw_password, self.password)
+        # en el pool de hash; rehace el hash si el algoritmo cambio
+        from .hash_contrasenas import verificar_usuario
+        return verificar_usuario(self, raw_password)
     @property
     def is_authenticated(self):
         return True
\ No newline at end of file
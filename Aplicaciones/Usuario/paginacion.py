@@ -0,0 +1,169 @@
+# Aplicaciones/Usuario/paginacion.py
+"""
+Paginacion por cursor (keyset) para las APIs de listado.
+
+En vez de OFFSET, cada pagina continua desde los valores de orden de la
+ultima fila (p. ej. fecha_entrada, id) con un WHERE sobre esas columnas, asi
+la pagina 500 cuesta lo mismo que la primera. El cursor es opaco para el
+cliente: base64 de los valores de la ultima fila y del orden usado.
+
+Es opcional: solo se pagina si la peticion trae ?limit= o ?cursor=; sin
+ellos las vistas siguen devolviendo la lista completa, ordenada con
+ordenar_con_id() para que lista completa, paginas y stream salgan en el mismo orden.
+"""
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.response import Response
+
+
+LIMITE_POR_DEFECTO = 100
+LIMITE_MAXIMO = 1000
+
+
+class CursorInvalido(ValueError):
+    pass
+
+
+def pide_paginacion(request):
+    params = request.query_params
+    return "limit" in params or "cursor" in params
+
+
+def _orden_con_id(orden):
+    orden = list(orden)
+    if not any(o.lstrip("-") in ("id", "pk") for o in orden):
+        # desempate estable: el id sigue la direccion del primer campo
+        orden.append("-id" if orden and orden[0].startswith("-") else "id")
+    return orden
+
+
+def ordenar_con_id(queryset, orden):
+    """order_by(orden) con el desempate por id que usan el cursor y el stream."""
+    return queryset.order_by(*_orden_con_id(orden))
+
+
+def _codificar(orden, valores):
+    crudo = json.dumps({
+        "o": orden,
+        "v": [v.isoformat() if hasattr(v, "isoformat") else v for v in valores],
+    }, separators=(",", ":"))
+    return base64.urlsafe_b64encode(crudo.encode()).decode().rstrip("=")
+
+
+def _decodificar(cursor, orden, modelo):
+    try:
+        crudo = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        datos = json.loads(crudo)
+        if datos["o"] != orden or len(datos["v"]) != len(orden):
+            raise CursorInvalido("El cursor no corresponde a este orden")
+        return [
+            modelo._meta.get_field(campo.lstrip("-")).to_python(valor)
+            for campo, valor in zip(orden, datos["v"])
+        ]
+    except CursorInvalido:
+        raise
+    except (ValueError, KeyError, TypeError, ValidationError) as e:
+        raise CursorInvalido("Cursor invalido") from e
+
+
+def _despues_de(orden, valores):
+    """
+    WHERE (a, b, id) > (va, vb, vid) respetando la direccion de cada campo:
+    a > va OR (a = va AND b > vb) OR (a = va AND b = vb AND id > vid)
+    """
+    condicion = Q()
+    iguales = {}
+    for campo, valor in zip(orden, valores):
+        nombre = campo.lstrip("-")
+        operador = "lt" if campo.startswith("-") else "gt"
+        condicion |= Q(**iguales, **{f"{nombre}__{operador}": valor})
+        iguales[nombre] = valor
+    # cota redundante sobre la primera columna: permite al motor empezar a
+    # leer el indice desde ahi en vez de filtrar desde el principio
+    primero = orden[0]
+    cota = "lte" if primero.startswith("-") else "gte"
+    return Q(**{f"{primero.lstrip('-')}__{cota}": valores[0]}) & condicion
+
+
+def _valores_de(fila, orden):
+    """Valores de orden de una fila (instancia o dict de values())."""
+    if isinstance(fila, dict):
+        return [fila[c.lstrip("-")] for c in orden]
+    return [getattr(fila, c.lstrip("-")) for c in orden]
+
+
+def _leer_limite(request):
+    crudo = request.query_params.get("limit")
+    if crudo in (None, ""):
+        return LIMITE_POR_DEFECTO
+    try:
+        limite = int(crudo)
+    except ValueError:
+        raise CursorInvalido("limit debe ser un entero")
+    if limite < 1:
+        raise CursorInvalido("limit debe ser mayor que 0")
+    return min(limite, LIMITE_MAXIMO)
+
+
+def paginar(request, queryset, orden):
+    """
+    Aplica orden + cursor + limit al queryset.
+    Devuelve (filas, siguiente_cursor o None). Lanza CursorInvalido.
+    """
+    limite = _leer_limite(request)
+    queryset = ordenar_con_id(queryset, orden)
+    orden = _orden_con_id(orden)
+    cursor = request.query_params.get("cursor")
+    if cursor:
+        queryset = queryset.filter(_despues_de(orden, _decodificar(cursor, orden, queryset.model)))
+
+    filas = list(queryset[:limite + 1])
+    siguiente = None
+    if len(filas) > limite:
+        filas = filas[:limite]
+        ultima = filas[-1]
+        siguiente = _codificar(orden, _valores_de(ultima, orden))
+    return filas, siguiente
+
+
+def recorrer_por_lotes(queryset, orden, lote=2000):
+    """
+    Genera listas de hasta `lote` filas en el orden dado, continuando cada
+    lote desde la ultima fila del anterior (mismo WHERE que el cursor).
+    A diferencia de .iterator(), no depende de cursores del lado del
+    servidor: PyMySQL carga el resultado completo en memoria.
+    """
+    queryset = ordenar_con_id(queryset, orden)
+    orden = _orden_con_id(orden)
+    siguiente = queryset
+    while True:
+        filas = list(siguiente[:lote])
+        if filas:
+            yield filas
+        if len(filas) < lote:
+            return
+        ultima = filas[-1]
+        siguiente = queryset.filter(_despues_de(orden, _valores_de(ultima, orden)))
+
+
+def campos_de_orden(orden):
+    """Columnas que necesita el keyset (para pedirlas en values())."""
+    return [c.lstrip("-") for c in _orden_con_id(orden)]
+
+
+def respuesta_paginada(request, queryset, orden, serializador):
+    """
+    Respuesta DRF {"results": [...], "next": cursor} o 400 si el cursor o el
+    limit son invalidos. serializador: SerializadorRapido.
+    """
+    try:
+        filas, siguiente = paginar(request, serializador.valores(queryset, *campos_de_orden(orden)), orden)
+    except CursorInvalido as e:
+        return Response({"error": str(e)}, status=400)
+    return Response({
+        "results": serializador.convertir(filas),
+        "next": siguiente,
+    })
@@ -1,8 +1,10 @@
-from django.http import JsonResponse
+from Aplicaciones.Usuario.json_rapido import JSONDecodeError, JsonResponse
 from django.views.decorators.csrf import csrf_exempt
-import json
 
 from .jwt_utils import decodificar_token, crear_access_token
+from .models import Usuario
+from .usuario_cache import claims_de, obtener_usuario
+from .cuerpo_json import CuerpoDemasiadoGrande, cuerpo_json, respuesta_demasiado_grande
 
 @csrf_exempt
 def refresh_token_api(request):
@@ -10,7 +12,7 @@ def refresh_token_api(request):
         return JsonResponse({"success": False, "error": "Método no permitido. Use POST"}, status=405)
 
     try:
-        data = json.loads(request.body.decode("utf-8"))
+        data = cuerpo_json(request)
         refresh = (data.get("refresh") or "").strip()
 
         if not refresh:
@@ -31,11 +33,22 @@ def refresh_token_api(request):
         if not user_id:
             return JsonResponse({"success": False, "error": "Refresh sin sub/user_id"}, status=401)
 
-        new_access = crear_access_token({"sub": str(user_id), "type": "access"}, minutes=60)
+        try:
+            usuario = obtener_usuario(user_id)
+        except (ValueError, Usuario.DoesNotExist):
+            return JsonResponse({"success": False, "error": "Usuario no existe"}, status=401)
+
+        # mismos claims que en el login: los permisos se deciden con ellos
+        new_access = crear_access_token(
+            {"sub": str(usuario.id), "type": "access", **claims_de(usuario)},
+            minutes=60,
+        )
 
         return JsonResponse({"success": True, "access": new_access}, status=200)
 
-    except json.JSONDecodeError:
+    except CuerpoDemasiadoGrande:
+        return respuesta_demasiado_grande()
+    except JSONDecodeError:
         return JsonResponse({"success": False, "error": "JSON inválido"}, status=400)
     except Exception as e:
         print("ERROR GENERAL REFRESH:", repr(e))
@@ -0,0 +1,113 @@
+# Aplicaciones/Usuario/repeticion.py
+"""
+Numeros de secuencia y buffer de repeticion por grupo de WebSocket.
+
+La capa de canales (COMEXIGER/capa_canales.py) marca cada mensaje que
+entrega en este proceso con "grupo", "seq" (correlativo por grupo),
+"epoca" (identifica este proceso) y "t" (hora del servidor) y lo guarda:
+
+- los ultimos mensajes del grupo, para repetir exactamente lo perdido a
+  un cliente que vuelve con la misma epoca y un seq reciente;
+- el ultimo estado de cada fila (por "id") con la hora en que llego,
+  para mandar un snapshot compacto de lo cambiado desde "t" a un cliente
+  que viene de otro proceso o cuyo seq ya salio del buffer.
+
+Si el estado de filas tambien se quedo corto (se descartaron filas mas
+nuevas que "t") o el proceso empezo despues, se responde "recargar" y el
+cliente pide la lista por HTTP como antes.
+"""
+import secrets
+import time
+from collections import OrderedDict, deque
+
+
+MARGEN = 2.0  # segundos hacia atras al armar snapshots (orden entre procesos)
+
+
+class BufferGrupo:
+
+    def __init__(self, max_mensajes, max_filas, completo_desde):
+        self.seq = 0
+        self.t = None
+        self.mensajes = deque(maxlen=max_mensajes)
+        self.filas = OrderedDict()  # id -> (t, fila), la mas vieja primero
+        self.max_filas = max_filas
+        # el estado de filas tiene todo cambio posterior a este instante
+        self.completo_desde = completo_desde
+
+    def registrar(self, message, t):
+        self.seq += 1
+        self.t = t
+        message["seq"] = self.seq
+        message["t"] = t
+        self.mensajes.append(message)
+
+        data = message.get("data")
+        if isinstance(data, dict):
+            data = [data]
+        if isinstance(data, list):
+            for fila in data:
+                if isinstance(fila, dict) and fila.get("id") is not None:
+                    self.filas[fila["id"]] = (t, fila)
+                    self.filas.move_to_end(fila["id"])
+        while len(self.filas) > self.max_filas:
+            _, (t_vieja, _) = self.filas.popitem(last=False)
+            self.completo_desde = max(self.completo_desde, t_vieja)
+
+
+class Repeticion:
+
+    def __init__(self, max_mensajes=200, max_filas=2000):
+        self.epoca = secrets.token_hex(4)
+        self.max_mensajes = max_mensajes
+        self.max_filas = max_filas
+        self.desde = None
+        self.grupos = {}
+
+    def iniciar(self):
+        """Desde ahora este proceso recibe todos los mensajes de los grupos."""
+        if self.desde is None:
+            self.desde = time.time()
+
+    def _buffer(self, group):
+        buffer = self.grupos.get(group)
+        if buffer is None:
+            # sin iniciar() no se sabe que se perdio antes: nunca completo
+            completo_desde = self.desde if self.desde is not None else float("inf")
+            buffer = self.grupos[group] = BufferGrupo(self.max_mensajes, self.max_filas, completo_desde)
+        return buffer
+
+    def registrar(self, group, message):
+        """Marca el mensaje (se modifica) y lo guarda en el buffer del grupo."""
+        message["grupo"] = group
+        message["epoca"] = self.epoca
+        self._buffer(group).registrar(message, time.time())
+
+    def estado(self, group):
+        buffer = self._buffer(group)
+        return {"seq": buffer.seq, "epoca": self.epoca, "t": buffer.t or time.time()}
+
+    def reanudar(self, group, epoca, seq, t):
+        """
+        ("repeticion", [mensajes]), ("snapshot", [filas]) o ("recargar", None)
+        para un cliente cuyo ultimo mensaje fue (epoca, seq, t).
+        """
+        buffer = self._buffer(group)
+        if epoca == self.epoca and seq is not None and 0 <= seq <= buffer.seq:
+            if seq == buffer.seq:
+                return "repeticion", []
+            if buffer.mensajes and buffer.mensajes[0]["seq"] <= seq + 1:
+                return "repeticion", [m for m in buffer.mensajes if m["seq"] > seq]
+        if t is not None:
+            limite = t - MARGEN
+            if limite >= buffer.completo_desde:
+                return "snapshot", [fila for t_fila, fila in buffer.filas.values() if t_fila >= limite]
+        return "recargar", None
+
+    def estadisticas(self):
+        return {
+            "epoca": self.epoca,
+            "grupos": len(self.grupos),
+            "mensajes": sum(len(b.mensajes) for b in self.grupos.values()),
+            "filas": sum(len(b.filas) for b in self.grupos.values()),
+        }
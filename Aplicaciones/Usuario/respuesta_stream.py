@@ -0,0 +1,52 @@
+# Aplicaciones/Usuario/respuesta_stream.py
+"""
+Listados JSON en streaming.
+
+Con ?stream=true (o Accept: application/json; stream=true) la lista se envia
+como un arreglo JSON escrito por partes: se leen lotes por keyset, cada
+lote se serializa y se renderiza, y se descarta antes de leer el siguiente.
+La memoria queda acotada por el tamano del lote, no por el de la tabla.
+Los bytes son los mismos que devolveria la vista sin streaming: las dos
+ordenan con paginacion.ordenar_con_id() y usan el mismo renderer.
+"""
+from django.http import StreamingHttpResponse
+
+from .json_rapido import JSONRendererRapido
+from .paginacion import campos_de_orden, recorrer_por_lotes
+
+
+LOTE_STREAM = 2000
+
+
+def pide_stream(request):
+    valor = (request.query_params.get("stream") or "").lower()
+    if valor in ("1", "true"):
+        return True
+    # parametro del media type: DRF lo sigue aceptando como application/json
+    accept = request.META.get("HTTP_ACCEPT", "").replace(" ", "").lower()
+    return "stream=true" in accept
+
+
+def _cuerpo(queryset, orden, serializar, lote):
+    renderer = JSONRendererRapido()
+    yield b"["
+    primero = True
+    for filas in recorrer_por_lotes(queryset, orden, lote):
+        # el renderer da "[a,b,c]": se quitan los corchetes y se unen
+        parte = renderer.render(serializar(filas))[1:-1]
+        if not primero:
+            yield b","
+        yield parte
+        primero = False
+    yield b"]"
+
+
+def respuesta_stream(queryset, orden, serializador, lote=LOTE_STREAM):
+    """
+    StreamingHttpResponse con el arreglo JSON completo del queryset.
+    serializador: SerializadorRapido (lee values(), sin instanciar modelos).
+    """
+    return StreamingHttpResponse(
+        _cuerpo(serializador.valores(queryset, *campos_de_orden(orden)), orden, serializador.convertir, lote),
+        content_type="application/json",
+    )
@@ -0,0 +1,131 @@
+# Aplicaciones/Usuario/serializacion_rapida.py
+"""
+Serializacion ligera para lecturas masivas y broadcasts.
+
+Un ModelSerializer crea la instancia del modelo y recorre los campos DRF
+por cada fila. Aqui se lee el mismo conjunto de campos con values() y se
+convierte cada valor con una funcion precompilada por campo, que replica
+el to_representation() del campo DRF correspondiente. El resultado (dicts
+con las mismas claves, en el mismo orden y con los mismos tipos) se
+renderiza a los mismos bytes que el serializer original.
+"""
+from datetime import timezone as dt_timezone
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework import fields as drf
+from rest_framework.settings import ISO_8601, api_settings
+
+
+def _fecha_hora(valor, tz):
+    # DateTimeField: zona actual, ISO 8601 y "Z" para UTC
+    if not valor:
+        return None
+    if tz is not None:
+        valor = valor.astimezone(tz) if timezone.is_aware(valor) else timezone.make_aware(valor, tz)
+    elif timezone.is_aware(valor):
+        valor = timezone.make_naive(valor, dt_timezone.utc)
+    texto = valor.isoformat()
+    if texto.endswith("+00:00"):
+        texto = texto[:-6] + "Z"
+    return texto
+
+
+def _fecha(valor, tz):
+    return valor.isoformat() if valor else None
+
+
+def _entero(valor, tz):
+    return int(valor)
+
+
+def _flotante(valor, tz):
+    return float(valor)
+
+
+def _texto(valor, tz):
+    return str(valor)
+
+
+def _zona_actual():
+    return timezone.get_current_timezone() if settings.USE_TZ else None
+
+
+def _convertidor(campo):
+    """Funcion (valor, tz) -> dato primitivo para un campo DRF."""
+    if isinstance(campo, drf.DateTimeField):
+        if getattr(campo, "format", api_settings.DATETIME_FORMAT) == ISO_8601:
+            return _fecha_hora
+    elif isinstance(campo, drf.DateField):
+        if getattr(campo, "format", api_settings.DATE_FORMAT) == ISO_8601:
+            return _fecha
+    elif isinstance(campo, drf.BigIntegerField):
+        if not getattr(campo, "coerce_to_string", api_settings.COERCE_BIGINT_TO_STRING):
+            return _entero
+    elif isinstance(campo, drf.IntegerField):
+        return _entero
+    elif isinstance(campo, drf.FloatField):
+        return _flotante
+    elif type(campo) is drf.CharField:
+        return _texto
+
+    # cualquier otro tipo: el metodo del propio campo (correcto, mas lento)
+    return lambda valor, tz: campo.to_representation(valor)
+
+
+class SerializadorRapido:
+    """
+    Envuelve un ModelSerializer sin relaciones:
+
+        rapido = SerializadorRapido(RendimientoSerializer)
+        rapido.lista(queryset)     # lista de dicts, via values()
+        rapido.instancia(obj)      # dict desde una instancia ya cargada
+    """
+
+    def __init__(self, serializer_class):
+        self.serializer_class = serializer_class
+        self._plan = None
+
+    @property
+    def plan(self):
+        # se compila al primer uso (los campos DRF necesitan los modelos cargados)
+        if self._plan is None:
+            plan = []
+            for nombre, campo in self.serializer_class().fields.items():
+                if campo.write_only:
+                    continue
+                plan.append((nombre, campo.source, _convertidor(campo)))
+            self._plan = plan
+        return self._plan
+
+    @property
+    def campos(self):
+        return [fuente for _, fuente, _ in self.plan]
+
+    def valores(self, queryset, *extra):
+        """queryset.values() con los campos del serializer (+ extra, p. ej. para ordenar)."""
+        campos = self.campos
+        return queryset.values(*campos, *[c for c in extra if c not in campos])
+
+    def convertir(self, filas):
+        """Dicts de values() -> representacion del serializer."""
+        tz = _zona_actual()
+        plan = self.plan
+        return [
+            {nombre: (None if (v := fila[fuente]) is None else conv(v, tz))
+             for nombre, fuente, conv in plan}
+            for fila in filas
+        ]
+
+    def lista(self, queryset):
+        return self.convertir(self.valores(queryset))
+
+    def instancia(self, obj):
+        tz = _zona_actual()
+        return {
+            nombre: (None if (v := getattr(obj, fuente)) is None else conv(v, tz))
+            for nombre, fuente, conv in self.plan
+        }
+
+    def instancias(self, objs):
+        return [self.instancia(o) for o in objs]
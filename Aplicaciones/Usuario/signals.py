@@ -0,0 +1,24 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Usuario
+
+
+def _invalidar_cache_usuario(usuario_id):
+    from .usuario_cache import invalidar
+    # despues del commit, para que otro worker no relea el estado anterior;
+    # solo ese usuario, el resto sigue en cache
+    transaction.on_commit(lambda: invalidar(usuario_id))
+
+
+@receiver(post_save, sender=Usuario)
+def usuario_guardado(sender, instance, created, **kwargs):
+    if not created:
+        # un usuario nuevo no puede estar en cache
+        _invalidar_cache_usuario(instance.pk)
+
+
+@receiver(post_delete, sender=Usuario)
+def usuario_borrado(sender, instance, **kwargs):
+    _invalidar_cache_usuario(instance.pk)
@@ -0,0 +1,213 @@
+# Aplicaciones/Usuario/suscripciones.py
+"""
+Suscripciones por mesa / variedad en los WebSockets.
+
+Ademas del grupo general ("rendimientos", "disponibilidad"), cada fila se
+publica en el grupo de su mesa y, en disponibilidad, en el de su variedad:
+
+    rendimientos.mesa.7
+    disponibilidad.mesa.7
+    disponibilidad.variedad.<hash de la variedad>
+
+Un cliente entra a esos grupos por la ruta (ws/rendimientos/mesa/7/) o
+mandando {"suscribir": {"mesas": ["7"], "variedades": ["Rosa"]}}; en ese
+caso deja el grupo general y solo recibe lo suyo, asi que el reparto de
+un escaneo es proporcional a los suscriptores de esa mesa y no al total
+de clientes. {"suscribir": {}} vuelve al grupo general.
+"""
+import hashlib
+from urllib.parse import parse_qs
+
+from channels.generic.websocket import AsyncWebsocketConsumer
+
+from .clave_normalizada import clave_normalizada
+from .difusion import difundir
+from .json_rapido import JSONDecodeError, dumps_texto, loads
+
+
+MAX_SUSCRIPCIONES = 100
+
+
+def _parte(valor):
+    clave = clave_normalizada(str(valor))
+    if clave.isdigit():
+        return str(int(clave))
+    # los nombres de grupo solo admiten ASCII, '-', '_' y '.'
+    return hashlib.sha1(clave.encode()).hexdigest()[:16]
+
+
+def grupo(base, mesa=None, variedad=None):
+    """Nombre del grupo de channels para la base y el filtro."""
+    if mesa is not None:
+        return f"{base}.mesa.{_parte(mesa)}"
+    if variedad is not None:
+        return f"{base}.variedad.{_parte(variedad)}"
+    return base
+
+
+def difundir_filtrado(base, tipo_lote, filas, por_variedad=False):
+    """
+    difundir() en el grupo general y en los de cada mesa (y variedad) de
+    las filas, que deben traer numero_mesa (y variedad).
+    """
+    if isinstance(filas, dict):
+        filas = [filas]
+    if not filas:
+        return
+    difundir(base, tipo_lote, filas)
+
+    grupos = {}
+    for fila in filas:
+        if fila.get("numero_mesa") is not None:
+            grupos.setdefault(grupo(base, mesa=fila["numero_mesa"]), []).append(fila)
+        if por_variedad and fila.get("variedad"):
+            grupos.setdefault(grupo(base, variedad=fila["variedad"]), []).append(fila)
+    for nombre, filas_grupo in grupos.items():
+        difundir(nombre, tipo_lote, filas_grupo)
+
+
+def _numero(valor, tipo):
+    try:
+        return tipo(valor)
+    except (TypeError, ValueError):
+        return None
+
+
+class ConsumerConSuscripciones(AsyncWebsocketConsumer):
+    """
+    Consumer que entra al grupo general o a los de sus mesas/variedades.
+    Las subclases definen grupo_base y si aceptan variedades, y mandan sus
+    eventos de lote con enviar_lote().
+
+    Los clientes que se conectan con ?seq=... reciben los lotes como
+    {"type": "lote", "grupo", "seq", "epoca", "t", "data": [filas]}. Al
+    reconectar con ?seq=<ultimo>&epoca=<epoca>&t=<t> reciben primero lo que
+    perdieron: los lotes repetidos, un {"type": "snapshot", "data": [...]}
+    con las filas cambiadas o, si no se puede, {"type": "recargar"}. Con
+    ?seq=0 solo se informa el estado actual ({"type": "estado"}). Sin ?seq
+    se mandan las listas de filas sueltas, como antes.
+    """
+
+    grupo_base = None
+    acepta_variedades = False
+
+    async def connect(self):
+        self.grupos = set()
+        self.ultimo = {}  # grupo -> ultimo seq enviado
+        ruta = self.scope.get("url_route", {}).get("kwargs", {})
+        mesas = [ruta["mesa"]] if "mesa" in ruta else []
+        variedades = [ruta["variedad"]] if "variedad" in ruta and self.acepta_variedades else []
+
+        query = parse_qs(self.scope.get("query_string", b"").decode("latin-1"))
+        self.con_secuencia = "seq" in query
+        await self._suscribir(mesas, variedades)
+        await self.accept()
+        if self.con_secuencia:
+            seq = _numero(query["seq"][0], int)
+            await self._reanudar(
+                query.get("epoca", [None])[0],
+                {nombre: seq for nombre in self.grupos},
+                _numero(query.get("t", [None])[0], float),
+            )
+
+    async def disconnect(self, close_code):
+        for nombre in self.grupos:
+            await self.channel_layer.group_discard(nombre, self.channel_name)
+        self.grupos = set()
+
+    async def _suscribir(self, mesas, variedades):
+        nuevos = {grupo(self.grupo_base, mesa=m) for m in mesas}
+        nuevos |= {grupo(self.grupo_base, variedad=v) for v in variedades}
+        if not nuevos:
+            nuevos = {self.grupo_base}
+        for nombre in self.grupos - nuevos:
+            await self.channel_layer.group_discard(nombre, self.channel_name)
+        for nombre in nuevos - self.grupos:
+            await self.channel_layer.group_add(nombre, self.channel_name)
+        self.grupos = nuevos
+
+    async def receive(self, text_data=None, bytes_data=None):
+        try:
+            mensaje = loads(text_data or bytes_data or b"")
+        except JSONDecodeError:
+            await self.send(text_data=dumps_texto({"type": "error", "error": "JSON inválido"}))
+            return
+        if not isinstance(mensaje, dict) or not isinstance(mensaje.get("suscribir"), dict):
+            return
+
+        filtro = mensaje["suscribir"]
+        mesas = [str(m) for m in (filtro.get("mesas") or []) if str(m).strip()]
+        variedades = [str(v) for v in (filtro.get("variedades") or []) if str(v).strip()]
+        if variedades and not self.acepta_variedades:
+            await self.send(text_data=dumps_texto({"type": "error", "error": "Este canal no filtra por variedad"}))
+            return
+        if len(mesas) + len(variedades) > MAX_SUSCRIPCIONES:
+            await self.send(text_data=dumps_texto(
+                {"type": "error", "error": f"Máximo {MAX_SUSCRIPCIONES} suscripciones"}))
+            return
+
+        await self._suscribir(mesas, variedades)
+        await self.send(text_data=dumps_texto({
+            "type": "suscripcion",
+            "mesas": mesas,
+            "variedades": variedades,
+        }))
+        # {"suscribir": {..., "reanudar": {"epoca", "t", "seq": {grupo: seq}}}}
+        reanudar = filtro.get("reanudar")
+        if isinstance(reanudar, dict) or self.con_secuencia:
+            self.con_secuencia = True
+            reanudar = reanudar if isinstance(reanudar, dict) else {}
+            seqs = reanudar.get("seq") if isinstance(reanudar.get("seq"), dict) else {}
+            await self._reanudar(
+                reanudar.get("epoca"),
+                {nombre: _numero(seqs.get(nombre), int) for nombre in self.grupos},
+                _numero(reanudar.get("t"), float),
+            )
+
+    async def _reanudar(self, epoca, seqs, t):
+        repeticion = getattr(self.channel_layer, "repeticion", None)
+        nueva = epoca is None and t is None
+        for nombre in sorted(self.grupos):
+            if repeticion is None:
+                # capa sin secuencia (InMemoryChannelLayer): nada que reanudar
+                if not nueva:
+                    await self.send(text_data=dumps_texto({"type": "recargar", "grupo": nombre}))
+                continue
+
+            estado = repeticion.estado(nombre)
+            seq = seqs.get(nombre)
+            if nueva:
+                # conexion nueva: el cliente ya cargo la lista por HTTP
+                self.ultimo[nombre] = estado["seq"]
+                await self.send(text_data=dumps_texto({"type": "estado", "grupo": nombre, **estado}))
+                continue
+
+            tipo, datos = repeticion.reanudar(nombre, epoca, seq, t)
+            if tipo == "repeticion":
+                for mensaje in datos:
+                    await self.enviar_lote(mensaje)
+                if not datos:
+                    self.ultimo[nombre] = estado["seq"]
+                    await self.send(text_data=dumps_texto({"type": "estado", "grupo": nombre, **estado}))
+                continue
+            # los lotes en cola con seq <= este ya van incluidos
+            self.ultimo[nombre] = estado["seq"]
+            await self.send(text_data=dumps_texto({"type": tipo, "grupo": nombre, **estado, "data": datos or []}))
+
+    async def enviar_lote(self, event):
+        if not self.con_secuencia:
+            await self.send(text_data=dumps_texto(event["data"]))
+            return
+        grupo_evento, seq = event.get("grupo"), event.get("seq")
+        if seq is not None:
+            if seq <= self.ultimo.get(grupo_evento, -1):
+                return  # ya enviado al reanudar
+            self.ultimo[grupo_evento] = seq
+        await self.send(text_data=dumps_texto({
+            "type": "lote",
+            "grupo": grupo_evento,
+            "seq": seq,
+            "epoca": event.get("epoca"),
+            "t": event.get("t"),
+            "data": event["data"],
+        }))
@@ -1,3 +1,658 @@
-from django.test import TestCase
+import asyncio
+import io
+import json
+import math
+import os
+import random
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+import jwt
+from channels.layers import InMemoryChannelLayer
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse as JsonResponseDjango
+from django.core.management import CommandError, call_command
+from django.contrib.auth.hashers import MD5PasswordHasher, PBKDF2PasswordHasher, check_password
+from django.db import IntegrityError, connection, transaction
+from django.test import (Client, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase,
+                         override_settings)
+from openpyxl import Workbook
+from rest_framework.renderers import JSONRenderer
+
+from . import difusion, hash_contrasenas, importar_usuarios, jwt_utils, usuario_cache
+from .clave_normalizada import clave_normalizada
+from .json_rapido import JSONRendererRapido, JsonResponse, loads
+from .jwt_decorators import jwt_required
+from .jwt_utils import crear_access_token, decodificar_token
+from .models import Mesa, Usuario
+
+
+def crear_usuario(username="Operario7", mesa="7", cargo="OPERARIO"):
+    usuario = Usuario(nombres="Ana", apellidos="Paz", mesa=mesa, cargo=cargo, username=username)
+    usuario.set_password("secreto1")
+    usuario.save()
+    return usuario
+
+
+def token_de(usuario, **extra):
+    payload = {"sub": str(usuario.id), "type": "access", "username": usuario.username,
+               "cargo": usuario.cargo, "mesa": usuario.mesa}
+    payload.update(extra)
+    return crear_access_token(payload)
+
+
+@jwt_required
+def vista_protegida(request):
+    return JsonResponse({"success": True, "usuario": request.usuario.id})
+
+
+class DecodificarTokenTests(TestCase):
+
+    def setUp(self):
+        jwt_utils._tokens.clear()
+
+    def test_token_expirado_se_rechaza(self):
+        token = crear_access_token({"sub": "1", "type": "access"}, minutes=-5)
+        with self.assertRaises(jwt.ExpiredSignatureError):
+            decodificar_token(token)
+
+    def test_token_en_cache_se_rechaza_al_expirar(self):
+        token = jwt.encode({"sub": "1", "type": "access", "exp": int(time.time()) + 1},
+                           settings.SECRET_KEY, algorithm="HS256")
+        with mock.patch.object(jwt_utils, "LEEWAY", 0):
+            self.assertEqual(decodificar_token(token)["sub"], "1")
+            time.sleep(2.1)
+            with self.assertRaises(jwt.ExpiredSignatureError):
+                decodificar_token(token)
+
+    def test_firma_invalida_se_rechaza(self):
+        token = jwt.encode({"sub": "1", "type": "access", "exp": int(time.time()) + 600},
+                           "otra-clave-que-no-es-la-del-servidor", algorithm="HS256")
+        with self.assertRaises(jwt.InvalidSignatureError):
+            decodificar_token(token)
+
+    def test_token_alterado_no_usa_el_cache_del_original(self):
+        token = crear_access_token({"sub": "1", "type": "access"})
+        decodificar_token(token)
+        cabecera, cuerpo, firma = token.split(".")
+        alterado = jwt.encode({"sub": "2", "type": "access"}, settings.SECRET_KEY, algorithm="HS256").split(".")[1]
+        with self.assertRaises(jwt.InvalidSignatureError):
+            decodificar_token(f"{cabecera}.{alterado}.{firma}")
+
+    def test_token_rechazado_sigue_rechazado(self):
+        token = jwt.encode({"sub": "1", "type": "access", "exp": int(time.time()) + 600},
+                           "otra-clave-que-no-es-la-del-servidor", algorithm="HS256")
+        for _ in range(2):
+            with self.assertRaises(jwt.InvalidSignatureError):
+                decodificar_token(token)
+        self.assertEqual(len(jwt_utils._tokens), 0)
+
+
+class JwtRequiredTests(TestCase):
+
+    def setUp(self):
+        jwt_utils._tokens.clear()
+        usuario_cache.invalidar()
+        self.factory = RequestFactory()
+        self.usuario = crear_usuario()
+
+    def llamar(self, token):
+        respuesta = vista_protegida(self.factory.get("/", HTTP_AUTHORIZATION=f"Bearer {token}"))
+        return respuesta.status_code, loads(respuesta.content)
+
+    def test_token_valido(self):
+        codigo, datos = self.llamar(token_de(self.usuario))
+        self.assertEqual(codigo, 200)
+        self.assertEqual(datos["usuario"], self.usuario.id)
+
+    def test_token_expirado_o_mal_firmado_da_401_las_dos_veces(self):
+        expirado = crear_access_token({"sub": str(self.usuario.id), "type": "access"}, minutes=-5)
+        mal_firmado = jwt.encode({"sub": str(self.usuario.id), "type": "access", "exp": int(time.time()) + 600},
+                                 "otra-clave-que-no-es-la-del-servidor", algorithm="HS256")
+        for token in (expirado, mal_firmado):
+            for _ in range(2):
+                self.assertEqual(self.llamar(token)[0], 401)
+
+    def test_claims_desactualizados_se_rechazan(self):
+        token = token_de(self.usuario)
+        self.assertEqual(self.llamar(token)[0], 200)  # token y usuario en cache
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.usuario.mesa = "8"
+            self.usuario.save()
+
+        codigo, datos = self.llamar(token)
+        self.assertEqual(codigo, 401)
+        self.assertIn("desactualizado", datos["error"])
+        # el token nuevo, con los claims actuales, funciona
+        self.assertEqual(self.llamar(token_de(self.usuario))[0], 200)
+
+
+class ClaveDuplicadaTests(TestCase):
+    """Filas que la migracion 0005 dejo con clave "<clave>#dup<id>"."""
+
+    def setUp(self):
+        self.original = crear_usuario(username="Admin")
+        self.duplicado = crear_usuario(username="admin-tmp")
+        Usuario.objects.filter(pk=self.duplicado.pk).update(
+            username="admin", username_clave=f"admin#dup{self.duplicado.pk}")
+        self.duplicado.refresh_from_db()
+
+    def test_editar_conserva_la_clave_dup(self):
+        self.duplicado.mesa = "9"
+        self.duplicado.save()
+        self.duplicado.refresh_from_db()
+        self.assertEqual(self.duplicado.username_clave, f"admin#dup{self.duplicado.pk}")
+
+    def test_renombrar_recalcula_la_clave(self):
+        self.duplicado.username = "Admin2"
+        self.duplicado.save()
+        self.duplicado.refresh_from_db()
+        self.assertEqual(self.duplicado.username_clave, "admin2")
+
+    def test_renombrar_a_un_nombre_ocupado_falla(self):
+        crear_usuario(username="Otro")
+        self.duplicado.username = "OTRO "
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            self.duplicado.save()
+
+    def test_mesa_dup(self):
+        Mesa.objects.create(nombre="Norte")
+        otra = Mesa.objects.create(nombre="norte-tmp")
+        Mesa.objects.filter(pk=otra.pk).update(nombre="norte", nombre_clave=f"norte#dup{otra.pk}")
+        otra.refresh_from_db()
+        otra.save()
+        self.assertEqual(Mesa.objects.get(pk=otra.pk).nombre_clave, f"norte#dup{otra.pk}")
+
+
+class UsuarioCacheTests(TestCase):
+
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        ajustes = override_settings(VERSIONES_DIR=directorio.name)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        usuario_cache.invalidar()
+        self.a = crear_usuario(username="UnoA", mesa="1")
+        self.b = crear_usuario(username="DosB", mesa="2")
+        usuario_cache.obtener_usuario(self.a.id)
+        usuario_cache.obtener_usuario(self.b.id)
+
+    def test_guardar_un_usuario_no_vacia_a_los_demas(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.a.mesa = "5"
+            self.a.save()
+
+        aciertos = usuario_cache.aciertos
+        self.assertEqual(usuario_cache.obtener_usuario(self.b.id).mesa, "2")
+        self.assertEqual(usuario_cache.aciertos, aciertos + 1)
+        self.assertEqual(usuario_cache.obtener_usuario(self.a.id).mesa, "5")
+        self.assertEqual(usuario_cache.aciertos, aciertos + 1)  # A se volvio a leer
+
+    def test_marca_de_otro_worker_invalida_solo_ese_usuario(self):
+        # otro proceso guardo A: cambio la fila e incremento la marca de A
+        Usuario.objects.filter(pk=self.a.pk).update(mesa="9")
+        usuario_cache._marca_usuario(self.a.id).incrementar()
+
+        self.assertEqual(usuario_cache.obtener_usuario(self.a.id).mesa, "9")
+        aciertos = usuario_cache.aciertos
+        usuario_cache.obtener_usuario(self.b.id)
+        self.assertEqual(usuario_cache.aciertos, aciertos + 1)
+
+    def test_marcas_en_un_solo_archivo_sin_stat(self):
+        for i in range(20):
+            usuario = crear_usuario(username=f"Temporal{i}")
+            with self.captureOnCommitCallbacks(execute=True):
+                usuario.mesa = "3"
+                usuario.save()
+        self.assertEqual(os.listdir(settings.VERSIONES_DIR), ["marcas.marcas"])
+
+        with mock.patch("os.stat", side_effect=AssertionError("os.stat en una peticion")):
+            self.assertEqual(usuario_cache.obtener_usuario(self.b.id).mesa, "2")
+
+    def test_usuario_borrado(self):
+        usuario_id = self.a.id
+        with self.captureOnCommitCallbacks(execute=True):
+            self.a.delete()
+        with self.assertRaises(Usuario.DoesNotExist):
+            usuario_cache.obtener_usuario(usuario_id)
+
+
+class CapaDePrueba(InMemoryChannelLayer):
+    """Registra los group_send; loop simula el de los consumers."""
+
+    def __init__(self, loop=None, demora=0):
+        super().__init__()
+        self.loop = loop
+        self.demora = demora
+        self.enviados = []
+
+    async def group_send(self, group, message):
+        await asyncio.sleep(self.demora)
+        self.enviados.append(group)
+
+
+# ventana larga: el hilo de envio no se adelanta a vaciar()
+@override_settings(DIFUSION_VENTANA=60)
+class VaciarDifusionTests(SimpleTestCase):
+
+    def encolar(self, capa, grupos):
+        parche = mock.patch.object(difusion, "get_channel_layer", return_value=capa)
+        parche.start()
+        self.addCleanup(parche.stop)
+        for grupo in grupos:
+            difusion._encolar(grupo, "lote_rendimientos", [{"id": 1}])
+
+    def test_no_espera_al_loop_de_consumers_bloqueado(self):
+        # loop "corriendo" pero trabado, como el de un servidor que se apaga
+        bloqueado = asyncio.new_event_loop()
+        hilo = threading.Thread(target=bloqueado.run_forever, daemon=True)
+        hilo.start()
+        liberar = threading.Event()
+        bloqueado.call_soon_threadsafe(liberar.wait, 10)
+        self.addCleanup(hilo.join, 5)
+        self.addCleanup(bloqueado.call_soon_threadsafe, bloqueado.stop)
+        self.addCleanup(liberar.set)
+
+        capa = CapaDePrueba(loop=bloqueado)
+        self.encolar(capa, ["rendimientos", "rendimientos.mesa.7"])
+        inicio = time.monotonic()
+        difusion.vaciar()
+        self.assertLess(time.monotonic() - inicio, 0.5)
+        self.assertEqual(sorted(capa.enviados), ["rendimientos", "rendimientos.mesa.7"])
+
+    def test_tiempo_total_acotado(self):
+        capa = CapaDePrueba(demora=10)
+        self.encolar(capa, [f"rendimientos.mesa.{m}" for m in range(5)])
+        inicio = time.monotonic()
+        with self.assertLogs(difusion.logger, "WARNING"):
+            difusion.vaciar(espera=0.2)
+        self.assertLess(time.monotonic() - inicio, 1)
+        self.assertEqual(difusion.estadisticas()["pendientes"], 0)
+
+
+class PBKDF2Rapido(PBKDF2PasswordHasher):
+    """PBKDF2 con pocas iteraciones: la prueba de carga mide el pool, no el hash."""
+    iterations = 20_000
+
+
+HASHER_RAPIDO = "Aplicaciones.Usuario.tests.PBKDF2Rapido"
+
+
+class PoolDeHashTests(SimpleTestCase):
+
+    def setUp(self):
+        self.addCleanup(self.restaurar)
+
+    def restaurar(self):
+        hash_contrasenas._descartar_pool()
+        hash_contrasenas._caidas = 0
+        hash_contrasenas._desactivado = False
+
+    def pool_de_hilos(self, procesos):
+        # hilos en vez de procesos: lo que se prueba es la cola y los tiempos
+        ejecutor = ThreadPoolExecutor(max_workers=procesos)
+        self.addCleanup(ejecutor.shutdown)
+        libres = threading.BoundedSemaphore(procesos)
+        parche = mock.patch.object(hash_contrasenas, "_pool", return_value=(ejecutor, libres))
+        parche.start()
+        self.addCleanup(parche.stop)
+
+    def en_paralelo(self, n, funcion):
+        resultados = [None] * n
+
+        def correr(i):
+            try:
+                resultados[i] = funcion()
+            except Exception as error:
+                resultados[i] = error
+
+        hilos = [threading.Thread(target=correr, args=(i,)) for i in range(n)]
+        for hilo in hilos:
+            hilo.start()
+            time.sleep(0.02)  # en orden de llegada
+        for hilo in hilos:
+            hilo.join()
+        return resultados
+
+    @override_settings(HASH_PROCESOS=1, HASH_TIMEOUT=0.4, HASH_ESPERA=5)
+    def test_la_espera_en_cola_no_cuenta_para_el_timeout(self):
+        self.pool_de_hilos(1)
+        # cada "hash" tarda 0.3 s: el tercero espera 0.6 s, pero su hash no
+        resultados = self.en_paralelo(3, lambda: hash_contrasenas._ejecutar(time.sleep, 0.3))
+        self.assertEqual(resultados, [None, None, None])
+
+    @override_settings(HASH_PROCESOS=1, HASH_COLA_MAXIMA=1, HASH_ESPERA=5)
+    def test_cola_llena(self):
+        self.pool_de_hilos(1)
+        resultados = self.en_paralelo(3, lambda: hash_contrasenas._ejecutar(time.sleep, 0.3))
+        self.assertEqual(resultados[:2], [None, None])
+        self.assertIsInstance(resultados[2], hash_contrasenas.HashNoDisponible)
+
+    @override_settings(HASH_PROCESOS=2, PASSWORD_HASHERS=[HASHER_RAPIDO])
+    def test_pool_caido_hashea_en_el_hilo(self):
+        roto = mock.Mock()
+        roto.submit.side_effect = BrokenProcessPool("el hijo no arranco")
+        with mock.patch.object(hash_contrasenas, "_pool", return_value=(roto, threading.BoundedSemaphore(2))), \
+                self.assertLogs(hash_contrasenas.logger, "WARNING"):
+            for _ in range(hash_contrasenas.CAIDAS_MAXIMAS):
+                self.assertTrue(check_password("clave", hash_contrasenas.hashear("clave")))
+        # tras varias caidas seguidas deja de intentarlo
+        self.assertEqual(hash_contrasenas._procesos(), 0)
+        self.assertEqual(roto.submit.call_count, hash_contrasenas.CAIDAS_MAXIMAS)
+
+    @override_settings(HASH_PROCESOS=1, PASSWORD_HASHERS=[HASHER_RAPIDO])
+    def test_los_hijos_usan_los_hashers_del_proceso_web(self):
+        self.assertTrue(hash_contrasenas.hashear("clave").startswith("pbkdf2_sha256$20000$"))
+        hashes = hash_contrasenas.hashear_lote(["a", "b", "c"])
+        self.assertEqual([check_password(p, h) for p, h in zip("abc", hashes)], [True] * 3)
+
+
+@override_settings(HASH_PROCESOS=0, PASSWORD_HASHERS=[HASHER_RAPIDO, "django.contrib.auth.hashers.MD5PasswordHasher"])
+class RehashTests(TestCase):
+
+    def test_rehash_invalida_el_cache(self):
+        usuario = crear_usuario()
+        Usuario.objects.filter(pk=usuario.pk).update(password=MD5PasswordHasher().encode("secreto1", "sal"))
+        usuario_cache.invalidar()
+        cacheado = usuario_cache.obtener_usuario(usuario.id)
+        self.assertTrue(cacheado.password.startswith("md5$"))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertTrue(cacheado.check_password("secreto1"))
+        self.assertTrue(usuario_cache.obtener_usuario(usuario.id).password.startswith("pbkdf2_sha256$"))
+
+
+@override_settings(PASSWORD_HASHERS=[HASHER_RAPIDO])
+class LoginSimultaneoTests(TransactionTestCase):
+    """
+    Prueba de carga: USUARIOS inician sesion a la vez (07:00). El cliente
+    reintenta los 503 como la app. Logins por segundo y latencias, con el
+    pool de hash y en el hilo de la peticion.
+    """
+
+    USUARIOS = 200
+
+    def setUp(self):
+        hash_contrasenas._descartar_pool()
+        self.addCleanup(hash_contrasenas._descartar_pool)
+        usuario_cache.invalidar()
+        with override_settings(HASH_PROCESOS=2):
+            hashes = hash_contrasenas.hashear_lote([f"clave{i}" for i in range(self.USUARIOS)])
+        Usuario.objects.bulk_create([
+            Usuario(nombres="Ana", apellidos="Paz", mesa=str(i % 50 + 1), cargo="OPERARIO",
+                    username=f"turno{i}", username_clave=f"turno{i}", password=h)
+            for i, h in enumerate(hashes)
+        ])
+
+    def iniciar_sesiones(self):
+        latencias, rechazos, codigos = [], [0], []
+        barrera = threading.Barrier(self.USUARIOS)
+
+        def usuario(i):
+            cliente = Client()
+            try:
+                barrera.wait()
+                for intento in range(50):
+                    inicio = time.perf_counter()
+                    respuesta = cliente.post("/api/login/", {"username": f"turno{i}", "password": f"clave{i}"},
+                                             content_type="application/json")
+                    if respuesta.status_code != 503:
+                        latencias.append(time.perf_counter() - inicio)
+                        codigos.append(respuesta.status_code)
+                        return
+                    rechazos[0] += 1
+                    time.sleep(0.05 * (intento + 1))
+            finally:
+                connection.close()
+
+        hilos = [threading.Thread(target=usuario, args=(i,)) for i in range(self.USUARIOS)]
+        inicio = time.perf_counter()
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        segundos = time.perf_counter() - inicio
+        latencias.sort()
+        return codigos, {
+            "por_seg": len(latencias) / segundos,
+            "segundos": segundos,
+            "p50": latencias[len(latencias) // 2],
+            "p99": latencias[int(len(latencias) * 0.99) - 1],
+            "rechazos": rechazos[0],
+        }
+
+    def test_200_logins_simultaneos(self):
+        resultados = {}
+        for nombre, procesos in (("pool de 2 procesos", 2), ("en el hilo", 0)):
+            with override_settings(HASH_PROCESOS=procesos):
+                codigos, resultados[nombre] = self.iniciar_sesiones()
+            self.assertEqual(codigos, [200] * self.USUARIOS, nombre)
+        for nombre, r in resultados.items():
+            print(f"\n  login {nombre}: {self.USUARIOS} usuarios en {r['segundos']:.1f} s "
+                  f"({r['por_seg']:.0f} logins/s), p50 {r['p50'] * 1000:.0f} ms, "
+                  f"p99 {r['p99'] * 1000:.0f} ms, 503 reintentados {r['rechazos']}", end="")
+        print()
+
+
+class JsonRapidoTests(SimpleTestCase):
+    """Mismos bytes que el JSONRenderer de DRF y mismo JSON que JsonResponse de Django."""
+
+    DATOS = {
+        "decimal": Decimal("12.50"),
+        "decimales": [Decimal("0.1"), Decimal("-3"), Decimal("1E+2")],
+        "utc": datetime(2026, 10, 18, 7, 0, 0, 123456, tzinfo=dt_timezone.utc),
+        "local": datetime(2026, 10, 18, 2, 0, tzinfo=dt_timezone(timedelta(hours=-5))),
+        "india": datetime(2026, 10, 18, 12, 30, 0, 7, tzinfo=dt_timezone(timedelta(hours=5, minutes=30))),
+        "fecha": date(2026, 10, 18),
+        "texto": "Ñandú 日本 \u2028",
+        "nulo": None,
+        "flotantes": [0.1, 1 / 3, -0.0, 123.456, 1e15],
+        "anidado": [{"a": 1, "b": [True, False, None]}],
+    }
+
+    def renderizar(self, datos):
+        return JSONRendererRapido().render(datos)
+
+    def test_mismos_bytes_que_drf(self):
+        for backend in ("orjson", "json"):
+            with override_settings(JSON_BACKEND=backend):
+                self.assertEqual(self.renderizar(self.DATOS), JSONRenderer().render(self.DATOS), backend)
+
+    def test_exponentes_mismo_valor(self):
+        # orjson escribe el exponente distinto (1e16, 0.00001): bytes distintos, mismo valor
+        datos = [1e16, 1e300, 1e-5, 1.5e-7, -2.5e-300]
+        self.assertEqual(loads(self.renderizar(datos)), json.loads(JSONRenderer().render(datos)))
+
+    def test_mismo_json_que_jsonresponse_de_django(self):
+        datos = {c: v for c, v in self.DATOS.items() if c != "texto"}
+        esperado = json.loads(JsonResponseDjango(datos).content)
+        for backend in ("orjson", "json"):
+            with override_settings(JSON_BACKEND=backend):
+                self.assertEqual(json.loads(JsonResponse(datos).content), esperado, backend)
+
+    def test_no_finitos_como_drf_y_django(self):
+        for valor in (math.nan, math.inf, -math.inf, Decimal("NaN"), Decimal("-Infinity")):
+            datos = {"nulo": None, "filas": [{"extras": 1.5}, {"extras": valor}]}
+            with self.assertRaisesMessage(ValueError, "Out of range float values are not JSON compliant"):
+                JSONRenderer().render(datos)
+            for backend in ("orjson", "json"):
+                with override_settings(JSON_BACKEND=backend), self.subTest(valor=valor, backend=backend):
+                    with self.assertRaisesMessage(ValueError, "Out of range float values are not JSON compliant"):
+                        self.renderizar(datos)
+                    # Django escribe NaN/Infinity (JSON no estandar) y se mantiene igual
+                    self.assertEqual(
+                        JsonResponse(datos).content,
+                        json.dumps(datos, cls=DjangoJSONEncoder, separators=(",", ":")).encode())
+
+
+@override_settings(HASH_PROCESOS=0, PASSWORD_HASHERS=[HASHER_RAPIDO])
+class ImportarUsuariosTests(TestCase):
+
+    ENCABEZADO = ["nombres", "apellidos", "mesa", "cargo", "username", "password"]
+
+    def csv(self, filas, encabezado=None, separador=",", codificacion="utf-8"):
+        lineas = [encabezado or self.ENCABEZADO] + filas
+        return "\n".join(separador.join(str(c) for c in f) for f in lineas).encode(codificacion)
+
+    def xlsx(self, filas, encabezado=None):
+        libro = Workbook()
+        hoja = libro.active
+        for fila in [encabezado or self.ENCABEZADO] + filas:
+            hoja.append(fila)
+        salida = io.BytesIO()
+        libro.save(salida)
+        return salida.getvalue()
+
+    def estados(self, informe):
+        return [(f["username"], f["estado"], f["error"]) for f in informe["filas"]]
+
+    def test_csv_con_separadores_y_codificaciones(self):
+        esperado = [{"nombres": "José", "apellidos": "Peña", "mesa": "5", "cargo": "embonchador/a",
+                     "username": "jpena", "password": "secreto1"}]
+        for separador, codificacion in ((",", "utf-8"), (";", "utf-8-sig"), ("\t", "latin-1")):
+            contenido = self.csv([["José", "Peña", "5", "embonchador/a", "jpena", "secreto1"], ["", "", "", "", "", ""]],
+                                 separador=separador, codificacion=codificacion)
+            self.assertEqual(importar_usuarios.leer_filas("u.csv", contenido), esperado, (separador, codificacion))
+
+    def test_xlsx_y_alias_de_encabezado(self):
+        encabezado = ["Nombres", "Apellidos", "Mesa", "Cargo", "Usuario", "Contraseña"]
+        contenido = self.xlsx([["Ana", "Paz", 5.0, "EMBONCHADOR/A", "apaz", 123456], ["Luis", "Mora", None, "ADMIN", "lmora", "clave99"]],
+                              encabezado)
+        # sin extension: se reconoce por la firma del zip
+        filas = importar_usuarios.leer_filas("subida", contenido)
+        self.assertEqual([(f["mesa"], f["username"], f["password"]) for f in filas],
+                         [("5", "apaz", "123456"), ("", "lmora", "clave99")])
+
+    def test_archivo_invalido(self):
+        for nombre, contenido in (("u.csv", b""), ("u.csv", b"nombres,apellidos\nAna,Paz"), ("u.xlsx", b"no es excel")):
+            with self.assertRaises(importar_usuarios.ArchivoInvalido):
+                importar_usuarios.leer_filas(nombre, contenido)
+
+    def test_repetidos_existentes_y_mesas(self):
+        crear_usuario(username="Existe")
+        Mesa.objects.create(nombre="5")
+        filas = importar_usuarios.leer_filas("u.csv", self.csv([
+            ["Ana", "Paz", "5", "EMBONCHADOR/A", "ana", "secreto1"],
+            ["Ana", "Paz", "5", "EMBONCHADOR/A", " ANA ", "secreto1"],    # repetida en el archivo
+            ["Eva", "Sol", "12", "EMBONCHADOR/A", "existe", "secreto1"],  # ya en la BD
+            ["Luis", "Mora", "012", "EMBONCHADOR/A", "luis", "secreto1"],
+            ["Rosa", "Paz", "7", "ADMIN", "rosa", "secreto1"],       # ADMIN: mesa 0
+            ["Juan", "Paz", "x", "EMBONCHADOR/A", "juan", "secreto1"],
+            ["Juan", "Paz", "3", "EMBONCHADOR/A", "juan2", "corta"],
+        ]))
+
+        informe = importar_usuarios.importar(filas, solo_validar=True)
+        self.assertEqual((informe["validos"], informe["creados"], informe["errores"]), (3, 0, 4))
+        self.assertFalse(Usuario.objects.filter(username="ana").exists())
+
+        informe = importar_usuarios.importar(filas)
+        self.assertEqual(self.estados(informe), [
+            ("ana", "creado", None),
+            ("ANA", "error", "Username repetido en el archivo."),
+            ("existe", "error", "Ese usuario ya existe."),
+            ("luis", "creado", None),
+            ("rosa", "creado", None),
+            ("juan", "error", "La mesa debe ser un numero mayor a 0."),
+            ("juan2", "error", "La contrasena debe tener al menos 6 caracteres."),
+        ])
+        self.assertEqual(informe["mesas_creadas"], ["12"])
+        self.assertEqual(sorted(Mesa.objects.values_list("nombre", flat=True)), ["12", "5"])
+        self.assertEqual(dict(Usuario.objects.filter(username__in=["luis", "rosa"]).values_list("username", "mesa")),
+                         {"luis": "12", "rosa": "0"})
+        usuario = Usuario.objects.get(username_clave="ana")
+        self.assertTrue(usuario.check_password("secreto1"))
+
+    def test_username_creado_por_otro_proceso_durante_la_importacion(self):
+        filas = importar_usuarios.leer_filas("u.csv", self.csv([
+            ["Ana", "Paz", "5", "EMBONCHADOR/A", "ana", "secreto1"],
+            ["Luis", "Mora", "6", "EMBONCHADOR/A", "Luis", "secreto1"],
+        ]))
+        consultar = importar_usuarios._usernames_existentes
+        llamadas = []
+
+        def otro_proceso_inserta(claves):
+            # la primera consulta no ve a "luis": lo crea otra importacion
+            # antes del bulk_create
+            encontrados = consultar(claves)
+            if not llamadas:
+                crear_usuario(username="LUIS", mesa="9")
+            llamadas.append(encontrados)
+            return encontrados
+
+        with mock.patch.object(importar_usuarios, "_usernames_existentes", side_effect=otro_proceso_inserta):
+            informe = importar_usuarios.importar(filas)
+
+        self.assertEqual(self.estados(informe), [("ana", "creado", None), ("Luis", "error", "Ese usuario ya existe.")])
+        self.assertEqual((informe["creados"], informe["errores"]), (1, 1))
+        self.assertEqual(Usuario.objects.get(username_clave="luis").mesa, "9")
+        self.assertEqual(informe["mesas_creadas"], ["5"])
+
+    def test_comando(self):
+        with tempfile.NamedTemporaryFile(suffix=".csv") as archivo:
+            archivo.write(self.csv([["Ana", "Paz", "5", "EMBONCHADOR/A", "ana", "secreto1"]]))
+            archivo.flush()
+            salida = io.StringIO()
+            call_command("importar_usuarios", archivo.name, stdout=salida)
+            self.assertIn("1 creados, 0 con error de 1", salida.getvalue())
+            Usuario.objects.filter(username="ana").delete()
+            with mock.patch.object(importar_usuarios, "hashear_lote",
+                                   side_effect=hash_contrasenas.HashNoDisponible("Cola de hash llena")), \
+                    self.assertRaisesMessage(CommandError, "Cola de hash llena"):
+                call_command("importar_usuarios", archivo.name, stdout=io.StringIO())
+
+    def test_benchmark_filas_por_segundo(self):
+        cantidad = int(os.environ.get("FILAS_IMPORTACION", 2000))
+        contenido = self.csv([["Ana", "Paz", str(i % 60 + 1), "EMBONCHADOR/A", f"temporada{i}", f"clave{i}"]
+                              for i in range(cantidad)])
+        inicio = time.perf_counter()
+        filas = importar_usuarios.leer_filas("u.csv", contenido)
+        lectura = time.perf_counter() - inicio
+        validacion = importar_usuarios.importar(filas, solo_validar=True)
+        informe = importar_usuarios.importar(filas)
+        self.assertEqual(informe["creados"], cantidad)
+        print(f"\n  importar {cantidad} usuarios: lectura {cantidad / lectura:,.0f} filas/s, "
+              f"validacion {validacion['filas_por_segundo']:,.0f} filas/s, "
+              f"importacion {informe['filas_por_segundo']:,.0f} filas/s "
+              f"(hash PBKDF2 de {PBKDF2Rapido.iterations} iteraciones, en el hilo)")
+
+
+class BuscarPorClaveTests(TestCase):
+
+    def test_benchmark_username_iexact_contra_clave(self):
+        """Login de USUARIOS_CLAVE usuarios (50k por defecto): __iexact contra username_clave."""
+        cantidad = int(os.environ.get("USUARIOS_CLAVE", 50_000))
+        Usuario.objects.bulk_create([
+            Usuario(nombres="Ana", apellidos="Paz", mesa=str(i % 60 + 1), cargo="EMBONCHADOR/A",
+                    username=f"Temporada{i}", username_clave=f"temporada{i}", password="!")
+            for i in range(cantidad)
+        ], batch_size=5000)
+        azar = random.Random(20)
+        # como se escriben en la tablet: mayusculas y espacios al azar
+        escritos = [f" TEMPORADA{n} " if n % 2 else f"temporada{n}" for n in azar.sample(range(cantidad), 200)]
+
+        def medir(buscar):
+            inicio = time.perf_counter()
+            encontrados = [buscar(u) for u in escritos]
+            return encontrados, (time.perf_counter() - inicio) * 1e6 / len(escritos)
+
+        iexact, us_iexact = medir(lambda u: Usuario.objects.filter(username__iexact=u.strip()).values_list("id", flat=True).first())
+        clave, us_clave = medir(
+            lambda u: Usuario.objects.filter(username_clave=clave_normalizada(u)).values_list("id", flat=True).first())
+        self.assertEqual(clave, iexact)
+        self.assertNotIn(None, clave)
+
+        if connection.vendor == "sqlite":
+            plan = Usuario.objects.filter(username_clave="temporada1").explain()
+            self.assertIn("USING INDEX", plan)
+        print(f"\n  buscar username entre {cantidad} usuarios: __iexact {us_iexact:.0f} us, "
+              f"username_clave {us_clave:.0f} us por busqueda")
+        self.assertLess(us_clave, us_iexact)
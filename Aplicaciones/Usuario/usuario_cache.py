@@ -0,0 +1,139 @@
+# Aplicaciones/Usuario/usuario_cache.py
+"""
+Cache por proceso de Usuario por id, para la autenticacion.
+
+Cada peticion autenticada (JWT o sesion web) necesitaba el Usuario y lo
+leia de la BD. Aqui se guarda con un TTL y un tamano maximo (LRU). Cuando
+un usuario se guarda o se borra (ver signals.py) se incrementa su marca
+"usuario-<id>": cada entrada recuerda la marca con que se leyo y, si ya no
+coincide, ese usuario se vuelve a leer en todos los workers; los demas
+usuarios siguen en cache. invalidar() sin id incrementa la marca general
+"usuarios" y vacia todo. Las marcas estan en el archivo compartido de
+marca_version.py: leerlas no toca el disco ni crea un archivo por usuario. Los cambios hechos con queryset.update() no pasan
+por las senales: el TTL acota cuanto tiempo se ve el valor anterior.
+
+Las decisiones de permisos usan los claims firmados del access token
+(cargo, mesa); si no coinciden con el usuario actual el token se
+considera desactualizado (se edito el usuario despues de emitirlo).
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+from .marca_version import MarcaVersion
+from .models import Usuario
+
+
+CLAIMS_USUARIO = ("username", "cargo", "mesa")
+
+_marca = MarcaVersion("usuarios")
+_lock = threading.Lock()
+_cache = OrderedDict()  # id -> (usuario, expira, marca del usuario)
+_version = None
+
+aciertos = 0
+fallos = 0
+
+
+class TokenDesactualizado(Exception):
+    pass
+
+
+def _ttl():
+    return getattr(settings, "USUARIO_CACHE_TTL", 300)
+
+
+def _maximo():
+    return getattr(settings, "USUARIO_CACHE_MAXIMO", 1024)
+
+
+def _marca_usuario(usuario_id):
+    return MarcaVersion(f"usuario-{usuario_id}")
+
+
+def _sincronizar_version():
+    global _version
+    version = _marca.leer()
+    if version != _version:
+        with _lock:
+            _cache.clear()
+            _version = version
+    return version
+
+
+def obtener_usuario(usuario_id):
+    """
+    Copia del Usuario con ese id (las vistas pueden modificarla sin tocar el
+    cache). Lanza Usuario.DoesNotExist, igual que Usuario.objects.get().
+    """
+    global aciertos, fallos
+    usuario_id = int(usuario_id)
+    version = _sincronizar_version()
+    marca = _marca_usuario(usuario_id).leer()
+    ahora = time.monotonic()
+
+    with _lock:
+        entrada = _cache.get(usuario_id)
+        if entrada is not None and entrada[1] > ahora and entrada[2] == marca:
+            _cache.move_to_end(usuario_id)
+            aciertos += 1
+            return copy.copy(entrada[0])
+    fallos += 1
+
+    usuario = Usuario.objects.get(id=usuario_id)
+    with _lock:
+        # si la version general cambio mientras consultabamos, no guardar;
+        # si cambio la del usuario, la entrada ya nace con la marca vieja
+        if version == _version:
+            _cache[usuario_id] = (usuario, ahora + _ttl(), marca)
+            _cache.move_to_end(usuario_id)
+            while len(_cache) > _maximo():
+                _cache.popitem(last=False)
+    return copy.copy(usuario)
+
+
+def claims_de(usuario):
+    """Claims de usuario que lleva el access token."""
+    return {c: getattr(usuario, c) for c in CLAIMS_USUARIO}
+
+
+def usuario_de_payload(payload, usuario_id):
+    """
+    Usuario del token, comprobando que los claims que trae siguen vigentes.
+    Lanza Usuario.DoesNotExist o TokenDesactualizado.
+    """
+    usuario = obtener_usuario(usuario_id)
+    for claim in CLAIMS_USUARIO:
+        # los tokens antiguos (sin claims) se aceptan
+        if claim in payload and str(payload[claim]) != str(getattr(usuario, claim)):
+            raise TokenDesactualizado(claim)
+    return usuario
+
+
+def invalidar(usuario_id=None):
+    """
+    Descarta el usuario (o todos, sin id) en este y en los demas workers.
+    """
+    global _version
+    if usuario_id is not None:
+        with _lock:
+            _cache.pop(int(usuario_id), None)
+        _marca_usuario(int(usuario_id)).incrementar()
+        return
+    with _lock:
+        _cache.clear()
+        _marca.incrementar()
+        _version = None
+
+
+def estadisticas():
+    total = aciertos + fallos
+    return {
+        "usuarios_en_cache": len(_cache),
+        "aciertos": aciertos,
+        "fallos": fallos,
+        "tasa_acierto": round(aciertos / total, 4) if total else 0.0,
+    }
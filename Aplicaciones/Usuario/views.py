@@ -1,11 +1,13 @@
 from django.contrib import messages
-from django.http import JsonResponse
+from Aplicaciones.Usuario.json_rapido import JsonResponse
 from django.shortcuts import redirect, render
 from django.views.decorators.csrf import ensure_csrf_cookie
 from django.views.decorators.http import require_POST
 
 from Aplicaciones.Disponibilidad.models import Disponibilidad
 from Aplicaciones.Usuario.web_decorators import web_admin_required
+from .clave_normalizada import clave_normalizada
+from .hash_contrasenas import HashNoDisponible
 from .models import Mesa, Usuario
 
 CARGOS_PERMITIDOS = {
@@ -26,9 +28,15 @@ def inicio(request):
         username = (request.POST.get("usuario") or "").strip()
         password = (request.POST.get("contrasena") or "").strip()
 
-        usuario = Usuario.objects.filter(username__iexact=username).first()
+        usuario = Usuario.objects.filter(username_clave=clave_normalizada(username)).first()
 
-        if not usuario or not usuario.check_password(password):
+        try:
+            correcta = bool(usuario) and usuario.check_password(password)
+        except HashNoDisponible:
+            messages.error(request, "Servidor ocupado, intenta de nuevo en unos segundos.")
+            return render(request, "iniciose.html")
+
+        if not correcta:
             messages.error(request, "Credenciales incorrectas")
             return render(request, "iniciose.html")
 
@@ -96,7 +104,7 @@ def guardar_mesa(request):
         messages.error(request, "La mesa debe ser un numero mayor a 0.")
         return redirect("nuevo_usuario")
 
-    if Mesa.objects.filter(nombre__iexact=nombre).exists():
+    if Mesa.objects.filter(nombre_clave=clave_normalizada(nombre)).exists():
         if is_ajax:
             return JsonResponse({"success": False, "message": "Esa mesa ya existe."}, status=409)
         messages.warning(request, "Esa mesa ya existe.")
@@ -130,7 +138,7 @@ def guardar_usuario(request):
         messages.error(request, "Cargo no permitido.")
         return redirect("nuevo_usuario")
 
-    if Usuario.objects.filter(username__iexact=username).exists():
+    if Usuario.objects.filter(username_clave=clave_normalizada(username)).exists():
         messages.error(request, "Ese usuario ya existe.")
         return redirect("nuevo_usuario")
 
@@ -155,7 +163,11 @@ def guardar_usuario(request):
         cargo=cargo,
         username=username,
     )
-    u.set_password(password)
+    try:
+        u.set_password(password)
+    except HashNoDisponible:
+        messages.error(request, "Servidor ocupado, intenta de nuevo en unos segundos.")
+        return redirect("nuevo_usuario")
     u.save()
 
     messages.success(request, "Usuario guardado exitosamente.")
@@ -190,7 +202,7 @@ def procesar_edicion_usuario(request):
             messages.error(request, "El usuario (username) es obligatorio.")
             return redirect("usuariore")
 
-        if Usuario.objects.filter(username__iexact=nuevo_username).exclude(id=usuario.id).exists():
+        if Usuario.objects.filter(username_clave=clave_normalizada(nuevo_username)).exclude(id=usuario.id).exists():
             messages.error(request, "Ese usuario (username) ya esta registrado. Elige otro.")
             return redirect("usuariore")
 
@@ -204,6 +216,8 @@ def procesar_edicion_usuario(request):
         messages.success(request, "Usuario actualizado correctamente")
     except Usuario.DoesNotExist:
         messages.error(request, "El usuario no existe.")
+    except HashNoDisponible:
+        messages.error(request, "Servidor ocupado, intenta de nuevo en unos segundos.")
     except Exception as e:
         messages.error(request, f"Error al procesar la edicion: {e}")
 
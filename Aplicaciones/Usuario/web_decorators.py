@@ -4,6 +4,7 @@ from django.contrib import messages
 from django.shortcuts import redirect
 
 from Aplicaciones.Usuario.models import Usuario
+from Aplicaciones.Usuario.usuario_cache import obtener_usuario
 
 
 def _get_session_user(request):
@@ -12,7 +13,7 @@ def _get_session_user(request):
         return None
 
     try:
-        return Usuario.objects.get(id=int(user_id))
+        return obtener_usuario(user_id)
     except (ValueError, TypeError, Usuario.DoesNotExist):
         request.session.flush()
         return None
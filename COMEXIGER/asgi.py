@@ -13,6 +13,10 @@ django_asgi_app = get_asgi_application()
 
 import Aplicaciones.Rendimiento.routing
 import Aplicaciones.Disponibilidad.routing
+from Aplicaciones.Rendimiento.qr_filtro import precalentar
+
+# filtros QR en segundo plano desde el arranque del worker
+precalentar()
 
 
 if settings.DEBUG:
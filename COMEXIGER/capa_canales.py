@@ -0,0 +1,232 @@
+# COMEXIGER/capa_canales.py
+"""
+Capa de canales para varios procesos en un mismo servidor, sin Redis.
+
+InMemoryChannelLayer solo entrega dentro del proceso: con varios workers,
+un escaneo atendido por uno no llega a los dashboards conectados a otro.
+Esta capa hereda de InMemoryChannelLayer y ademas reenvia cada group_send
+a los otros procesos por sockets Unix de datagramas:
+
+- Un proceso que tiene consumers (group_add) abre <directorio>/<pid>.sock
+  y lo escucha desde su event loop.
+- group_send entrega localmente y manda el mensaje (JSON) a cada .sock
+  del directorio menos el propio; el que lo recibe lo entrega solo a sus
+  grupos locales (no lo reenvia).
+- Los .sock de procesos muertos se borran al fallar el envio.
+- Si la cola del otro proceso esta llena se espera hasta ESPERA_ENVIO y
+  luego se descarta el mensaje para ese proceso.
+
+Cada mensaje entregado a un grupo en este proceso lleva "seq", "epoca" y
+"t" y queda en un buffer de repeticion (Aplicaciones/Usuario/repeticion.py)
+para que un cliente que se reconecta reciba solo lo que perdio.
+
+Solo se difunden los grupos; send() a un canal concreto sigue siendo
+local (los consumers de la app solo usan grupos). Descartar con la cola
+llena es lo mismo que hace InMemoryChannelLayer con un canal lleno. Sin
+AF_UNIX (Windows) se comporta igual que InMemoryChannelLayer.
+"""
+import asyncio
+import atexit
+import hashlib
+import logging
+import os
+import socket
+import tempfile
+
+from channels.layers import InMemoryChannelLayer
+
+from Aplicaciones.Usuario.json_rapido import dumps, loads
+from Aplicaciones.Usuario.repeticion import Repeticion
+
+
+logger = logging.getLogger(__name__)
+
+TAMANO_BUFFER = 4 * 1024 * 1024
+TAMANO_MAXIMO = 200 * 1024  # datagrama Unix por defecto en Linux: ~208 KB
+ESPERA_ENVIO = 0.05  # segundos que se espera a un proceso con la cola llena
+
+
+def _directorio_por_defecto():
+    # ruta corta (sun_path admite ~108 bytes) y distinta por instalacion
+    base = hashlib.sha1(os.path.dirname(os.path.abspath(__file__)).encode()).hexdigest()[:8]
+    return os.path.join(tempfile.gettempdir(), f"comexiger-canales-{base}")
+
+
+class CapaUnixDatagrama(InMemoryChannelLayer):
+
+    def __init__(self, directorio=None, repeticion_mensajes=200, repeticion_filas=2000, **kwargs):
+        super().__init__(**kwargs)
+        self.repeticion = Repeticion(repeticion_mensajes, repeticion_filas)
+        self.directorio = directorio or _directorio_por_defecto()
+        self.disponible = hasattr(socket, "AF_UNIX") and os.name != "nt"
+        self._receptor = None
+        self._ruta = None
+        self._loop = None
+        self._emisores = {}
+        self.enviados = 0
+        self.recibidos = 0
+        self.descartados = 0
+
+    # ---------- envio ----------
+
+    def _otros(self):
+        try:
+            entradas = list(os.scandir(self.directorio))
+        except FileNotFoundError:
+            return []
+        return [e.path for e in entradas if e.name.endswith(".sock") and e.path != self._ruta]
+
+    def _conexion(self, ruta):
+        conexion = self._emisores.get(ruta)
+        if conexion is None:
+            conexion = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            conexion.setblocking(False)
+            try:
+                conexion.connect(ruta)
+            except OSError:
+                conexion.close()
+                raise
+            self._emisores[ruta] = conexion
+        return conexion
+
+    def _olvidar(self, ruta, borrar=False):
+        conexion = self._emisores.pop(ruta, None)
+        if conexion is not None:
+            conexion.close()
+        if borrar:
+            # proceso terminado sin borrar su socket
+            try:
+                os.unlink(ruta)
+            except OSError:
+                pass
+
+    async def _enviar(self, ruta, datos):
+        try:
+            conexion = self._conexion(ruta)
+            try:
+                conexion.send(datos)
+            except BlockingIOError:
+                # cola del receptor llena (net.unix.max_dgram_qlen, 10 por
+                # defecto): esperar un poco a que la vacie y si no, descartar
+                await asyncio.wait_for(asyncio.get_running_loop().sock_sendall(conexion, datos), ESPERA_ENVIO)
+            self.enviados += 1
+        except (ConnectionRefusedError, FileNotFoundError):
+            self._olvidar(ruta, borrar=True)
+        except asyncio.TimeoutError:
+            self.descartados += 1
+            # sock_sendall cancelado puede dejar el socket a medias
+            self._olvidar(ruta)
+        except OSError:
+            self.descartados += 1
+            self._olvidar(ruta)
+
+    async def _difundir(self, group, message):
+        destinos = self._otros()
+        if not destinos:
+            return
+        try:
+            datos = dumps({"g": group, "m": message})
+        except TypeError:
+            logger.warning("Mensaje no serializable para el grupo %s: solo entrega local", group)
+            return
+        if len(datos) > TAMANO_MAXIMO:
+            logger.warning("Mensaje de %d bytes para el grupo %s: solo entrega local", len(datos), group)
+            return
+        if len(destinos) == 1:
+            await self._enviar(destinos[0], datos)
+        else:
+            await asyncio.gather(*(self._enviar(ruta, datos) for ruta in destinos))
+
+    async def _entregar(self, group, message):
+        """Entrega solo a los grupos locales, con numero de secuencia."""
+        self.repeticion.registrar(group, message)
+        await InMemoryChannelLayer.group_send(self, group, message)
+
+    async def group_send(self, group, message):
+        # copia: la secuencia es de este proceso, no viaja a los otros
+        await self._entregar(group, dict(message))
+        if self.disponible:
+            await self._difundir(group, message)
+
+    # ---------- recepcion ----------
+
+    def _escuchar(self):
+        """Abre el socket de este proceso en el loop actual (una vez por loop)."""
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        if self._receptor is None:
+            os.makedirs(self.directorio, mode=0o700, exist_ok=True)
+            self._ruta = os.path.join(self.directorio, f"{os.getpid()}.sock")
+            try:
+                os.unlink(self._ruta)  # pid reutilizado
+            except FileNotFoundError:
+                pass
+            receptor = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            receptor.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, TAMANO_BUFFER)
+            receptor.setblocking(False)
+            receptor.bind(self._ruta)
+            # desde aqui llegan los mensajes de los otros procesos
+            self.repeticion.iniciar()
+            self._receptor = receptor
+            atexit.register(self.cerrar)
+        elif self._loop is not None and not self._loop.is_closed():
+            self._loop.remove_reader(self._receptor.fileno())
+        loop.add_reader(self._receptor.fileno(), self._leer)
+        self._loop = loop
+
+    def _leer(self):
+        while True:
+            try:
+                datos = self._receptor.recv(TAMANO_MAXIMO + 1024)
+            except (BlockingIOError, InterruptedError):
+                return
+            try:
+                sobre = loads(datos)
+                group, message = sobre["g"], sobre["m"]
+            except (ValueError, KeyError, TypeError):
+                logger.warning("Datagrama invalido en %s", self._ruta)
+                continue
+            self.recibidos += 1
+            # solo entrega local, sin reenviar
+            self._loop.create_task(self._entregar(group, message))
+
+    async def group_add(self, group, channel):
+        await super().group_add(group, channel)
+        if self.disponible:
+            self._escuchar()
+        else:
+            # un solo proceso: todo mensaje pasa por aqui
+            self.repeticion.iniciar()
+
+    @property
+    def loop(self):
+        """Event loop donde escuchan los consumers de este proceso (o None)."""
+        return self._loop
+
+    def cerrar(self):
+        if self._receptor is not None:
+            if self._loop is not None and not self._loop.is_closed():
+                self._loop.remove_reader(self._receptor.fileno())
+            self._receptor.close()
+            self._receptor = None
+            self._loop = None
+            try:
+                os.unlink(self._ruta)
+            except OSError:
+                pass
+        for ruta in list(self._emisores):
+            self._olvidar(ruta)
+
+    async def flush(self):
+        await super().flush()
+        self.cerrar()
+
+    def estadisticas(self):
+        return {
+            "procesos": len(self._otros()) + (1 if self._ruta else 0),
+            "enviados": self.enviados,
+            "recibidos": self.recibidos,
+            "descartados": self.descartados,
+            "repeticion": self.repeticion.estadisticas(),
+        }
@@ -55,12 +55,55 @@ INSTALLED_APPS = [
     'Aplicaciones.Rendimiento',
 ]
 ASGI_APPLICATION = 'COMEXIGER.asgi.application'
-# Para pruebas locales (in-memory):
-CHANNEL_LAYERS = {
-    'default': {
-        'BACKEND': 'channels.layers.InMemoryChannelLayer',
-    },
-}
+# Capa en memoria que ademas reparte los group_send entre los procesos del
+# mismo servidor por sockets Unix (ver COMEXIGER/capa_canales.py).
+# CANALES_SOLO_LOCAL=True vuelve a la capa en memoria de un solo proceso.
+if config('CANALES_SOLO_LOCAL', default=False, cast=bool):
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels.layers.InMemoryChannelLayer',
+        },
+    }
+else:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'COMEXIGER.capa_canales.CapaUnixDatagrama',
+            'CONFIG': {
+                'directorio': config('CANALES_DIR', default='') or None,
+                # buffer de repeticion por grupo para reanudar (ver
+                # Aplicaciones/Usuario/repeticion.py)
+                'repeticion_mensajes': 200,
+                'repeticion_filas': 2000,
+            },
+        },
+    }
+
+# Difusion por WebSocket: tras el commit las filas de cada grupo se juntan
+# durante DIFUSION_VENTANA segundos y un hilo las envia en un solo lote con el
+# ultimo estado de cada id (ver Aplicaciones/Usuario/difusion.py); 0 = sin
+# esperar. Con la bandeja llena (DIFUSION_COLA_MAXIMA filas) se aplica
+# DIFUSION_DESBORDE: "descartar_antiguas" o "descartar_nuevas".
+DIFUSION_VENTANA = config('DIFUSION_VENTANA', default=0.2, cast=float)
+DIFUSION_MAX_FILAS = 500
+DIFUSION_COLA_MAXIMA = config('DIFUSION_COLA_MAXIMA', default=10_000, cast=int)
+DIFUSION_DESBORDE = config('DIFUSION_DESBORDE', default='descartar_antiguas')
+
+# Filtro Bloom en memoria delante de las tablas de QR usados
+# (ver Aplicaciones/Rendimiento/qr_filtro.py)
+QR_FILTRO_ACTIVO = config('QR_FILTRO_ACTIVO', default=True, cast=bool)
+QR_FILTRO_DIR = BASE_DIR / 'tmp' / 'qr_filtro'
+QR_FILTRO_TASA_ERROR = 0.01
+QR_FILTRO_CAPACIDAD_MINIMA = 1_000_000
+QR_FILTRO_GUARDAR_CADA = 50_000
+
+# Retencion de QR usados: las filas mas viejas pasan a las tablas de archivo
+# con `python manage.py archivar_qr` (o `--cada-horas 24` como programador)
+QR_RETENCION_DIAS = config('QR_RETENCION_DIAS', default=90, cast=int)
+
+# Archivo de marcas de version (mmap) para invalidar caches en memoria entre workers
+# (ver Aplicaciones/Usuario/marca_version.py)
+VERSIONES_DIR = BASE_DIR / 'tmp' / 'versiones'
+
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
@@ -135,6 +178,27 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Hashers: con PASSWORD_ARGON2=True (requiere argon2-cffi) los hashes nuevos
+# son Argon2 y los PBKDF2 existentes se rehacen en el siguiente login
+PASSWORD_HASHERS = [
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+if config('PASSWORD_ARGON2', default=False, cast=bool):
+    PASSWORD_HASHERS.remove('django.contrib.auth.hashers.Argon2PasswordHasher')
+    PASSWORD_HASHERS.insert(0, 'django.contrib.auth.hashers.Argon2PasswordHasher')
+
+# Pool de procesos para hash/verificacion de contrasenas (ver
+# Aplicaciones/Usuario/hash_contrasenas.py); 0 = en el hilo de la peticion.
+# Es por worker web y cada hijo carga Django: mantenerlo chico.
+HASH_PROCESOS = config('HASH_PROCESOS', default=min(2, os.cpu_count() or 1), cast=int)
+HASH_COLA_MAXIMA = config('HASH_COLA_MAXIMA', default=64, cast=int)
+HASH_ESPERA = 15
+HASH_TIMEOUT = 30
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
@@ -172,9 +236,21 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 CORS_ALLOW_ALL_ORIGINS = True
 
+# Codificacion JSON de las APIs: "orjson" (si esta instalado) o "json"
+JSON_BACKEND = config('JSON_BACKEND', default='orjson')
+
+# Tamano maximo (bytes) del body JSON en las vistas de funcion de la API;
+# por encima se responde 413 sin parsear
+API_CUERPO_MAXIMO = config('API_CUERPO_MAXIMO', default=64 * 1024, cast=int)
+
 REST_FRAMEWORK = {
     "DEFAULT_RENDERER_CLASSES": (
-        "rest_framework.renderers.JSONRenderer",
+        "Aplicaciones.Usuario.json_rapido.JSONRendererRapido",
+    ),
+    "DEFAULT_PARSER_CLASSES": (
+        "Aplicaciones.Usuario.json_rapido.JSONParserRapido",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
     ),
     "DEFAULT_AUTHENTICATION_CLASSES": (
         "Aplicaciones.Usuario.authentication.WebSessionAuthentication",
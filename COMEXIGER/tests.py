@@ -0,0 +1,120 @@
+import asyncio
+import multiprocessing
+import os
+import queue
+import shutil
+import socket
+import statistics
+import tempfile
+import time
+import unittest
+
+from django.test import SimpleTestCase
+
+from .capa_canales import CapaUnixDatagrama
+
+
+GRUPO = "pruebas"
+
+
+def _receptor(directorio, esperados, cola):
+    """Proceso con un consumer en GRUPO: devuelve (pid, [(i, seq, latencia)])."""
+    import django
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "COMEXIGER.settings")
+    django.setup()
+
+    async def recibir():
+        capa = CapaUnixDatagrama(directorio=directorio, capacity=esperados * 2)
+        canal = await capa.new_channel()
+        await capa.group_add(GRUPO, canal)
+        cola.put(("listo", os.getpid()))
+        recibidos = []
+        try:
+            while len(recibidos) < esperados:
+                mensaje = await asyncio.wait_for(capa.receive(canal), 15)
+                recibidos.append((mensaje["i"], mensaje["seq"], time.time() - mensaje["enviado"]))
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            capa.cerrar()
+        cola.put(("fin", os.getpid(), recibidos))
+
+    asyncio.run(recibir())
+
+
+@unittest.skipUnless(hasattr(socket, "AF_UNIX") and os.name != "nt", "requiere sockets Unix")
+class CapaUnixDatagramaTests(SimpleTestCase):
+
+    PROCESOS = 3
+    MENSAJES = 300
+
+    def setUp(self):
+        self.directorio = tempfile.mkdtemp(prefix="canales-")
+        self.addCleanup(shutil.rmtree, self.directorio, True)
+
+    def iniciar_receptores(self, esperados):
+        contexto = multiprocessing.get_context("spawn")
+        cola = contexto.Queue()
+        procesos = [contexto.Process(target=_receptor, args=(self.directorio, esperados, cola), daemon=True)
+                    for _ in range(self.PROCESOS)]
+        for proceso in procesos:
+            proceso.start()
+            self.addCleanup(proceso.kill)
+        for _ in procesos:
+            self.assertEqual(cola.get(timeout=60)[0], "listo")
+        return cola, procesos
+
+    def resultados(self, cola, procesos):
+        resultados = {}
+        for _ in procesos:
+            try:
+                _, pid, recibidos = cola.get(timeout=60)
+            except queue.Empty:
+                break
+            resultados[pid] = recibidos
+        for proceso in procesos:
+            proceso.join(10)
+        return resultados
+
+    def test_group_send_llega_a_todos_los_procesos(self):
+        cola, procesos = self.iniciar_receptores(self.MENSAJES)
+        capa = CapaUnixDatagrama(directorio=self.directorio)
+
+        async def enviar():
+            for i in range(self.MENSAJES):
+                await capa.group_send(GRUPO, {"type": "prueba", "i": i, "enviado": time.time()})
+                if i % 10 == 9:
+                    await asyncio.sleep(0.005)  # escaneos reales: no todos en el mismo instante
+
+        asyncio.run(enviar())
+        resultados = self.resultados(cola, procesos)
+        capa.cerrar()
+
+        self.assertEqual(len(resultados), self.PROCESOS)
+        latencias = []
+        for pid, recibidos in resultados.items():
+            self.assertEqual([i for i, _, _ in recibidos], list(range(self.MENSAJES)), pid)
+            # cada proceso numera sus propios mensajes
+            self.assertEqual([seq for _, seq, _ in recibidos], list(range(1, self.MENSAJES + 1)), pid)
+            latencias.extend(latencia for _, _, latencia in recibidos)
+        self.assertEqual(capa.descartados, 0)
+        self.assertEqual(capa.enviados, self.PROCESOS * self.MENSAJES)
+
+        latencias.sort()
+        p50 = statistics.median(latencias)
+        p99 = latencias[int(len(latencias) * 0.99) - 1]
+        print(f"\n  capa_canales: {self.PROCESOS} procesos x {self.MENSAJES} mensajes, "
+              f"latencia p50 {p50 * 1000:.2f} ms, p99 {p99 * 1000:.2f} ms")
+        self.assertLess(p99, 1.0)
+
+    def test_socket_de_proceso_muerto_se_borra(self):
+        ruta = os.path.join(self.directorio, "999999.sock")
+        muerto = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        muerto.bind(ruta)
+        muerto.close()  # el archivo queda, nadie escucha
+        capa = CapaUnixDatagrama(directorio=self.directorio)
+
+        asyncio.run(capa.group_send(GRUPO, {"type": "prueba"}))
+        self.assertFalse(os.path.exists(ruta))
+        capa.cerrar()
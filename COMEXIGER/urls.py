@@ -11,7 +11,8 @@ from Aplicaciones.Usuario.api_views import (
     registrar_usuario_api, 
     login_usuario_api,
     obtener_mesas_api,
-    verificar_mesa_api
+    verificar_mesa_api,
+    importar_usuarios_api
 )
 
 
@@ -37,6 +38,7 @@ urlpatterns = [
     
     path('api/registrar/', registrar_usuario_api, name='api_registrar'),
     path('api/login/', login_usuario_api, name='api_login'),
+    path('api/usuarios/importar/', importar_usuarios_api, name='api_usuarios_importar'),
     path('api/mesas/', obtener_mesas_api, name='api_mesas'),
     path('api/verificar_mesa/', verificar_mesa_api, name='api_verificar_mesa'),
     
@@ -14,3 +14,6 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'COMEXIGER.settings')
 
 application = get_wsgi_application()
+
+from Aplicaciones.Rendimiento.qr_filtro import precalentar
+precalentar()
@@ -11,3 +11,6 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'COMEXIGER.settings')
 
 from django.core.wsgi import get_wsgi_application
 application = get_wsgi_application()
+
+from Aplicaciones.Rendimiento.qr_filtro import precalentar
+precalentar()